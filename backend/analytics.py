@@ -0,0 +1,248 @@
+# analytics.py - MongoDB aggregation pipelines behind the /api/analytics/* routes
+from datetime import datetime
+from rollups import ROLLUP_COLLECTION, DAY
+
+TAX_SECTIONS = ["80C", "80D", "80G", "HRA"]
+
+# Dates are stored as ISO strings, so month buckets are plain prefixes
+MONTH = {"$substr": ["$date", 0, 7]}
+
+# The pipelines run unchanged over raw transactions or over rollup documents,
+# which carry pre-summed count/highValueCount fields.
+COUNT = {"$sum": {"$ifNull": ["$count", 1]}}
+HIGH_VALUE_COUNT = {"$sum": {"$ifNull": ["$highValueCount", {"$cond": ["$isHighValue", 1, 0]}]}}
+
+
+def _amount_if(condition):
+    return {"$sum": {"$cond": [condition, "$amount", 0]}}
+
+
+def _top(field, limit=None):
+    stages = [
+        {"$group": {"_id": f"${field}", "amount": {"$sum": "$amount"}}},
+        {"$sort": {"amount": -1, "_id": 1}},
+    ]
+    if limit:
+        stages.append({"$limit": limit})
+    return stages
+
+
+# Each view is a pre-filter plus named sub-pipelines that run in a single $facet,
+# so only grouped rows ever leave the database. "details" are projections of the
+# individual matching transactions, read from db.transactions with a plain
+# cursor: a $facet outputs one document, which BSON caps at 16 MiB.
+VIEWS = {
+    "summary": {
+        "match": {},
+        "facets": {
+            "totals": [
+                {"$group": {
+                    "_id": None,
+                    "totalIncome": _amount_if({"$eq": ["$type", "income"]}),
+                    "totalExpenses": _amount_if({"$eq": ["$type", "expense"]}),
+                    "highValueCount": HIGH_VALUE_COUNT,
+                    "totalTransactions": COUNT,
+                }}
+            ],
+        },
+    },
+    "category_summary": {
+        "match": {"type": "expense"},
+        "facets": {
+            "categories": _top("category"),
+        },
+    },
+    "monthly_summary": {
+        "match": {},
+        "facets": {
+            "months": [
+                {"$group": {
+                    "_id": MONTH,
+                    "income": _amount_if({"$eq": ["$type", "income"]}),
+                    "expenses": _amount_if({"$ne": ["$type", "income"]}),
+                }}
+            ],
+        },
+    },
+    "tax_summary": {
+        "match": {"taxFlags": {"$ne": []}},
+        "facets": {
+            "taxTotals": [
+                {"$unwind": "$taxFlags"},
+                {"$match": {"taxFlags": {"$in": TAX_SECTIONS}}},
+                {"$group": {"_id": "$taxFlags", "amount": {"$sum": "$amount"}}},
+            ],
+        },
+        "details": {
+            "taxTransactions": {"_id": 0, "date": 1, "merchant": 1, "category": 1, "amount": 1, "taxFlags": 1},
+        },
+    },
+    "spend_insights": {
+        "match": {"type": "expense"},
+        "facets": {
+            "daily": [
+                {"$group": {"_id": DAY, "amount": {"$sum": "$amount"}}},
+                {"$sort": {"_id": 1}},
+            ],
+            "topCategories": _top("category", 5),
+            "topMerchants": _top("merchant", 5),
+        },
+    },
+}
+
+
+def shape_summary(facets):
+    totals = facets["totals"][0] if facets["totals"] else {}
+    total_income = totals.get("totalIncome", 0)
+    total_expenses = totals.get("totalExpenses", 0)
+
+    return {
+        "totalIncome": round(total_income, 2),
+        "totalExpenses": round(total_expenses, 2),
+        "netCashFlow": round(total_income - total_expenses, 2),
+        "highValueCount": totals.get("highValueCount", 0),
+        "totalTransactions": totals.get("totalTransactions", 0)
+    }
+
+
+def shape_category_summary(facets):
+    return [{"category": row["_id"], "amount": round(row["amount"], 2)} for row in facets["categories"]]
+
+
+def shape_monthly_summary(facets):
+    result = [
+        {
+            "month": datetime.strptime(row["_id"], "%Y-%m").strftime("%b %Y"),
+            "income": round(row["income"], 2),
+            "expenses": round(row["expenses"], 2),
+        }
+        for row in facets["months"]
+    ]
+    # Sorted by label, as the dashboard has always received it
+    result.sort(key=lambda x: x["month"])
+    return result
+
+
+def shape_tax_summary(facets):
+    tax_totals = {flag: 0 for flag in TAX_SECTIONS}
+    for row in facets["taxTotals"]:
+        tax_totals[row["_id"]] = row["amount"]
+
+    tax_transactions = [
+        {
+            "date": t["date"],
+            "merchant": t["merchant"],
+            "category": t["category"],
+            "amount": t["amount"],
+            "taxFlags": t["taxFlags"]
+        }
+        for t in facets["taxTransactions"]
+    ]
+
+    return {
+        "taxTotals": {k: round(v, 2) for k, v in tax_totals.items()},
+        "totalDeductions": round(sum(tax_totals.values()), 2),
+        "taxTransactions": tax_transactions
+    }
+
+
+def shape_spend_insights(facets):
+    daily_trend = [{"date": row["_id"], "amount": round(row["amount"], 2)} for row in facets["daily"]]
+
+    # Weekly average
+    total_spend = sum(row["amount"] for row in facets["daily"])
+    num_weeks = len(daily_trend) / 7 if daily_trend else 1
+    weekly_average = total_spend / num_weeks if num_weeks > 0 else 0
+
+    # High spend alerts (days with spending > 5000)
+    high_spend_days = [item for item in daily_trend if item["amount"] > 5000]
+
+    return {
+        "dailyTrend": daily_trend,
+        "weeklyAverage": round(weekly_average, 2),
+        "topCategories": [{"category": row["_id"], "amount": round(row["amount"], 2)} for row in facets["topCategories"]],
+        "topMerchants": [{"merchant": row["_id"], "amount": round(row["amount"], 2)} for row in facets["topMerchants"]],
+        "highSpendAlerts": high_spend_days
+    }
+
+
+SHAPERS = {
+    "summary": shape_summary,
+    "category_summary": shape_category_summary,
+    "monthly_summary": shape_monthly_summary,
+    "tax_summary": shape_tax_summary,
+    "spend_insights": shape_spend_insights,
+}
+
+
+def build_pipeline(name):
+    """Build the aggregation pipeline for a single analytics view"""
+    view = VIEWS[name]
+    pipeline = [{"$match": view["match"]}] if view["match"] else []
+    pipeline.append({"$facet": view["facets"]})
+    return pipeline
+
+
+async def _run_facets(collection, pipeline):
+    rows = await collection.aggregate(pipeline).to_list(1)
+    return rows[0] if rows else {key: [] for key in pipeline[-1]["$facet"]}
+
+
+async def _find_details(db, name):
+    """A view's "details": each projection streamed over the matching transactions"""
+    view = VIEWS[name]
+    return {
+        key: [row async for row in db.transactions.find(view["match"], projection)]
+        for key, projection in view.get("details", {}).items()
+    }
+
+
+async def compute_view(db, name, source=ROLLUP_COLLECTION):
+    """Run one analytics view and shape it for the API.
+
+    `source` is the rollup collection by default; pass "transactions" to
+    recompute from the raw documents.
+    """
+    facets = await _run_facets(db[source], build_pipeline(name))
+    facets.update(await _find_details(db, name))
+    return SHAPERS[name](facets)
+
+
+# Dashboard payload keys, in the order the frontend consumes them
+DASHBOARD_KEYS = {
+    "summary": "summary",
+    "category_summary": "categorySummary",
+    "monthly_summary": "monthlySummary",
+    "tax_summary": "taxSummary",
+    "spend_insights": "spendInsights",
+}
+
+TRANSACTIONS_LIMIT = 1000
+LATEST_FIRST = [("date", -1), ("id", -1)]
+
+
+def build_dashboard_pipeline():
+    """Build the one $facet pipeline covering every dashboard aggregate, run
+    over the rollups (or the raw transactions)
+    """
+    aggregates = {}
+    for name, view in VIEWS.items():
+        prefix = [{"$match": view["match"]}] if view["match"] else []
+        for key, stages in view["facets"].items():
+            aggregates[f"{name}__{key}"] = prefix + stages
+    return [{"$facet": aggregates}]
+
+
+async def compute_dashboard(db, limit=TRANSACTIONS_LIMIT, source=ROLLUP_COLLECTION):
+    """Compute the whole dashboard: one pass over the rollups, then the latest
+    transactions and the views' details from db.transactions
+    """
+    combined = await _run_facets(db[source], build_dashboard_pipeline())
+    latest = await db.transactions.find({}, {"_id": 0}).sort(LATEST_FIRST).limit(limit).to_list(limit)
+
+    result = {"transactions": latest}
+    for name, key in DASHBOARD_KEYS.items():
+        facets = {facet: combined[f"{name}__{facet}"] for facet in VIEWS[name]["facets"]}
+        facets.update(await _find_details(db, name))
+        result[key] = SHAPERS[name](facets)
+    return result
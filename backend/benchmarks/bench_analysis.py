@@ -0,0 +1,65 @@
+import json
+import pytest
+
+from financial_agent import langchain_agent
+
+pytestmark = pytest.mark.any_dataset
+
+PORTFOLIO = ["Apple", "Microsoft", "Nvidia", "Amazon", "Alphabet", "Meta", "Tesla", "Netflix", "Visa", "Walmart"]
+
+
+def post(api, url, body, status=200):
+    response = api.post(url, json=body)
+    assert response.status_code == status, response.text
+    return response
+
+
+def bench_run_analysis(benchmark, api, cold_sources, gemini_rest, monkeypatch):
+    # The sync path with the real Gemini client, over REST to the stub
+    monkeypatch.setattr(langchain_agent, "llm", gemini_rest)
+    result = benchmark.pedantic(langchain_agent.run_analysis, args=("AAPL", "Apple"), setup=cold_sources, rounds=5)
+    assert result["decision"] == "buy"
+
+
+def bench_run_analysis_async(benchmark, api, cold_sources):
+    # On the app's event loop, sharing its pooled HTTP client
+    result = benchmark.pedantic(api.portal.call, args=(langchain_agent.run_analysis_async, "AAPL", "Apple"),
+                                setup=cold_sources, rounds=5)
+    assert result["decision"] == "buy"
+
+
+def bench_run_analysis_async_memoized(benchmark, api, cold_sources):
+    api.portal.call(langchain_agent.run_analysis_async, "AAPL", "Apple")
+    result = benchmark(api.portal.call, langchain_agent.run_analysis_async, "AAPL", "Apple")
+    assert result["decision"] == "buy"
+
+
+def bench_financial_analysis_route(benchmark, api, cold_sources):
+    response = benchmark.pedantic(post, args=(api, "/api/financial-analysis", {"company_name": "Apple"}),
+                                  setup=cold_sources, rounds=5)
+    assert response.json()["ticker"] == "AAPL"
+
+
+def bench_financial_analysis_stream(benchmark, api, cold_sources):
+    response = benchmark.pedantic(post, args=(api, "/api/financial-analysis/stream", {"company_name": "Apple"}),
+                                  setup=cold_sources, rounds=5)
+    assert "event: result" in response.text
+
+
+def bench_financial_analysis_batch(benchmark, api, cold_sources):
+    response = benchmark.pedantic(post, args=(api, "/api/financial-analysis/batch", {"company_names": PORTFOLIO}),
+                                  setup=cold_sources, rounds=3)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == len(PORTFOLIO)
+
+
+def run_job(api):
+    job = post(api, "/api/financial-analysis/jobs", {"company_name": "Apple"}, status=202).json()
+    finished = api.get(f"/api/financial-analysis/jobs/{job['id']}", params={"wait": 30}).json()
+    assert finished["status"] == "done", finished
+    return finished
+
+
+def bench_analysis_job(benchmark, api, cold_sources):
+    # Submit, then long-poll until the worker stores the result
+    benchmark.pedantic(run_job, args=(api,), setup=cold_sources, rounds=5)
@@ -0,0 +1,40 @@
+import sys
+import os
+import time
+
+# Add backend/ to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_aa
+from columnar import TransactionSnapshot
+from test_analytics_pipelines import LEGACY
+
+SIZES = [10_000, 100_000, 1_000_000]
+REPEATS = 3
+
+
+def timed(fn):
+    """Best of REPEATS runs, in milliseconds"""
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return min(samples)
+
+
+def bench():
+    print(f"{'rows':>10}  {'view':<18}{'loops ms':>12}{'columnar ms':>14}{'speedup':>10}")
+    for size in SIZES:
+        transactions = list(synthetic_aa.transactions(size))
+        load_ms = timed(lambda: TransactionSnapshot(transactions))
+        snapshot = TransactionSnapshot(transactions)
+        print(f"{size:>10}  {'(snapshot load)':<18}{'':>12}{load_ms:>14.1f}")
+        for name, legacy in LEGACY.items():
+            loops_ms = timed(lambda: legacy(transactions))
+            columnar_ms = timed(lambda: snapshot.compute_view(name))
+            print(f"{size:>10}  {name:<18}{loops_ms:>12.1f}{columnar_ms:>14.1f}{loops_ms / columnar_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,97 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+from functools import partial
+
+# Add backend/ to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_upstreams import StubUpstreams, fake_llm
+
+PROBE_INTERVAL = 0.01
+COMPANY = "Acme Corp"
+
+
+async def measure_lag(workload):
+    """Run workload() while a probe task measures how late the event loop wakes it.
+    Returns (workload result, {"max": s, "p99": s, "mean": s}).
+    """
+    samples = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL)
+            samples.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+    probe_task = asyncio.create_task(probe())
+    try:
+        result = await workload()
+    finally:
+        done.set()
+        await probe_task
+
+    samples.sort()
+    return result, {
+        "max": samples[-1],
+        "p99": samples[int(len(samples) * 0.99)],
+        "mean": sum(samples) / len(samples),
+    }
+
+
+def bench(concurrency, latency):
+    os.environ.setdefault("GOOGLE_API_KEY", "bench-key")
+    from financial_agent import langchain_agent, pure_tools, source_cache, ticker_index, utils
+
+    def fake_market_data(ticker):
+        # yfinance has no configurable endpoint, so its latency is simulated
+        time.sleep(latency)
+        return {"ticker": ticker, "pe_ratio": 30.1, "sector": "Technology"}
+
+    with StubUpstreams({"/chart": latency, "/news": latency, "/search": latency}) as stub:
+        pure_tools.YAHOO_CHART_URL = f"{stub.url}/chart"
+        pure_tools.SERPER_URL = stub.url
+        pure_tools.get_market_data = fake_market_data
+        langchain_agent.llm = fake_llm(latency)
+        # Not in the ticker index, and learning is off, so every request pays
+        # for an LLM ticker lookup
+        index = ticker_index.load_index(learned=None)
+        index.learn = lambda name, ticker: False
+        ticker_index.set_index(index)
+        utils._ticker_chain = lambda: utils.TICKER_PROMPT | fake_llm(latency, "ACME")
+
+        async def executor_handler(company):
+            # Previous handler: sync ticker lookup on the loop, then the sync
+            # pipeline on the default thread pool
+            ticker = utils.get_ticker(company)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, partial(langchain_agent.run_analysis, ticker, company))
+
+        async def async_handler(company):
+            ticker = await utils.get_ticker_async(company)
+            return await langchain_agent.run_analysis_async(ticker, company)
+
+        print(f"{concurrency} concurrent analyses, {latency * 1000:.0f}ms per upstream")
+        print(f"{'path':<10}{'wall s':>10}{'lag max ms':>13}{'lag p99 ms':>13}{'lag mean ms':>14}")
+        for name, handler in [("executor", executor_handler), ("async", async_handler)]:
+            async def workload():
+                # Distinct companies, so the caches cannot collapse the requests
+                return await asyncio.gather(*(handler(f"{COMPANY} {i}") for i in range(concurrency)))
+
+            # Cold, memory-only source cache so both paths reach the upstreams
+            source_cache.set_cache(source_cache.SourceCache(path=""))
+            start = time.perf_counter()
+            _, lag = asyncio.run(measure_lag(workload))
+            wall = time.perf_counter() - start
+            print(f"{name:<10}{wall:>10.2f}{lag['max'] * 1000:>13.1f}{lag['p99'] * 1000:>13.1f}{lag['mean'] * 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Event-loop lag under concurrent analyses")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per upstream and LLM call")
+    args = parser.parse_args()
+    bench(args.concurrency, args.latency)
@@ -0,0 +1,55 @@
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+PROFILE = Path(__file__).parent / "importtime.txt"
+ENV = dict(os.environ, MONGO_URL=os.environ.get("MONGO_URL", "mongodb://localhost:27017"),
+           DB_NAME="finguard_bench", GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "bench-key"))
+# What a worker imports at boot, and what the first analysis request adds
+STATEMENTS = {"server": "import server", "analysis stack": "import financial_agent.main"}
+TOP = 30
+
+
+def run(statement, *flags):
+    return subprocess.run([sys.executable, *flags, "-c", statement], cwd=BACKEND_DIR, env=ENV,
+                          capture_output=True, text=True, check=True)
+
+
+def importtime(statement) -> list:
+    """(cumulative us, self us, module) for every module a fresh interpreter imports, slowest first"""
+    rows = []
+    for line in run(statement, "-X", "importtime").stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, module = line.split(":", 1)[1].split("|")
+        rows.append((int(cumulative), int(own), module.rstrip()))
+    return sorted(rows, reverse=True)
+
+
+def write_profile(path=PROFILE):
+    """Check-in copy of the slowest imports; regenerate with `python benchmarks/bench_import.py`"""
+    with open(path, "w") as f:
+        f.write(f"# python -X importtime, top {TOP} modules by cumulative time (us), Python {sys.version.split()[0]}\n")
+        for name, statement in STATEMENTS.items():
+            rows = importtime(statement)
+            f.write(f"\n## {statement}: {rows[0][0] / 1e6:.3f}s\n")
+            f.write(f"{'cumulative':>11} {'self':>9}  module\n")
+            for cumulative, own, module in rows[:TOP]:
+                f.write(f"{cumulative:>11} {own:>9}  {module}\n")
+
+
+def bench_server_import(benchmark):
+    # Worker boot: the server module and everything it imports, in a fresh interpreter
+    benchmark.pedantic(run, args=(STATEMENTS["server"],), rounds=5)
+
+
+def bench_analysis_stack_import(benchmark):
+    # Paid once per worker, by the first analysis request or the warm-up
+    benchmark.pedantic(run, args=(STATEMENTS["analysis stack"],), rounds=5)
+
+
+if __name__ == "__main__":
+    write_profile()
+    print(f"Wrote {PROFILE}")
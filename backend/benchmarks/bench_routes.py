@@ -0,0 +1,84 @@
+import os
+import pytest
+
+import cache
+import queries
+import server
+
+ANALYTICS_ROUTES = [
+    "/api/analytics/summary",
+    "/api/analytics/category-summary",
+    "/api/analytics/monthly-summary",
+    "/api/analytics/tax-summary",
+    "/api/analytics/spend-insights",
+    "/api/dashboard",
+]
+
+
+def get(api, url, status=200, **kwargs):
+    response = api.get(url, **kwargs)
+    assert response.status_code == status, response.text
+    return response
+
+
+def uncached():
+    """Round setup dropping rendered analytics, so every call aggregates"""
+    server.response_cache = cache.ResponseCache()
+
+
+@pytest.mark.parametrize("route", ANALYTICS_ROUTES)
+def bench_analytics_cold(benchmark, api, route):
+    benchmark.pedantic(get, args=(api, route), setup=uncached, rounds=5)
+
+
+@pytest.mark.parametrize("route", ANALYTICS_ROUTES)
+def bench_analytics_cached(benchmark, api, route):
+    get(api, route)
+    benchmark(get, api, route)
+
+
+def bench_analytics_not_modified(benchmark, api):
+    etag = get(api, "/api/analytics/summary").headers["ETag"]
+    benchmark(get, api, "/api/analytics/summary", 304, headers={"If-None-Match": etag})
+
+
+def bench_transactions_first_page(benchmark, api):
+    response = benchmark(get, api, "/api/transactions")
+    assert len(response.json()) == 1000
+
+
+def bench_transactions_deep_page(benchmark, api):
+    # The page at 90% of the dataset, reached by cursor like the UI does
+    cursor, remaining = None, int(api.records * 0.9)
+    while remaining:
+        limit = min(remaining, queries.MAX_PAGE_SIZE)
+        response = get(api, "/api/transactions", params={"limit": limit, **({"cursor": cursor} if cursor else {})})
+        cursor, remaining = response.headers["X-Next-Cursor"], remaining - limit
+    benchmark(get, api, "/api/transactions", params={"cursor": cursor})
+
+
+def bench_transactions_filtered(benchmark, api):
+    benchmark(get, api, "/api/transactions", params={"type": "expense", "mode": "upi", "category": "Food"})
+
+
+def bench_transactions_tax_eligible(benchmark, api):
+    benchmark(get, api, "/api/transactions", params={"taxEligible": True, "highValue": True})
+
+
+def bench_transactions_ndjson_export(benchmark, api):
+    response = benchmark.pedantic(get, args=(api, "/api/transactions"), kwargs={"params": {"format": "ndjson"}}, rounds=3)
+    assert response.text.count("\n") >= api.records
+
+
+@pytest.mark.skipif(not os.environ.get("BENCH_MONGO_URL"), reason="mongomock has no $text search")
+def bench_transactions_search(benchmark, api):
+    benchmark(get, api, "/api/transactions", params={"search": "swiggy food"})
+
+
+@pytest.mark.any_dataset
+@pytest.mark.parametrize("route", [
+    "/api/ready",
+    "/metrics",
+])
+def bench_status_routes(benchmark, api, route):
+    benchmark(get, api, route)
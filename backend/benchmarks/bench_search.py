@@ -0,0 +1,65 @@
+import sys
+import os
+import re
+import time
+import statistics
+import itertools
+from pymongo import MongoClient
+
+# Add backend/ to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queries
+import synthetic_aa
+from indexes import TRANSACTION_INDEXES
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+ROWS = int(os.environ.get("BENCH_ROWS", 1_000_000))
+TERMS = ["swiggy", "coffee", "insurance", "cafe coffee day", "nomatch"]
+PAGE = 50
+REPEATS = 5
+
+
+def regex_query(search):
+    # The pre-index implementation of the search filter
+    return {"$or": [
+        {"merchant": {"$regex": search, "$options": "i"}},
+        {"narration": {"$regex": search, "$options": "i"}},
+        {"category": {"$regex": search, "$options": "i"}}
+    ]}
+
+
+def load(collection):
+    if collection.estimated_document_count() == ROWS:
+        return
+    collection.drop()
+    docs = synthetic_aa.transactions(ROWS)
+    while batch := list(itertools.islice(docs, 10_000)):
+        collection.insert_many(batch, ordered=False)
+    collection.create_indexes(TRANSACTION_INDEXES)
+
+
+def timed(fn):
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def bench():
+    client = MongoClient(MONGO_URL)
+    collection = client["finguard_bench"]["transactions"]
+    print(f"Loading {ROWS} synthetic transactions...")
+    load(collection)
+
+    print(f"{'term':<18}{'regex ms':>12}{'text ms':>12}")
+    for term in TERMS:
+        regex_ms = timed(lambda: list(collection.find(regex_query(re.escape(term)), {"_id": 0}).sort(queries.SORT).limit(PAGE)))
+        text_ms = timed(lambda: list(collection.find(queries.build_query(search=term), {"_id": 0}).sort(queries.sort_order(term)).limit(PAGE)))
+        print(f"{term:<18}{regex_ms:>12.1f}{text_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    bench()
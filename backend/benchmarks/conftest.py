@@ -0,0 +1,166 @@
+# conftest.py - Fixtures for the benchmark suite: synthetic data, stub upstreams, the app
+import sys
+import os
+import time
+import asyncio
+import itertools
+import pytest
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.append(str(BACKEND_DIR))
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("langchain_google_genai")
+
+# The server reads these at import; the stub URLs are patched in per session
+os.environ.setdefault("MONGO_URL", os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017"))
+os.environ.setdefault("DB_NAME", "finguard_bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench-key")
+os.environ.setdefault("SERPER_API_KEY", "bench-key")
+
+from fastapi.testclient import TestClient
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+import cache
+import jobs
+import rollups
+import ingest
+import indexes
+import synthetic_aa
+from financial_agent import pure_tools, source_cache, ticker_index, langchain_agent, utils
+from stub_upstreams import StubUpstreams, http_llm
+
+BASELINES = Path(__file__).parent / "baselines"
+DEFAULT_STORAGE = "file://./.benchmarks"
+
+# Injected upstream latency, seconds. "zero" measures our own overhead; "typical"
+# approximates production p50s, so the overlap between sources shows up.
+LATENCY_PROFILES = {
+    "zero": {"/chart": 0, "/news": 0, "/search": 0, "/llm": 0, "fundamentals": 0},
+    "typical": {"/chart": 0.08, "/news": 0.3, "/search": 0.3, "/llm": 1.5, "fundamentals": 0.4},
+}
+
+# Large enough to exercise paging, small enough for mongomock
+DEFAULT_RECORDS = "10000"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("finguard")
+    group.addoption("--records", default=os.environ.get("BENCH_RECORDS", DEFAULT_RECORDS),
+                    help="Comma-separated synthetic dataset sizes, e.g. 10000,100000,1000000 "
+                         "(sizes above 10000 want a real Mongo in BENCH_MONGO_URL)")
+    group.addoption("--upstream-latency", default="zero", choices=sorted(LATENCY_PROFILES),
+                    help="Latency injected by the stub Yahoo, Serper and LLM servers")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Baselines live next to the suite wherever pytest is run from
+    if config.getoption("benchmark_storage", None) == DEFAULT_STORAGE:
+        config.option.benchmark_storage = f"file://{BASELINES}"
+
+
+def pytest_generate_tests(metafunc):
+    if "api" in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption("records").split(",")]
+        if metafunc.definition.get_closest_marker("any_dataset"):
+            sizes = [min(sizes)]
+        metafunc.parametrize("api", sizes, indirect=True, scope="session", ids=[f"{size}rec" for size in sizes])
+
+
+def mongo_client():
+    """A real Mongo when BENCH_MONGO_URL is set, mongomock otherwise"""
+    url = os.environ.get("BENCH_MONGO_URL")
+    if url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        return AsyncIOMotorClient(url)
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()
+
+
+async def seed(db, records):
+    """Load `records` synthetic AA transactions through the write path, unless a
+    previous run already left them in this database
+    """
+    if await db.transactions.count_documents({"id": {"$regex": "^S"}}) == records:
+        return
+    await db.transactions.delete_many({})
+    transactions = synthetic_aa.transactions(records)
+    while batch := list(itertools.islice(transactions, ingest.BATCH_SIZE)):
+        await db.transactions.insert_many(batch)
+    await rollups.rebuild_rollups(db)
+    await indexes.ensure_indexes(db)
+
+
+@pytest.fixture(scope="session")
+def latency(pytestconfig):
+    return LATENCY_PROFILES[pytestconfig.getoption("upstream_latency")]
+
+
+@pytest.fixture(scope="session")
+def upstreams(latency, tmp_path_factory):
+    """Stub Yahoo chart and Serper servers, and the LLM on a server of its own so
+    it does not share their per-host connection limit
+    """
+    delays = {prefix: seconds for prefix, seconds in latency.items() if prefix.startswith("/")}
+    with StubUpstreams(delays) as data, StubUpstreams(delays) as llm, pytest.MonkeyPatch.context() as mp:
+        def market_data(ticker):
+            time.sleep(latency["fundamentals"])
+            return {"ticker": ticker, "pe_ratio": 30.1, "roe": 1.5, "sector": "Technology"}
+
+        def download_prices(tickers):
+            return {t: pure_tools.get_latest_price(t) for t in tickers}
+
+        mp.setattr(pure_tools, "YAHOO_CHART_URL", f"{data.url}/chart")
+        mp.setattr(pure_tools, "SERPER_URL", data.url)
+        # yfinance cannot be pointed at a stub: fundamentals sleep in process instead
+        mp.setattr(pure_tools, "get_market_data", market_data)
+        mp.setattr(pure_tools, "download_prices", download_prices)
+        mp.setattr(langchain_agent, "llm", http_llm(llm.url))
+        ticker_index.set_index(ticker_index.load_index(
+            learned=str(tmp_path_factory.mktemp("tickers") / "learned.csv"), extra=utils.COMMON_TICKERS))
+        yield {"data": data, "llm": llm}
+
+
+@pytest.fixture(scope="session")
+def gemini_rest(upstreams):
+    """The real Gemini client over REST, pointed at the LLM stub. Sync only: the
+    async client always speaks gRPC.
+    """
+    return ChatGoogleGenerativeAI(
+        model="models/gemini-flash-latest", google_api_key="bench-key", temperature=0.15,
+        transport="rest", client_options={"api_endpoint": upstreams["llm"].url},
+    )
+
+
+@pytest.fixture
+def cold_sources():
+    """A fresh in-memory source cache: every analysis fetches and calls the LLM"""
+    def reset():
+        source_cache.set_cache(source_cache.SourceCache(path=""))
+    reset()
+    return reset
+
+
+@pytest.fixture(scope="session")
+def api(request, upstreams):
+    """TestClient over the real app, backed by a database of `request.param`
+    synthetic transactions. Jobs run without the production rate limits, so
+    the job routes measure the queue rather than the limiter.
+    """
+    import server
+
+    records = request.param
+    db = mongo_client()[f"finguard_bench_{records}"]
+    server.db = db
+    server.response_cache = cache.ResponseCache()
+    server.job_queue = jobs.JobQueue(db, server.run_analysis_async, limits={})
+    source_cache.set_cache(source_cache.SourceCache(path=""))
+
+    with TestClient(server.app) as client:
+        # Startup seeds dummy.txt and builds indexes; wait for it, then add the dataset
+        client.portal.call(asyncio.wait_for, server.bootstrap_task, None)
+        client.portal.call(seed, db, records)
+        client.records = records
+        yield client
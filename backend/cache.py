@@ -0,0 +1,81 @@
+# cache.py - Response cache for the analytics routes, invalidated by transaction writes
+import hashlib
+import threading
+from collections import OrderedDict
+from pymongo import ReturnDocument
+
+# Bumped on every write to db.transactions; cached responses are keyed on it,
+# so a write invalidates every process's cache without any coordination.
+VERSION_COLLECTION = "collection_versions"
+
+
+async def bump_version(db, name="transactions"):
+    doc = await db[VERSION_COLLECTION].find_one_and_update(
+        {"_id": name}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
+
+
+async def get_version(db, name="transactions"):
+    doc = await db[VERSION_COLLECTION].find_one({"_id": name})
+    return doc["version"] if doc else 0
+
+
+class LRUCache:
+    """Thread-safe in-process LRU.
+
+    Any object with the same get/set/clear methods can stand in as a
+    ResponseCache backend, e.g. one backed by Redis.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResponseCache:
+    """Serialized responses keyed by route, query parameters and collection version"""
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else LRUCache()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def etag(path, params, version):
+        query = "&".join(f"{k}={v}" for k, v in sorted(params))
+        digest = hashlib.sha1(f"{path}?{query}".encode()).hexdigest()[:16]
+        return f'"{digest}-{version}"'
+
+    async def get_or_compute(self, key, compute):
+        """Return the cached body for key, computing and storing it on a miss"""
+        body = self.backend.get(key)
+        if body is not None:
+            self.hits += 1
+            return body
+        self.misses += 1
+        body = await compute()
+        self.backend.set(key, body)
+        return body
@@ -0,0 +1,165 @@
+# columnar.py - Optional vectorized analytics over an in-memory columnar snapshot
+import threading
+
+import numpy as np
+import pandas as pd
+
+import analytics
+from analytics import TAX_SECTIONS
+
+FIELDS = ["id", "date", "amount", "type", "mode", "category", "merchant", "taxFlags", "isHighValue"]
+CATEGORICAL = ["type", "mode", "category", "merchant"]
+
+
+def _rows(series, key="_id"):
+    return [{key: k, "amount": float(v)} for k, v in series.items()]
+
+
+def _top(frame, field, limit=None):
+    """Same ordering as the $group/$sort stages: amount desc, then key asc"""
+    totals = frame.groupby(field, observed=True)["amount"].sum().reset_index()
+    totals = totals.sort_values(["amount", field], ascending=[False, True])
+    if limit:
+        totals = totals.head(limit)
+    return [{"_id": k, "amount": float(v)} for k, v in zip(totals[field], totals["amount"])]
+
+
+class TransactionSnapshot:
+    """Columnar copy of db.transactions for the analytics views.
+
+    Categories, merchants, modes and types are stored as categorical codes,
+    dates as datetime64, and every view is a vectorized groupby whose rows
+    are handed to the same shapers the Mongo pipelines use.
+    """
+
+    def __init__(self, records=()):
+        self._frame = self._to_frame(list(records))
+        # Transactions written since the last merge, by id; the latest copy wins
+        self._pending = {}
+        self._buffering = threading.Lock()
+        self._merging = threading.Lock()
+
+    @staticmethod
+    def _to_frame(records):
+        frame = pd.DataFrame.from_records(records, columns=FIELDS)
+        frame["date"] = frame["date"].astype(object)
+        frame["day"] = pd.to_datetime(frame["date"].str.slice(0, 10), format="%Y-%m-%d")
+        frame["month"] = frame["day"].dt.year * 100 + frame["day"].dt.month
+        frame["amount"] = frame["amount"].astype("float64")
+        frame["isHighValue"] = frame["isHighValue"].astype(bool)
+        for field in CATEGORICAL:
+            frame[field] = frame[field].astype("category")
+
+        # One boolean column per deduction section, computed once per row at load
+        flags = frame["taxFlags"].explode()
+        frame["hasTax"] = frame["taxFlags"].str.len() > 0
+        for flag in TAX_SECTIONS:
+            frame[f"tax_{flag}"] = (flags == flag).groupby(level=0).any().astype(bool)
+        return frame
+
+    @classmethod
+    async def load(cls, db, batch_size=10000):
+        """Stream db.transactions into a new snapshot"""
+        records = await db.transactions.find({}, {"_id": 0, **{f: 1 for f in FIELDS}}).batch_size(batch_size).to_list(None)
+        return cls(records)
+
+    def append(self, records):
+        """Queue newly written transactions; called on every write batch, so it
+        only buffers them until the next view merges them in
+        """
+        with self._buffering:
+            for record in records:
+                self._pending[record["id"]] = record
+
+    @property
+    def frame(self):
+        """The snapshot, with buffered writes folded in. A write replaces the row
+        with its id where it stands, so rows stay in insertion order like the
+        collection's natural order, which the tax_summary list follows.
+
+        Views may run in worker threads while the event loop keeps appending.
+        """
+        with self._merging:
+            with self._buffering:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return self._frame
+            new = self._to_frame(list(pending.values()))
+            # Where each new row goes: its predecessor's position, or the end
+            order = pd.Index(self._frame["id"]).get_indexer(new["id"])
+            added = order < 0
+            order[added] = len(self._frame) + np.arange(added.sum())
+            kept = self._frame[~self._frame["id"].isin(new["id"])]
+            positions = np.concatenate([kept.index.to_numpy(), order])
+            frame = pd.concat([kept, new], ignore_index=True)
+            frame = frame.iloc[np.argsort(positions, kind="stable")].reset_index(drop=True)
+            # Categories of the two frames differ, so concat falls back to objects
+            for field in CATEGORICAL:
+                frame[field] = frame[field].astype("category")
+            self._frame = frame
+            return frame
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _facets(self, name):
+        f = self.frame
+        income = f["type"] == "income"
+
+        if name == "summary":
+            if f.empty:
+                return {"totals": []}
+            return {"totals": [{
+                "totalIncome": float(f["amount"][income].sum()),
+                "totalExpenses": float(f["amount"][f["type"] == "expense"].sum()),
+                "highValueCount": int(f["isHighValue"].sum()),
+                "totalTransactions": len(f),
+            }]}
+
+        if name == "category_summary":
+            return {"categories": _top(f[f["type"] == "expense"], "category")}
+
+        if name == "monthly_summary":
+            split = pd.DataFrame({
+                "income": f["amount"].where(income, 0.0),
+                "expenses": f["amount"].where(~income, 0.0),
+            })
+            months = split.groupby(f["month"]).sum()
+            return {"months": [
+                {"_id": f"{row.Index // 100:04d}-{row.Index % 100:02d}", "income": float(row.income), "expenses": float(row.expenses)}
+                for row in months.itertuples()
+            ]}
+
+        if name == "tax_summary":
+            totals = [
+                {"_id": flag, "amount": float(f["amount"][f[f"tax_{flag}"]].sum())}
+                for flag in TAX_SECTIONS if f[f"tax_{flag}"].any()
+            ]
+            rows = f[f["hasTax"]]
+            return {
+                "taxTotals": totals,
+                "taxTransactions": [
+                    {"date": d, "merchant": m, "category": c, "amount": a, "taxFlags": t}
+                    for d, m, c, a, t in zip(*(rows[c].tolist() for c in ["date", "merchant", "category", "amount", "taxFlags"]))
+                ],
+            }
+
+        if name == "spend_insights":
+            expenses = f[f["type"] == "expense"]
+            daily = expenses.groupby("day")["amount"].sum().sort_index()
+            daily.index = daily.index.strftime("%Y-%m-%d")
+            return {
+                "daily": _rows(daily),
+                "topCategories": _top(expenses, "category", 5),
+                "topMerchants": _top(expenses, "merchant", 5),
+            }
+
+        raise KeyError(name)
+
+    def compute_view(self, name):
+        """Compute one analytics view, shaped exactly like analytics.compute_view"""
+        return analytics.SHAPERS[name](self._facets(name))
+
+    def compute_views(self):
+        """Every analytics view, keyed as in the dashboard payload"""
+        return {key: self.compute_view(name) for name, key in analytics.DASHBOARD_KEYS.items()}
@@ -0,0 +1,70 @@
+# conftest.py - Fixtures shared by the backend tests
+import time
+import contextlib
+import pytest
+
+# What the stubbed yfinance lookup answers for every ticker
+FUNDAMENTALS = {"pe_ratio": 30.1, "roe": 1.5, "sector": "Technology"}
+
+
+@pytest.fixture
+def counts():
+    """counts(name, **labels): how far a prometheus sample moved during the test.
+
+    The registry is process-wide, so tests compare against its value at the start
+    rather than resetting it.
+    """
+    registry = pytest.importorskip("prometheus_client").REGISTRY
+
+    def snapshot():
+        return {(s.name, tuple(sorted(s.labels.items()))): s.value
+                for metric in registry.collect() for s in metric.samples}
+
+    start = snapshot()
+
+    def count(name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        return snapshot().get(key, 0.0) - start.get(key, 0.0)
+    return count
+
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    """upstreams(delays=None, market_delay=0.0): stub the data sources of an analysis.
+
+    Points the Yahoo chart and Serper URLs at a StubUpstreams server (with `delays`
+    per path, see StubUpstreams) and answers fundamentals after `market_delay`
+    seconds, since yfinance has no configurable endpoint. The test gets an empty
+    in-memory source cache; the server stops when it ends.
+    """
+    from financial_agent import pure_tools, source_cache
+    from stub_upstreams import StubUpstreams
+
+    source_cache.set_cache(source_cache.SourceCache(path=""))
+
+    with contextlib.ExitStack() as servers:
+        def start(delays=None, market_delay=0.0):
+            stub = servers.enter_context(StubUpstreams(delays))
+            monkeypatch.setattr(pure_tools, "YAHOO_CHART_URL", f"{stub.url}/chart")
+            monkeypatch.setattr(pure_tools, "SERPER_URL", stub.url)
+
+            def market_data(ticker):
+                time.sleep(market_delay)
+                return {"ticker": ticker, **FUNDAMENTALS}
+
+            monkeypatch.setattr(pure_tools, "get_market_data", market_data)
+            return stub
+        yield start
+
+
+@pytest.fixture
+def use_llm(monkeypatch):
+    """use_llm(delay=0.0, response=ANALYSIS_JSON): answer analyses with a fake_llm, returned"""
+    from financial_agent import langchain_agent
+    from stub_upstreams import fake_llm
+
+    def use(*args, **kwargs):
+        llm = fake_llm(*args, **kwargs)
+        monkeypatch.setattr(langchain_agent, "llm", llm)
+        return llm
+    return use
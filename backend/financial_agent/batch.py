@@ -0,0 +1,57 @@
+# batch.py - Portfolio analyses: bulk resolution and prefetch, bounded LLM concurrency
+import asyncio
+from . import pure_tools
+from .config import BATCH_LLM_CONCURRENCY
+from .gather import run_sync
+from .langchain_agent import run_analysis_async
+from .source_cache import get_cache
+from .utils import get_tickers_async
+
+
+async def prefetch_prices(tickers: list):
+    """Seed the price cache from one multi-ticker download; per-ticker fetches fill any gaps"""
+    try:
+        prices = await run_sync(pure_tools.download_prices, tickers)
+    except Exception as e:
+        print(f"Bulk price download failed: {e}")
+        return
+    cache = get_cache()
+    for ticker, price in prices.items():
+        cache.put("price", ticker, price)
+
+
+async def analyze_batch(holdings: list, llm_concurrency: int = BATCH_LLM_CONCURRENCY):
+    """Analyze holdings ({"company_name", "ticker", "quantity"}, name or ticker required)
+    and yield one result per holding, in completion order.
+    """
+    names = [h["company_name"] for h in holdings if not h.get("ticker")]
+    resolved = await get_tickers_async(list(dict.fromkeys(names))) if names else {}
+    tickers = [h.get("ticker") or resolved.get(h["company_name"]) for h in holdings]
+    await prefetch_prices([t for t in tickers if t])
+
+    llm_limit = asyncio.Semaphore(llm_concurrency)
+
+    async def analyze(index, holding, ticker):
+        company = holding.get("company_name") or ticker
+        header = {"index": index, "company_name": company}
+        if not ticker:
+            return {**header, "error": "Could not find ticker symbol"}
+        result = await run_analysis_async(ticker.upper(), company, llm_limit)
+        result = {**header, **result}
+        quantity = holding.get("quantity")
+        if quantity is not None:
+            result["quantity"] = quantity
+            try:
+                result["position_value"] = round(quantity * float(result["current_stock_price"]), 2)
+            except (KeyError, TypeError, ValueError):
+                pass
+        return result
+
+    tasks = [asyncio.ensure_future(analyze(i, h, t)) for i, (h, t) in enumerate(zip(holdings, tickers))]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        # The client went away mid-stream: stop the analyses nobody will read
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,297 @@
+# cassette.py - Record upstream responses per ticker and replay them offline
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from pathlib import Path
+from contextlib import contextmanager
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+import httpx
+
+from .config import CASSETTE_MODE, CASSETTE_DIR, CASSETTE_LATENCY
+
+# "record": pass calls through and save their responses; "replay": answer from the
+# cassettes and never touch the network; anything else: off
+MODE = CASSETTE_MODE
+DIRECTORY = CASSETTE_DIR
+# "recorded" (each call's own latency), "zero", "p50" or "p99" (every call of an
+# upstream at that percentile of its recordings), or a profile such as
+# "yahoo=0.08:0.4,gemini=1.5:6" giving p50:p99 seconds to sample per upstream
+LATENCY = CASSETTE_LATENCY
+
+# Calls made outside any ticker's analysis (ticker resolution, bulk price downloads)
+UNSCOPED = "_unscoped"
+SECRET_PARAMS = {"apikey", "api_key", "key", "token"}
+# z-score of the 99th percentile of a normal distribution
+Z99 = 2.3263
+
+_ticker = contextvars.ContextVar("cassette_ticker", default=None)
+_cassettes = {}
+_percentiles = None
+_lock = threading.Lock()
+_rng = random.Random(0)
+
+
+class CassetteMiss(LookupError):
+    """A replayed call has no recording in its cassette"""
+
+
+@contextmanager
+def use(ticker: str):
+    """Record and replay the upstream calls of this context (and the tasks and
+    fetch-pool calls it starts) in the ticker's cassette
+    """
+    token = _ticker.set(ticker.upper())
+    try:
+        yield
+    finally:
+        _ticker.reset(token)
+
+
+def _key(upstream, request) -> str:
+    return json.dumps([upstream, request], sort_keys=True, default=str)
+
+
+class Cassette:
+    """The recorded interactions of one ticker, saved as JSON after every call.
+
+    Replay answers the n-th call with a given upstream and request with the n-th
+    recording of it, cycling, so recorded retries and repeat calls play back in order.
+    """
+
+    def __init__(self, path, fresh=False):
+        self.path = Path(path)
+        self.interactions = []
+        if not fresh and self.path.exists():
+            self.interactions = json.loads(self.path.read_text())["interactions"]
+        self._index = {}
+        for interaction in self.interactions:
+            self._index.setdefault(_key(interaction["upstream"], interaction["request"]), []).append(interaction)
+        self._replayed = {}
+        self._lock = threading.Lock()
+
+    def record(self, upstream, request, response, seconds):
+        interaction = {"upstream": upstream, "request": request, "response": response, "seconds": round(seconds, 4)}
+        with self._lock:
+            self.interactions.append(interaction)
+            self._index.setdefault(_key(upstream, request), []).append(interaction)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"ticker": self.path.stem, "interactions": self.interactions}, indent=1, default=str))
+            os.replace(tmp, self.path)
+
+    def next(self, upstream, request) -> dict:
+        key = _key(upstream, request)
+        with self._lock:
+            recordings = self._index.get(key)
+            if not recordings:
+                raise CassetteMiss(f"No recorded {upstream} call {json.dumps(request, default=str)} in {self.path}")
+            n = self._replayed.get(key, 0)
+            self._replayed[key] = n + 1
+            return recordings[n % len(recordings)]
+
+
+def current() -> Cassette:
+    name = (_ticker.get() or UNSCOPED).replace("/", "_")
+    with _lock:
+        cassette = _cassettes.get(name)
+        if cassette is None:
+            # A recording session starts each ticker's cassette over
+            cassette = _cassettes[name] = Cassette(Path(DIRECTORY) / f"{name}.json", fresh=MODE == "record")
+        return cassette
+
+
+def reset():
+    """Forget loaded cassettes, e.g. after changing MODE or DIRECTORY"""
+    global _percentiles
+    with _lock:
+        _cassettes.clear()
+        _percentiles = None
+
+
+# -- Latency ----------------------------------------------------------------
+
+def parse_profile(spec: str) -> dict:
+    """"yahoo=0.08:0.4,gemini=1.5:6" -> {"yahoo": (0.08, 0.4), "gemini": (1.5, 6.0)}"""
+    profile = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        upstream, _, seconds = part.partition("=")
+        p50, _, p99 = seconds.partition(":")
+        profile[upstream.strip()] = (float(p50), float(p99 or p50))
+    return profile
+
+
+def latency_profile(directory=None) -> dict:
+    """{upstream: (p50, p99)} of the latencies recorded in a directory of cassettes"""
+    samples = {}
+    for path in sorted(Path(directory or DIRECTORY).glob("*.json")):
+        for interaction in json.loads(path.read_text())["interactions"]:
+            samples.setdefault(interaction["upstream"], []).append(interaction["seconds"])
+    return {upstream: (_percentile(values, 0.5), _percentile(values, 0.99)) for upstream, values in samples.items()}
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, math.ceil(q * len(values)) - 1)]
+
+
+def _sample(p50, p99):
+    """A log-normal latency with the given median and 99th percentile"""
+    sigma = math.log(p99 / p50) / Z99 if p50 > 0 and p99 > p50 else 0.0
+    with _lock:
+        return p50 * math.exp(sigma * _rng.gauss(0, 1))
+
+
+def latency(upstream: str, recorded: float) -> float:
+    """Seconds a replayed call of `upstream` takes under LATENCY"""
+    global _percentiles
+    if LATENCY == "zero":
+        return 0.0
+    if LATENCY in ("p50", "p99"):
+        if _percentiles is None:
+            _percentiles = latency_profile()
+        p50, p99 = _percentiles.get(upstream, (recorded, recorded))
+        return p50 if LATENCY == "p50" else p99
+    if LATENCY != "recorded":
+        profile = parse_profile(LATENCY).get(upstream)
+        if profile:
+            return _sample(*profile)
+    return recorded
+
+
+# -- Record / replay --------------------------------------------------------
+
+def _same(value):
+    return value
+
+
+def recorded(upstream: str, request: dict, call, encode=_same, decode=_same):
+    """call(), recorded in or replayed from the current cassette. `request` (JSON)
+    identifies the call; encode/decode convert its result to and from JSON.
+    """
+    if MODE == "replay":
+        interaction = current().next(upstream, request)
+        time.sleep(latency(upstream, interaction["seconds"]))
+        return decode(interaction["response"])
+    if MODE != "record":
+        return call()
+    start = time.perf_counter()
+    value = call()
+    current().record(upstream, request, encode(value), time.perf_counter() - start)
+    return value
+
+
+async def arecorded(upstream: str, request: dict, call, encode=_same, decode=_same):
+    """recorded() for a call returning an awaitable"""
+    if MODE == "replay":
+        interaction = current().next(upstream, request)
+        await asyncio.sleep(latency(upstream, interaction["seconds"]))
+        return decode(interaction["response"])
+    if MODE != "record":
+        return await call()
+    start = time.perf_counter()
+    value = await call()
+    current().record(upstream, request, encode(value), time.perf_counter() - start)
+    return value
+
+
+async def arecorded_stream(upstream: str, request: dict, stream, encode=_same, decode=_same):
+    """Async iterator over stream(), recorded with each chunk's offset; replay
+    keeps the chunks' relative timing, scaled to the call's LATENCY
+    """
+    if MODE == "replay":
+        interaction = current().next(upstream, request)
+        total = interaction["seconds"]
+        scale = latency(upstream, total) / total if total else 0.0
+        elapsed = 0.0
+        for offset, chunk in interaction["response"]:
+            await asyncio.sleep(max(0.0, offset * scale - elapsed))
+            elapsed = max(elapsed, offset * scale)
+            yield decode(chunk)
+        return
+    if MODE != "record":
+        async for chunk in stream():
+            yield chunk
+        return
+    start = time.perf_counter()
+    chunks = []
+    async for chunk in stream():
+        chunks.append([round(time.perf_counter() - start, 4), encode(chunk)])
+        yield chunk
+    current().record(upstream, request, chunks, time.perf_counter() - start)
+
+
+# -- HTTP and LLM codecs ----------------------------------------------------
+
+def http_request(method: str, url: str, kwargs: dict) -> dict:
+    """What identifies an HTTP call, without API keys"""
+    parts = urlsplit(url)
+    params = parse_qsl(parts.query) + list((kwargs.get("params") or {}).items())
+    query = urlencode(sorted((k, str(v)) for k, v in params if k.lower() not in SECRET_PARAMS))
+    return {
+        "method": method,
+        "url": f"{parts.scheme}://{parts.netloc}{parts.path}" + (f"?{query}" if query else ""),
+        "json": kwargs.get("json"),
+    }
+
+
+def _encode_response(response: httpx.Response) -> dict:
+    return {"status": response.status_code, "headers": {k: v for k, v in response.headers.items()
+                                                        if k.lower() in ("content-type", "retry-after")},
+            "body": response.text}
+
+
+def _decoder(method, url):
+    def decode(recorded):
+        return httpx.Response(recorded["status"], headers=recorded["headers"],
+                              content=recorded["body"].encode(), request=httpx.Request(method, url))
+    return decode
+
+
+def send(client: httpx.Client, upstream: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """One attempt of client.request(), through the cassette"""
+    return recorded(upstream, http_request(method, url, kwargs), lambda: client.request(method, url, **kwargs),
+                    _encode_response, _decoder(method, url))
+
+
+async def asend(client: httpx.AsyncClient, upstream: str, method: str, url: str, **kwargs) -> httpx.Response:
+    return await arecorded(upstream, http_request(method, url, kwargs), lambda: client.request(method, url, **kwargs),
+                           _encode_response, _decoder(method, url))
+
+
+def encode_message(message) -> dict:
+    if isinstance(message, Exception):
+        return {"error": str(message)}
+    return {"content": message.content, "usage": getattr(message, "usage_metadata", None)}
+
+
+def decode_message(recorded: dict):
+    from langchain_core.messages import AIMessage
+    if "error" in recorded:
+        return RuntimeError(recorded["error"])
+    return AIMessage(content=recorded["content"], **({"usage_metadata": recorded["usage"]} if recorded["usage"] else {}))
+
+
+def decode_chunk(recorded: dict):
+    from langchain_core.messages import AIMessageChunk
+    return AIMessageChunk(content=recorded["content"], **({"usage_metadata": recorded["usage"]} if recorded["usage"] else {}))
+
+
+def encode_messages(messages: list) -> list:
+    return [encode_message(m) for m in messages]
+
+
+def decode_messages(recorded: list) -> list:
+    return [decode_message(m) for m in recorded]
+
+
+if __name__ == "__main__":
+    # Print the p50:p99 profile of a directory of recordings, ready for CASSETTE_LATENCY
+    profile = latency_profile(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(",".join(f"{upstream}={p50}:{p99}" for upstream, (p50, p99) in sorted(profile.items())))
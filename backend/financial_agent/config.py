@@ -10,3 +10,52 @@ load_dotenv(env_path)
 SERPER_API_KEY = os.getenv("SERPER_API_KEY")
 FMP_API_KEY = os.getenv("FMP_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# Upstream endpoints, overridable so analyses can run against local stubs
+YAHOO_CHART_URL = os.getenv("YAHOO_CHART_URL", "https://query1.finance.yahoo.com/v8/finance/chart")
+SERPER_URL = os.getenv("SERPER_URL", "https://google.serper.dev")
+
+# Concurrent data gathering for run_analysis; FETCH_WORKERS also bounds the pool
+# that run_analysis_async uses for calls with no async client (yfinance)
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "16"))
+ANALYSIS_DEADLINE = float(os.getenv("ANALYSIS_DEADLINE", "12"))
+
+# Shared HTTP transport (financial_agent/transport.py)
+FMP_URL = os.getenv("FMP_URL", "https://financialmodelingprep.com/api/v3")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.25"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "10"))
+
+# Tiered cache around the pure_tools sources (financial_agent/source_cache.py);
+# SOURCE_CACHE_PATH="" keeps it in memory only
+SOURCE_CACHE_PATH = os.getenv("SOURCE_CACHE_PATH", str(Path(__file__).parent.parent / ".cache" / "sources.sqlite3"))
+SOURCE_CACHE_SIZE = int(os.getenv("SOURCE_CACHE_SIZE", "2048"))
+SOURCE_TTLS = {
+    "price": float(os.getenv("PRICE_TTL", "15")),
+    "market_data": float(os.getenv("MARKET_DATA_TTL", str(6 * 3600))),
+    "news": float(os.getenv("NEWS_TTL", "900")),
+    "sustainability": float(os.getenv("SUSTAINABILITY_TTL", str(24 * 3600))),
+    # Final analyses, keyed on a fingerprint of the prompt inputs
+    "analysis": float(os.getenv("ANALYSIS_CACHE_TTL", "3600")),
+}
+# Relative width of the price buckets in the analysis fingerprint (1%)
+ANALYSIS_PRICE_BUCKET = float(os.getenv("ANALYSIS_PRICE_BUCKET", "0.01"))
+
+# Offline ticker resolution (financial_agent/ticker_index.py); LLM answers for
+# names the listings miss are appended to TICKER_LEARNED_PATH
+TICKER_LISTINGS_PATH = os.getenv("TICKER_LISTINGS_PATH", str(Path(__file__).parent / "data" / "listings.csv"))
+TICKER_LEARNED_PATH = os.getenv("TICKER_LEARNED_PATH", str(Path(__file__).parent.parent / ".cache" / "learned_tickers.csv"))
+
+# Portfolio analyses (/api/financial-analysis/batch)
+BATCH_MAX_COMPANIES = int(os.getenv("BATCH_MAX_COMPANIES", "100"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+# Record/replay of upstream responses (financial_agent/cassette.py): CASSETTE_MODE=record
+# saves the Yahoo, yfinance, Serper and Gemini responses of each ticker's analysis under
+# CASSETTE_DIR; CASSETTE_MODE=replay answers from them offline, with CASSETTE_LATENCY
+# "recorded", "zero", "p50", "p99" or a p50:p99 profile per upstream
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "")
+CASSETTE_DIR = os.getenv("CASSETTE_DIR", str(Path(__file__).parent.parent / "cassettes"))
+CASSETTE_LATENCY = os.getenv("CASSETTE_LATENCY", "recorded")
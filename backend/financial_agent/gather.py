@@ -0,0 +1,119 @@
+# gather.py - Concurrent fetching of the data sources behind an analysis
+import asyncio
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait
+from . import pure_tools, metrics
+from .config import FETCH_WORKERS, ANALYSIS_DEADLINE
+
+# Shared by all analyses so a burst cannot open unbounded threads; on the async
+# path it only runs what has no async client (yfinance, sync LLM fallbacks)
+_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="analysis-fetch")
+
+
+# Span (and stream_analysis event) name of each data source
+STAGES = {
+    "price_data": "price",
+    "market_data": "fundamentals",
+    "news_data": "news",
+    "sustainability_data": "esg",
+}
+
+
+def _timed(name, fn, *args):
+    with metrics.span(STAGES[name]):
+        return fn(*args)
+
+
+async def _atimed(name, coro):
+    with metrics.span(STAGES[name]):
+        return await coro
+
+
+def _sources(ticker: str, company_name: str) -> dict:
+    return {
+        "market_data": (pure_tools.get_market_data, ticker),
+        "price_data": (pure_tools.get_latest_price, ticker),
+        "news_data": (pure_tools.get_company_news, company_name),
+        "sustainability_data": (pure_tools.get_sustainability_data, company_name),
+    }
+
+
+def gather_data(ticker: str, company_name: str, deadline: float = ANALYSIS_DEADLINE) -> dict:
+    """Fetch market data, price, news and ESG data concurrently.
+    Sources that fail or are still running at the deadline come back as empty dicts,
+    so latency is bounded by the slowest source or the deadline, whichever is first.
+    """
+    # Each call runs in a copy of the caller's context, so its span joins the caller's trace
+    futures = {
+        name: _executor.submit(contextvars.copy_context().run, _timed, name, fn, arg)
+        for name, (fn, arg) in _sources(ticker, company_name).items()
+    }
+    wait(futures.values(), timeout=deadline)
+
+    results = {}
+    for name, future in futures.items():
+        if future.done() and future.exception() is None:
+            results[name] = future.result()
+        else:
+            future.cancel()
+            reason = "timed out" if not future.done() else future.exception()
+            print(f"Dropped {name} for {ticker}: {reason}")
+            results[name] = {}
+    return results
+
+
+async def run_sync(fn, *args, **kwargs):
+    """Run a blocking call on the bounded fetch pool instead of the event loop.
+    The caller's context goes with it, so rate limits in force still apply.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, partial(context.run, fn, *args, **kwargs))
+
+
+def _async_sources(ticker: str, company_name: str) -> dict:
+    sources = {
+        "market_data": run_sync(pure_tools.get_market_data, ticker),
+        "price_data": pure_tools.get_latest_price_async(ticker),
+        "news_data": pure_tools.get_company_news_async(company_name),
+        "sustainability_data": pure_tools.get_sustainability_data_async(company_name),
+    }
+    return {name: _atimed(name, coro) for name, coro in sources.items()}
+
+
+async def iter_data_async(ticker: str, company_name: str, deadline: float = ANALYSIS_DEADLINE):
+    """Yield (source name, result) as each source finishes; sources still running
+    at the deadline (or failing) are yielded as empty dicts.
+    """
+    loop = asyncio.get_running_loop()
+    names = {
+        asyncio.ensure_future(coro): name
+        for name, coro in _async_sources(ticker, company_name).items()
+    }
+    pending = set(names)
+    cutoff = loop.time() + deadline
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(0, cutoff - loop.time()), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for task in done:
+                if task.exception() is None:
+                    yield names[task], task.result()
+                else:
+                    print(f"Dropped {names[task]} for {ticker}: {task.exception()}")
+                    yield names[task], {}
+        for task in pending:
+            print(f"Dropped {names[task]} for {ticker}: timed out")
+            yield names[task], {}
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def gather_data_async(ticker: str, company_name: str, deadline: float = ANALYSIS_DEADLINE) -> dict:
+    """Async gather_data: HTTP sources use async clients, yfinance goes through run_sync"""
+    return {name: result async for name, result in iter_data_async(ticker, company_name, deadline)}
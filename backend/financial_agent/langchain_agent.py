@@ -1,63 +1,41 @@
 # Simplified LangChain implementation using chains
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
-from .config import GOOGLE_API_KEY
-from .pure_tools import get_market_data, get_latest_price, get_company_news, get_sustainability_data
+from .config import GOOGLE_API_KEY, ANALYSIS_PRICE_BUCKET
+from .gather import gather_data, gather_data_async, iter_data_async, STAGES
+from . import metrics, cassette
+from .metrics import ANALYSIS_CACHE_LOOKUPS, ANALYSIS_CACHE_TOKENS, ANALYSIS_REPLIES
+from .source_cache import get_cache
+from .schemas import GreenStockDecision
+from pydantic import ValidationError
+import hashlib
 import json
+import math
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Initialize LLM - using flash model for lower token usage
-llm = ChatGoogleGenerativeAI(
-    model="models/gemini-flash-latest",
-    google_api_key=GOOGLE_API_KEY,
-    temperature=0.15
-)
+MODEL = "models/gemini-flash-latest"
 
-def run_analysis(ticker: str, company_name: str) -> dict:
-    """Run financial analysis using LangChain chains"""
-    try:
-        # Step 1: Gather data
-        market_data = get_market_data(ticker)
-        price_data = get_latest_price(ticker)
-        news_data = get_company_news(company_name)
-        sustainability_data = get_sustainability_data(company_name)
-        
-        # Extract only essential data to reduce tokens
-        price = price_data.get("price", "N/A")
-        currency = price_data.get("currency", "USD")
-        
-        # Extract essential data directly from the new yfinance-based structure
-        essential_data = {
-            "pe_ratio": market_data.get("pe_ratio"),
-            "roe": market_data.get("roe"),
-            "profit_margin": market_data.get("profit_margin"),
-            "debt_to_equity": market_data.get("debt_to_equity"),
-            "sector": market_data.get("sector"),
-            "description": market_data.get("description"),
-        }
-        
-        # Get only first 3 news items
-        news_items = news_data.get("news_results", {}).get("news", [])[:3] if isinstance(news_data.get("news_results"), dict) else []
-        
-        # Get sustainability snippets
-        sust_organic = sustainability_data.get("sustainability_results", {}).get("organic", [])[:3] if isinstance(sustainability_data.get("sustainability_results"), dict) else []
-        sust_snippets = [item.get("snippet", "") for item in sust_organic]
-        sust_text = "; ".join(sust_snippets)
-        
-        # Step 2: Create concise analysis prompt
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a stock analyst. Analyze the data and respond with ONLY valid JSON (no markdown, no extra text):
-{{
-  "decision": "BUY|HOLD|SELL",
-  "current_stock_price": "{price}",
-  "risk_level": "LOW|MEDIUM|HIGH",
-  "time_horizon": "SHORT_TERM|MEDIUM_TERM|LONG_TERM",
-  "current_financial_condition": "brief summary",
-  "reasons": ["reason1", "reason2", "reason3"],
-  "key_metrics_considered": ["metric1", "metric2"],
-  "green_score": "1-10 score based on eco-friendliness",
-  "green_summary": "brief explanation of the green score"
-}}"""),
-            ("human", """Analyze {company} ({ticker}):
+# Created on first use rather than at import: building the client resolves
+# credentials, which can take seconds. Tests and benchmarks assign their own.
+llm = None
+
+
+def get_llm():
+    global llm
+    if llm is None:
+        llm = ChatGoogleGenerativeAI(model=MODEL, google_api_key=GOOGLE_API_KEY, temperature=0.15)
+    return llm
+
+
+# Concise analysis prompt; the reply's structure comes from RESPONSE_SCHEMA
+prompt = ChatPromptTemplate.from_messages([
+    ("system", """You are a stock analyst. Analyze the data and reply in the given JSON schema: \
+time_horizon is SHORT_TERM, MEDIUM_TERM or LONG_TERM, give a brief current_financial_condition \
+and three reasons, and rate eco-friendliness as a green_score from 1 to 10 with a brief green_summary."""),
+    ("human", """Analyze {company} ({ticker}):
 Price: ${price}
 PE: {pe}, ROE: {roe}, Margin: {margin}
 Debt/Equity: {debt}
@@ -66,71 +44,332 @@ Recent news: {news}
 Sustainability Info: {sustainability}
 
 Provide JSON analysis:""")
-        ])
-        
-        # Step 3: Run analysis
-        chain = prompt | llm
-        result = chain.invoke({
-            "company": company_name,
-            "ticker": ticker,
-            "price": price,
-            "pe": essential_data.get("pe_ratio", "N/A"),
-            "roe": essential_data.get("roe", "N/A"),
-            "margin": essential_data.get("profit_margin", "N/A"),
-            "debt": essential_data.get("debt_to_equity", "N/A"),
-            "sector": essential_data.get("sector", "N/A"),
-            "news": str(news_items[:2]) if news_items else "No recent news",
-            "sustainability": sust_text if sust_text else "No specific sustainability data found"
-        })
-        
-        # Step 4: Parse output
-        output = result.content
-        print(f"LLM Output: {output}")  # Debug logging
-        
-        # Extract JSON from the output
-        start_idx = output.find('{')
-        end_idx = output.rfind('}') + 1
-        if start_idx != -1 and end_idx > start_idx:
-            json_str = output[start_idx:end_idx]
-            try:
-                analysis_result = json.loads(json_str)
-            except json.JSONDecodeError as e:
-                print(f"JSON parse error: {e}")
-                print(f"JSON string: {json_str}")
-                # Fallback
-                analysis_result = {
-                    "decision": "HOLD",
-                    "current_stock_price": str(price),
-                    "risk_level": "MEDIUM",
-                    "time_horizon": "MEDIUM_TERM",
-                    "current_financial_condition": "Unable to parse LLM response",
-                    "reasons": ["JSON parsing failed"],
-                    "key_metrics_considered": []
-                }
-        else: # If no valid JSON block is found
-            analysis_result = {
-                "decision": "HOLD",
-                "current_stock_price": str(price),
-                "risk_level": "MEDIUM",
-                "time_horizon": "MEDIUM_TERM",
-                "current_financial_condition": "LLM response did not contain valid JSON",
-                "reasons": ["LLM response format error"],
-                "key_metrics_considered": []
-            }
-        
-        # Add metadata to result
-        analysis_result["company"] = company_name
-        analysis_result["ticker"] = ticker
-        analysis_result["currency"] = currency
-        
+])
+
+# Targeted repair: only the invalid reply and what is wrong with it, not the data again
+repair_prompt = ChatPromptTemplate.from_messages([
+    ("system", "Correct this stock analysis JSON so it satisfies the schema. Change only what the errors point at."),
+    ("human", "Errors:\n{errors}\n\nJSON:\n{reply}"),
+])
+
+# Filled in from the request and the live price rather than by the model
+METADATA_FIELDS = ("company", "ticker", "current_stock_price")
+
+
+def _response_schema() -> dict:
+    schema = GreenStockDecision.model_json_schema()
+    for field in METADATA_FIELDS:
+        schema["properties"].pop(field, None)
+    return schema
+
+
+RESPONSE_SCHEMA = _response_schema()
+
+
+def structured_llm():
+    """llm in native JSON output mode, constrained to RESPONSE_SCHEMA"""
+    return get_llm().bind(response_mime_type="application/json", response_schema=RESPONSE_SCHEMA)
+
+
+def build_prompt_inputs(ticker: str, company_name: str, data: dict) -> dict:
+    """Reduce the gathered data to the prompt variables"""
+    market_data = data["market_data"]
+    price_data = data["price_data"]
+    news_data = data["news_data"]
+    sustainability_data = data["sustainability_data"]
+
+    # Extract only essential data to reduce tokens
+    price = price_data.get("price", "N/A")
+
+    # Extract essential data directly from the new yfinance-based structure
+    essential_data = {
+        "pe_ratio": market_data.get("pe_ratio"),
+        "roe": market_data.get("roe"),
+        "profit_margin": market_data.get("profit_margin"),
+        "debt_to_equity": market_data.get("debt_to_equity"),
+        "sector": market_data.get("sector"),
+        "description": market_data.get("description"),
+    }
+
+    # Get only first 3 news items
+    news_items = news_data.get("news_results", {}).get("news", [])[:3] if isinstance(news_data.get("news_results"), dict) else []
+
+    # Get sustainability snippets
+    sust_organic = sustainability_data.get("sustainability_results", {}).get("organic", [])[:3] if isinstance(sustainability_data.get("sustainability_results"), dict) else []
+    sust_snippets = [item.get("snippet", "") for item in sust_organic]
+    sust_text = "; ".join(sust_snippets)
+
+    return {
+        "company": company_name,
+        "ticker": ticker,
+        "price": price,
+        "pe": essential_data.get("pe_ratio", "N/A"),
+        "roe": essential_data.get("roe", "N/A"),
+        "margin": essential_data.get("profit_margin", "N/A"),
+        "debt": essential_data.get("debt_to_equity", "N/A"),
+        "sector": essential_data.get("sector", "N/A"),
+        "news": str(news_items[:2]) if news_items else "No recent news",
+        "sustainability": sust_text if sust_text else "No specific sustainability data found"
+    }
+
+
+def validation_errors(output: str):
+    """None when the reply is a valid GreenStockDecision, else its errors, one per line"""
+    try:
+        GreenStockDecision.model_validate_json(output)
+        return None
+    except ValidationError as e:
+        return "\n".join(f"{'.'.join(map(str, err['loc'])) or 'reply'}: {err['msg']}" for err in e.errors())
+
+
+def parse_output(output: str, price) -> dict:
+    """Validate the LLM reply against GreenStockDecision, falling back to HOLD"""
+    try:
+        with metrics.span("parse"):
+            analysis_result = GreenStockDecision.model_validate_json(output).model_dump(mode="json")
+        analysis_result["current_stock_price"] = str(price)
         return analysis_result
-        
-    except Exception as e:
-        import traceback
-        print(f"Error in run_analysis: {e}")
-        print(traceback.format_exc())
+    except ValidationError as e:
+        logger.warning("Analysis reply failed validation: %s", e)
+        not_json = any(err["type"] == "json_invalid" for err in e.errors())
+        # Fallback
         return {
-            "error": str(e),
-            "company": company_name,
-            "ticker": ticker
+            "decision": "hold",
+            "current_stock_price": str(price),
+            "risk_level": "medium",
+            "time_horizon": "MEDIUM_TERM",
+            "current_financial_condition": "LLM response did not contain valid JSON" if not_json
+            else "LLM response did not match the analysis schema",
+            "reasons": ["LLM response format error" if not_json else "Schema validation failed"],
+            "key_metrics_considered": []
         }
+
+
+def _price_bucket(price):
+    try:
+        return round(math.log(float(price)) / math.log1p(ANALYSIS_PRICE_BUCKET))
+    except (TypeError, ValueError):
+        return str(price)
+
+
+def fingerprint(inputs: dict) -> str:
+    """Hash of the prompt inputs, with the price reduced to a relative bucket so
+    small ticks do not defeat the cache. Model and prompt are part of the key.
+    """
+    key = dict(inputs, price=_price_bucket(inputs["price"]))
+    material = json.dumps(
+        [getattr(get_llm(), "model", ""), prompt.pretty_repr(), RESPONSE_SCHEMA, key], sort_keys=True, default=str
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def _reply(result, call="analysis") -> dict:
+    usage = getattr(result, "usage_metadata", None) or {}
+    metrics.record_tokens(call, usage)
+    return {"content": result.content, "tokens": usage.get("total_tokens", 0)}
+
+
+def _render(inputs: dict) -> list:
+    with metrics.span("prompt"):
+        return prompt.format_messages(**inputs)
+
+
+def _call(inputs: dict) -> dict:
+    messages = _render(inputs)
+    with metrics.span("llm"), metrics.upstream("gemini"):
+        return _reply(cassette.recorded("gemini", {"call": "analysis"}, lambda: structured_llm().invoke(messages),
+                                        cassette.encode_message, cassette.decode_message))
+
+
+async def _acall(inputs: dict) -> dict:
+    messages = _render(inputs)
+    with metrics.span("llm"), metrics.upstream("gemini"):
+        return _reply(await cassette.arecorded("gemini", {"call": "analysis"}, lambda: structured_llm().ainvoke(messages),
+                                               cassette.encode_message, cassette.decode_message))
+
+
+def _validates(reply) -> bool:
+    """Only valid replies are memoized; fallbacks are retried next time"""
+    return validation_errors(reply["content"]) is None
+
+
+def _check(reply):
+    """Validation errors of a fresh reply, or None (counted as validated)"""
+    errors = validation_errors(reply["content"])
+    if errors is None:
+        ANALYSIS_REPLIES.labels("validated").inc()
+    return errors
+
+
+def _repair_inputs(reply, errors) -> dict:
+    return {"reply": reply["content"], "errors": errors}
+
+
+def _settle(reply, repaired) -> dict:
+    """The repaired reply, charged with the tokens of both calls"""
+    ANALYSIS_REPLIES.labels("repaired" if validation_errors(repaired["content"]) is None else "failed").inc()
+    return {"content": repaired["content"], "tokens": reply["tokens"] + repaired["tokens"]}
+
+
+def _repaired(reply) -> dict:
+    """reply if it validates, else the outcome of one repair call"""
+    errors = _check(reply)
+    if errors is None:
+        return reply
+    with metrics.span("repair"), metrics.upstream("gemini"):
+        repaired = cassette.recorded("gemini", {"call": "repair"},
+                                     lambda: (repair_prompt | structured_llm()).invoke(_repair_inputs(reply, errors)),
+                                     cassette.encode_message, cassette.decode_message)
+    return _settle(reply, _reply(repaired, call="repair"))
+
+
+async def _arepaired(reply) -> dict:
+    errors = _check(reply)
+    if errors is None:
+        return reply
+    with metrics.span("repair"), metrics.upstream("gemini"):
+        repaired = await cassette.arecorded("gemini", {"call": "repair"},
+                                            lambda: (repair_prompt | structured_llm()).ainvoke(_repair_inputs(reply, errors)),
+                                            cassette.encode_message, cassette.decode_message)
+    return _settle(reply, _reply(repaired, call="repair"))
+
+
+def _count(reply, computed: bool):
+    ANALYSIS_CACHE_LOOKUPS.labels("miss" if computed else "hit").inc()
+    ANALYSIS_CACHE_TOKENS.labels("spent" if computed else "saved").inc(reply["tokens"])
+
+
+def analyze(inputs: dict) -> dict:
+    """LLM reply for the prompt inputs, memoized on their fingerprint"""
+    computed = False
+
+    def invoke():
+        nonlocal computed
+        computed = True
+        return _repaired(_call(inputs))
+
+    reply = get_cache().get("analysis", fingerprint(inputs), invoke, should_cache=_validates)
+    _count(reply, computed)
+    return reply
+
+
+async def analyze_async(inputs: dict, llm_limit=None) -> dict:
+    """Async analyze(); concurrent identical analyses share one LLM call.
+    llm_limit, an asyncio.Semaphore, bounds concurrent LLM calls (memo hits skip it).
+    """
+    computed = False
+
+    async def invoke():
+        nonlocal computed
+        computed = True
+        if llm_limit is None:
+            return await _arepaired(await _acall(inputs))
+        async with llm_limit:
+            return await _arepaired(await _acall(inputs))
+
+    reply = await get_cache().aget("analysis", fingerprint(inputs), invoke, should_cache=_validates)
+    _count(reply, computed)
+    return reply
+
+
+def _with_metadata(analysis_result: dict, ticker: str, company_name: str, data: dict) -> dict:
+    # Add metadata to result; the live price wins over the one a memoized reply echoed
+    price = data["price_data"].get("price")
+    if price is not None:
+        analysis_result["current_stock_price"] = str(price)
+    analysis_result["company"] = company_name
+    analysis_result["ticker"] = ticker
+    analysis_result["currency"] = data["price_data"].get("currency", "USD")
+    return analysis_result
+
+
+def _error_result(e: Exception, ticker: str, company_name: str) -> dict:
+    logger.error("Analysis of %s failed: %s", ticker, e, exc_info=e)
+    return {
+        "error": str(e),
+        "company": company_name,
+        "ticker": ticker
+    }
+
+
+def _log_spans(ticker: str, spans: dict):
+    logger.info("Analysis timings for %s: %s", ticker, json.dumps(spans))
+
+
+def run_analysis(ticker: str, company_name: str) -> dict:
+    """Run financial analysis using LangChain chains"""
+    with metrics.trace() as spans, cassette.use(ticker):
+        try:
+            # Step 1: Gather data (all sources concurrently, bounded by a deadline)
+            data = gather_data(ticker, company_name)
+            inputs = build_prompt_inputs(ticker, company_name, data)
+
+            # Step 2: Run analysis (memoized on the prompt inputs)
+            reply = analyze(inputs)
+
+            # Step 3: Parse output
+            analysis_result = parse_output(reply["content"], inputs["price"])
+            return _with_metadata(analysis_result, ticker, company_name, data)
+
+        except Exception as e:
+            return _error_result(e, ticker, company_name)
+        finally:
+            _log_spans(ticker, spans)
+
+
+async def run_analysis_async(ticker: str, company_name: str, llm_limit=None) -> dict:
+    """Async run_analysis: async HTTP fetches and ainvoke, never blocking the event loop"""
+    with metrics.trace() as spans, cassette.use(ticker):
+        try:
+            data = await gather_data_async(ticker, company_name)
+            inputs = build_prompt_inputs(ticker, company_name, data)
+
+            reply = await analyze_async(inputs, llm_limit)
+
+            analysis_result = parse_output(reply["content"], inputs["price"])
+            return _with_metadata(analysis_result, ticker, company_name, data)
+
+        except Exception as e:
+            return _error_result(e, ticker, company_name)
+        finally:
+            _log_spans(ticker, spans)
+
+
+async def stream_analysis(ticker: str, company_name: str):
+    """Yield (event, data) pairs as the analysis progresses: one per data source
+    as it arrives, "token" chunks of the LLM reply, then "result" (or "error").
+    """
+    with cassette.use(ticker):
+        try:
+            data = {}
+            async for name, result in iter_data_async(ticker, company_name):
+                data[name] = result
+                yield STAGES[name], result
+
+            inputs = build_prompt_inputs(ticker, company_name, data)
+            key = fingerprint(inputs)
+            cache = get_cache()
+            reply = cache.peek("analysis", key)
+            if reply is not None:
+                _count(reply, computed=False)
+                yield "token", reply["content"]
+            else:
+                full = None
+                messages = _render(inputs)
+                with metrics.span("llm"), metrics.upstream("gemini"):
+                    async for chunk in cassette.arecorded_stream("gemini", {"call": "analysis", "stream": True},
+                                                                 lambda: structured_llm().astream(messages),
+                                                                 cassette.encode_message, cassette.decode_chunk):
+                        full = chunk if full is None else full + chunk
+                        if chunk.content:
+                            yield "token", chunk.content
+                # An invalid reply is repaired in one non-streamed call; "result" carries the fix
+                reply = await _arepaired(_reply(full))
+                _count(reply, computed=True)
+                cache.put("analysis", key, reply, should_cache=_validates)
+
+            analysis_result = parse_output(reply["content"], inputs["price"])
+            yield "result", _with_metadata(analysis_result, ticker, company_name, data)
+
+        except Exception as e:
+            yield "error", _error_result(e, ticker, company_name)
@@ -1,5 +1,7 @@
 # main.py
-from .langchain_agent import run_analysis
+from .langchain_agent import run_analysis, run_analysis_async, stream_analysis
+from .batch import analyze_batch
+from .utils import get_ticker_async
 
 # Export the function
-__all__ = ['run_analysis']
+__all__ = ['run_analysis', 'run_analysis_async', 'stream_analysis', 'analyze_batch', 'get_ticker_async']
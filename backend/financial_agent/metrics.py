@@ -0,0 +1,91 @@
+# metrics.py - Prometheus timings and token counts for the analysis pipeline
+import time
+import contextvars
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram
+
+# From cache hits (milliseconds) to slow LLM calls and the analysis deadline
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "finguard_analysis_stage_seconds", "Time spent in each analysis stage",
+    ["stage"], buckets=BUCKETS,
+)
+UPSTREAM_SECONDS = Histogram(
+    "finguard_upstream_request_seconds", "Latency of each upstream request attempt",
+    ["upstream", "outcome"], buckets=BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "finguard_llm_tokens", "LLM tokens reported in response usage metadata",
+    ["call", "kind"],
+)
+
+# Memoized LLM replies: lookups count analyses, tokens what the misses cost and the hits saved
+ANALYSIS_CACHE_LOOKUPS = Counter(
+    "finguard_analysis_cache_lookups", "Analyses served from the LLM reply memo or computed",
+    ["result"],
+)
+ANALYSIS_CACHE_TOKENS = Counter(
+    "finguard_analysis_cache_tokens", "LLM tokens spent on memo misses and saved by memo hits",
+    ["kind"],
+)
+# Fresh LLM replies that validated first time, were fixed by the repair call, or
+# failed both (HOLD fallback); the repair calls' cost is in finguard_llm_tokens{call="repair"}
+ANALYSIS_REPLIES = Counter(
+    "finguard_analysis_replies", "Fresh LLM replies by schema validation outcome",
+    ["outcome"],
+)
+
+# Spans of the analysis running in this context, {stage: seconds}
+_trace = contextvars.ContextVar("analysis_trace", default=None)
+
+
+@contextmanager
+def trace():
+    """Collect the spans recorded in this context (and the tasks and fetch-pool
+    calls it starts) into the dict it yields.
+    """
+    spans = {}
+    token = _trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _trace.reset(token)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a pipeline stage: ticker resolution, a data source, prompt, llm, repair or parse"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        spans = _trace.get()
+        if spans is not None:
+            spans[stage] = round(spans.get(stage, 0.0) + elapsed, 4)
+
+
+def record_upstream(upstream: str, seconds: float, outcome: str):
+    UPSTREAM_SECONDS.labels(upstream, outcome).observe(seconds)
+
+
+@contextmanager
+def upstream(name: str):
+    """Time a call to an upstream without an HTTP status of its own (yfinance, Gemini)"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        record_upstream(name, time.perf_counter() - start, outcome)
+
+
+def record_tokens(call: str, usage: dict):
+    """Count input/output tokens of one LLM call ("analysis", "repair", "ticker")"""
+    for kind in ("input", "output"):
+        tokens = (usage or {}).get(f"{kind}_tokens")
+        if tokens:
+            LLM_TOKENS.labels(call, kind).inc(tokens)
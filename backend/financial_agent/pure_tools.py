@@ -1,19 +1,24 @@
 # Pure Python tools without CrewAI dependencies
-import requests
-import json
 import urllib.parse
 import yfinance as yf
-from .config import FMP_API_KEY, SERPER_API_KEY
+from . import transport, ratelimit, metrics, cassette
+from .source_cache import cached
+from .config import FMP_API_KEY, SERPER_API_KEY, YAHOO_CHART_URL, SERPER_URL
 
+YFINANCE_HOST = "query2.finance.yahoo.com"
 
+
+@cached("market_data")
 def get_market_data(ticker: str) -> dict:
     """Fetch market data for a stock ticker using yfinance.
     Returns a dict with key financial metrics.
     """
     t = ticker.upper().strip()
     try:
-        ticker_obj = yf.Ticker(t)
-        info = ticker_obj.info
+        # yfinance brings its own session, so only the per-host and rate limits apply
+        ratelimit.throttle("yahoo")
+        with transport.host_limit(YFINANCE_HOST), metrics.upstream("yfinance"):
+            info = cassette.recorded("yfinance", {"info": t}, lambda: yf.Ticker(t).info)
         
         # Map yfinance info to a standardized format
         return {
@@ -31,6 +36,63 @@ def get_market_data(ticker: str) -> dict:
         return {"error": str(e), "ticker": t}
 
 
+# Currencies implied by the listing suffix, for prices that come without one
+SUFFIX_CURRENCIES = {"": "USD", "NS": "INR", "BO": "INR"}
+
+
+def download_prices(tickers: list) -> dict:
+    """Latest close for many tickers in one yfinance multi-ticker download.
+    Returns {ticker: latest-price dict}; tickers without a price, or whose
+    listing currency cannot be inferred, are left out.
+    """
+    tickers = sorted({t.upper().strip() for t in tickers})
+    if not tickers:
+        return {}
+    ratelimit.throttle("yahoo")
+    with transport.host_limit(YFINANCE_HOST), metrics.upstream("yfinance"):
+        return cassette.recorded("yfinance", {"download": tickers}, lambda: _download_prices(tickers))
+
+
+def _download_prices(tickers: list) -> dict:
+    data = yf.download(tickers, period="5d", interval="1d", group_by="ticker",
+                       auto_adjust=False, progress=False, threads=True)
+    if data is None:
+        return {}
+    prices = {}
+    for t in tickers:
+        suffix = t.rsplit(".", 1)[1] if "." in t else ""
+        try:
+            closes = data[t]["Close"].dropna()
+        except KeyError:
+            continue
+        if len(closes) and suffix in SUFFIX_CURRENCIES:
+            prices[t] = {"ticker": t, "price": round(float(closes.iloc[-1]), 4), "currency": SUFFIX_CURRENCIES[suffix]}
+    return prices
+
+
+def _chart_url(tkr: str) -> str:
+    return f"{YAHOO_CHART_URL}/{urllib.parse.quote(tkr)}?interval=1d&range=1d"
+
+
+def _chart_price(resp):
+    if resp and "chart" in resp and resp["chart"].get("result"):
+        meta = resp["chart"]["result"][0].get("meta", {})
+        return meta.get("regularMarketPrice"), meta.get("currency")
+    return None, None
+
+
+def _serper_headers() -> dict:
+    return {
+        "X-API-KEY": SERPER_API_KEY or "",
+        "Content-Type": "application/json",
+    }
+
+
+NEWS_QUERY = "{company} latest stock news earnings updates"
+SUSTAINABILITY_QUERY = "{company} ESG score sustainability report carbon footprint environment impact"
+
+
+@cached("price")
 def get_latest_price(ticker: str) -> dict:
     """Fetch the latest stock price using Yahoo Finance (free, no API key).
     Returns a dict with the price and the currency reported by Yahoo Finance.
@@ -39,19 +101,10 @@ def get_latest_price(ticker: str) -> dict:
     original = ticker.upper().strip()
 
     def fetch(tkr: str):
-        encoded_tkr = urllib.parse.quote(tkr)
-        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{encoded_tkr}?interval=1d&range=1d"
-        headers = {"User-Agent": "Mozilla/5.0"}
         try:
-            resp = requests.get(url, headers=headers, timeout=10).json()
-            if resp and "chart" in resp and resp["chart"].get("result"):
-                result = resp["chart"]["result"][0]
-                price = result.get("meta", {}).get("regularMarketPrice")
-                currency = result.get("meta", {}).get("currency")
-                return price, currency
+            return _chart_price(transport.get_json(_chart_url(tkr), source="yahoo"))
         except Exception:
-            pass
-        return None, None
+            return None, None
 
     price, currency = fetch(original)
     if price is None and "." not in original:
@@ -59,39 +112,66 @@ def get_latest_price(ticker: str) -> dict:
     return {"ticker": original, "price": price, "currency": currency}
 
 
+@cached("price")
+async def get_latest_price_async(ticker: str) -> dict:
+    """Async get_latest_price, for callers running on an event loop."""
+    original = ticker.upper().strip()
+
+    async def fetch(tkr: str):
+        try:
+            return _chart_price(await transport.aget_json(_chart_url(tkr), source="yahoo"))
+        except Exception:
+            return None, None
+
+    price, currency = await fetch(original)
+    if price is None and "." not in original:
+        price, currency = await fetch(f"{original}.NS")
+    return {"ticker": original, "price": price, "currency": currency}
+
+
+@cached("news", normalize=str.lower)
 def get_company_news(company: str) -> dict:
     """Fetch recent news for a company using the Serper.dev news API.
     Returns a dict with the raw API response under the key "news_results".
     """
     try:
-        url = "https://google.serper.dev/news"
-        query = f"{company} latest stock news earnings updates"
-        payload = json.dumps({"q": query})
-        headers = {
-            "X-API-KEY": SERPER_API_KEY,
-            "Content-Type": "application/json",
-        }
-        response = requests.post(url, headers=headers, data=payload, timeout=10)
-        result = response.json()
+        query = NEWS_QUERY.format(company=company)
+        result = transport.post_json(f"{SERPER_URL}/news", headers=_serper_headers(), json={"q": query}, source="serper")
         return {"company": company, "news_results": result}
     except Exception as e:
         return {"error": str(e), "company": company}
 
 
+@cached("sustainability", normalize=str.lower)
 def get_sustainability_data(company: str) -> dict:
     """Fetch sustainability and ESG data for a company using Serper.dev.
     Returns a dict with the raw API response under the key "sustainability_results".
     """
     try:
-        url = "https://google.serper.dev/search"
-        query = f"{company} ESG score sustainability report carbon footprint environment impact"
-        payload = json.dumps({"q": query})
-        headers = {
-            "X-API-KEY": SERPER_API_KEY,
-            "Content-Type": "application/json",
-        }
-        response = requests.post(url, headers=headers, data=payload, timeout=10)
-        result = response.json()
+        query = SUSTAINABILITY_QUERY.format(company=company)
+        result = transport.post_json(f"{SERPER_URL}/search", headers=_serper_headers(), json={"q": query}, source="serper")
+        return {"company": company, "sustainability_results": result}
+    except Exception as e:
+        return {"error": str(e), "company": company}
+
+
+@cached("news", normalize=str.lower)
+async def get_company_news_async(company: str) -> dict:
+    """Async get_company_news."""
+    try:
+        query = NEWS_QUERY.format(company=company)
+        result = await transport.apost_json(f"{SERPER_URL}/news", headers=_serper_headers(), json={"q": query}, source="serper")
+        return {"company": company, "news_results": result}
+    except Exception as e:
+        return {"error": str(e), "company": company}
+
+
+@cached("sustainability", normalize=str.lower)
+async def get_sustainability_data_async(company: str) -> dict:
+    """Async get_sustainability_data."""
+    try:
+        query = SUSTAINABILITY_QUERY.format(company=company)
+        result = await transport.apost_json(f"{SERPER_URL}/search", headers=_serper_headers(), json={"q": query}, source="serper")
         return {"company": company, "sustainability_results": result}
     except Exception as e:
         return {"error": str(e), "company": company}
@@ -0,0 +1,90 @@
+# ratelimit.py - Token-bucket rate limits per upstream source, scoped to a context
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Source names the fetchers report: "yahoo" (chart API and yfinance), "serper",
+# "fmp", and "llm" for callers that pass a limit as analyze_async's llm_limit
+_limits = contextvars.ContextVar("rate_limits", default=None)
+
+
+class RateLimit:
+    """Token bucket allowing `rate` calls per second in bursts of up to `burst`.
+
+    Thread-safe; usable from threads (acquire), coroutines (wait) and as an
+    async context manager, so it can stand in for the semaphore analyze_async
+    takes as llm_limit.
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token; returns how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def wait(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def __aenter__(self):
+        await self.wait()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+def parse(spec: str) -> dict:
+    """'yahoo=20,serper=5' -> {"yahoo": RateLimit(20), "serper": RateLimit(5)}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        source, _, rate = item.partition("=")
+        limits[source.strip()] = RateLimit(float(rate))
+    return limits
+
+
+@contextmanager
+def limited(limits: dict):
+    """Rate-limit the upstream calls made in this context, including the tasks
+    it starts and the fetch-pool calls made through gather.run_sync.
+    """
+    token = _limits.set(limits)
+    try:
+        yield
+    finally:
+        _limits.reset(token)
+
+
+def current(source: str):
+    """The RateLimit for source in the current context, or None (unlimited)"""
+    return (_limits.get() or {}).get(source)
+
+
+def throttle(source: str):
+    limit = current(source)
+    if limit is not None:
+        limit.acquire()
+
+
+async def athrottle(source: str):
+    limit = current(source)
+    if limit is not None:
+        await limit.wait()
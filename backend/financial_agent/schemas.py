@@ -1,6 +1,6 @@
 # schemas.py
-from pydantic import BaseModel
-from typing import List, Literal
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
 
 Decision = Literal["strong_buy", "buy", "hold", "sell", "avoid"]
 Risk = Literal["low", "medium", "high"]
@@ -15,3 +15,20 @@ class StockDecision(BaseModel):
     current_financial_condition: str           # NEW FIELD
     reasons: List[str]
     key_metrics_considered: List[str]
+
+
+class GreenStockDecision(StockDecision):
+    """StockDecision plus the green score, as produced by the LangChain analyst.
+    company, ticker and the price are filled in from the request, not by the model.
+    """
+    company: str = ""
+    ticker: str = ""
+    current_stock_price: Optional[float] = None
+    green_score: int = Field(ge=1, le=10, description="eco-friendliness from 1 (worst) to 10 (best)")
+    green_summary: str
+
+    @field_validator("decision", "risk_level", mode="before")
+    @classmethod
+    def _normalize_case(cls, value):
+        # "BUY", "Strong Buy" -> "buy", "strong_buy"
+        return value.strip().lower().replace(" ", "_") if isinstance(value, str) else value
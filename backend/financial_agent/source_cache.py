@@ -0,0 +1,264 @@
+# source_cache.py - Tiered TTL cache around the pure_tools data sources
+import json
+import time
+import asyncio
+import sqlite3
+import weakref
+import threading
+import functools
+from pathlib import Path
+from collections import OrderedDict, Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .config import SOURCE_CACHE_PATH, SOURCE_CACHE_SIZE, SOURCE_TTLS
+
+# An entry is fresh for its source's TTL, then served stale (while one
+# background fetch refreshes it) for as long again before it counts as a miss.
+STALE_RATIO = 1.0
+# Sources that must not be served stale (a stale analysis would spend LLM tokens
+# revalidating entries nobody asked to refresh)
+STALE_RATIOS = {"analysis": 0.0}
+
+
+def _ttl(source):
+    return SOURCE_TTLS[source]
+
+
+def cacheable(value) -> bool:
+    """Failed lookups are not cached: error dicts, prices that came back empty and
+    payloads with nothing but the ticker (yfinance's answer for unknown symbols)
+    """
+    if not isinstance(value, dict) or "error" in value:
+        return False
+    if "price" in value and value["price"] is None:
+        return False
+    return any(v is not None for k, v in value.items() if k != "ticker")
+
+
+class SourceCache:
+    """In-memory LRU in front of a SQLite table, with stale-while-revalidate and
+    single-flight fetches. path="" keeps the cache in memory only.
+    """
+
+    def __init__(self, path=SOURCE_CACHE_PATH, maxsize=SOURCE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.stats = Counter()
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._ainflight = weakref.WeakKeyDictionary()
+        self._background = set()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="source-refresh")
+
+        self._db = None
+        if path:
+            if path != ":memory:":
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            # WAL without fsync on commit: a lost write only costs a refetch
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS source_cache ("
+                "source TEXT, key TEXT, value TEXT, fetched_at REAL, PRIMARY KEY (source, key))"
+            )
+            self._db.commit()
+
+    # -- tiers -------------------------------------------------------------
+
+    def _recall(self, source, key):
+        """(value, fetched_at) from memory, or None"""
+        with self._lock:
+            entry = self._memory.get((source, key))
+            if entry is not None:
+                self._memory.move_to_end((source, key))
+            return entry
+
+    def _load(self, source, key):
+        """(value, fetched_at) from SQLite, promoted to memory, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, fetched_at FROM source_cache WHERE source = ? AND key = ?", (source, key)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = (json.loads(row[0]), row[1])
+        self._remember(source, key, entry)
+        return entry
+
+    def _read(self, source, key):
+        """(value, fetched_at) from memory, else from SQLite"""
+        entry = self._recall(source, key)
+        if entry is None and self._db is not None:
+            entry = self._load(source, key)
+        return entry
+
+    async def _aread(self, source, key):
+        """_read with the SQLite lookup in a thread, off the event loop"""
+        entry = self._recall(source, key)
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._load, source, key)
+        return entry
+
+    def _remember(self, source, key, entry):
+        with self._lock:
+            self._memory[(source, key)] = entry
+            self._memory.move_to_end((source, key))
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def _store(self, source, key, value, should_cache):
+        """Remember a cacheable value in memory; returns the entry SQLite still needs"""
+        if not should_cache(value):
+            return None
+        entry = (value, time.time())
+        self._remember(source, key, entry)
+        return entry if self._db is not None else None
+
+    def _persist(self, source, key, entry):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO source_cache VALUES (?, ?, ?, ?)",
+                (source, key, json.dumps(entry[0]), entry[1]),
+            )
+            self._db.commit()
+
+    def _write(self, source, key, value, should_cache=cacheable):
+        entry = self._store(source, key, value, should_cache)
+        if entry is not None:
+            self._persist(source, key, entry)
+
+    async def _awrite(self, source, key, value, should_cache=cacheable):
+        """_write with the SQLite commit in a thread, off the event loop"""
+        entry = self._store(source, key, value, should_cache)
+        if entry is not None:
+            await asyncio.to_thread(self._persist, source, key, entry)
+
+    def _state(self, source, entry):
+        if entry is None:
+            return "miss"
+        age = time.time() - entry[1]
+        if age < _ttl(source):
+            return "hit"
+        stale_ratio = STALE_RATIOS.get(source, STALE_RATIO)
+        return "stale" if age < _ttl(source) * (1 + stale_ratio) else "miss"
+
+    def peek(self, source, key):
+        """The fresh value for key or None, for callers that fetch by other means (streaming)"""
+        entry = self._read(source, key)
+        state = self._state(source, entry)
+        self.stats[source, "hit" if state == "hit" else "miss"] += 1
+        return entry[0] if state == "hit" else None
+
+    def put(self, source, key, value, should_cache=cacheable):
+        """Store a value fetched elsewhere, e.g. by a bulk download"""
+        self._write(source, key, value, should_cache)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM source_cache")
+                self._db.commit()
+
+    # -- sync --------------------------------------------------------------
+
+    def _fetch(self, source, key, fetch, should_cache=cacheable):
+        """Single-flight: concurrent callers for one key share a single fetch"""
+        with self._lock:
+            future = self._inflight.get((source, key))
+            leader = future is None
+            if leader:
+                future = self._inflight[(source, key)] = Future()
+        if not leader:
+            return future.result()
+        try:
+            value = fetch()
+            self._write(source, key, value, should_cache)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[(source, key)]
+
+    def get(self, source, key, fetch, should_cache=cacheable):
+        entry = self._read(source, key)
+        state = self._state(source, entry)
+        self.stats[source, state] += 1
+        if state == "hit":
+            return entry[0]
+        if state == "stale":
+            self._refresher.submit(self._fetch, source, key, fetch, should_cache)
+            return entry[0]
+        return self._fetch(source, key, fetch, should_cache)
+
+    # -- async -------------------------------------------------------------
+
+    async def _afetch(self, source, key, fetch, should_cache=cacheable):
+        inflight = self._ainflight.setdefault(asyncio.get_running_loop(), {})
+        task = inflight.get((source, key))
+        if task is None:
+            async def run():
+                try:
+                    value = await fetch()
+                    await self._awrite(source, key, value, should_cache)
+                    return value
+                finally:
+                    del inflight[(source, key)]
+
+            task = inflight[(source, key)] = asyncio.ensure_future(run())
+        # shield: one caller timing out must not cancel the fetch the others wait on
+        return await asyncio.shield(task)
+
+    async def aget(self, source, key, fetch, should_cache=cacheable):
+        entry = await self._aread(source, key)
+        state = self._state(source, entry)
+        self.stats[source, state] += 1
+        if state == "hit":
+            return entry[0]
+        if state == "stale":
+            task = asyncio.ensure_future(self._afetch(source, key, fetch, should_cache))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+            return entry[0]
+        return await self._afetch(source, key, fetch, should_cache)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SourceCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SourceCache()
+        return _cache
+
+
+def set_cache(cache):
+    """Swap the process-wide cache (tests use an in-memory one)"""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def cached(source, normalize=str.upper):
+    """Decorate a one-argument pure_tools fetcher (sync or async) with the cache"""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(arg):
+                key = normalize(arg.strip())
+                return await get_cache().aget(source, key, lambda: fn(arg))
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(arg):
+            key = normalize(arg.strip())
+            return get_cache().get(source, key, lambda: fn(arg))
+        return wrapper
+    return decorator
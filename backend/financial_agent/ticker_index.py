@@ -0,0 +1,259 @@
+# ticker_index.py - Offline company name -> ticker resolution
+import re
+import csv
+import sys
+import bisect
+import argparse
+import threading
+from pathlib import Path
+from collections import defaultdict
+
+from .config import TICKER_LISTINGS_PATH, TICKER_LEARNED_PATH
+
+FIELDS = ["ticker", "name", "exchange", "aliases"]
+
+# Words dropped from the end (and "the" from the start) of names before matching
+SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "companies", "ltd", "limited",
+    "plc", "llc", "sa", "nv", "ag", "group", "holding", "holdings", "com", "and",
+}
+# A prefix must be this many whole leading words of a name: one word ("home",
+# "general") says too little to commit to a ticker without asking the LLM
+MIN_PREFIX_WORDS = 2
+FUZZY_THRESHOLD = 0.6
+# A fuzzy match must beat the best match for any other ticker by this much
+FUZZY_MARGIN = 0.1
+TICKER_PATTERN = re.compile(r"^[A-Z0-9&\-\.]{1,20}$")
+
+
+def normalize(name: str) -> str:
+    """Lowercase, '&' -> 'and', punctuation folded and legal suffixes dropped"""
+    text = name.lower().replace("&", " and ").replace("'", "")
+    words = re.sub(r"[^a-z0-9]+", " ", text).split()
+    if words and words[0] == "the":
+        words = words[1:]
+    while len(words) > 1 and words[-1] in SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _similarity(a: str, b: str) -> float:
+    """Dice similarity of two keys' trigrams"""
+    x, y = trigrams(a), trigrams(b)
+    return 2 * len(x & y) / (len(x) + len(y))
+
+
+def _covered(key: str, name: str) -> bool:
+    """Whether every word of key, legal words aside, is a close spelling of some word of name"""
+    words = name.split()
+    return all(any(_similarity(word, other) >= FUZZY_THRESHOLD for other in words)
+               for word in key.split() if word not in SUFFIXES)
+
+
+class TickerIndex:
+    """Exact, prefix and trigram-fuzzy lookups over listed company names.
+
+    Exact matches cover normalized names, aliases and symbols; prefixes of
+    whole leading words resolve only when every name they match points at one
+    ticker; fuzzy matches need a Dice similarity of FUZZY_THRESHOLD over name
+    trigrams, a clear lead over every other ticker, and every word of the
+    query and of the name matching a word of the other ("Microsft" resolves,
+    "Microsoft Teams" does not).
+    """
+
+    def __init__(self, learned_path=None):
+        self.learned_path = learned_path
+        self.exact = {}
+        self._entries = set()
+        self._sorted = None
+        self._trigrams = []
+        self._postings = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, ticker: str, name: str, aliases=()):
+        ticker = ticker.strip().upper()
+        keys = [normalize(name)] + [normalize(a) for a in aliases]
+        symbol = ticker.lower()
+        with self._lock:
+            # A symbol typed as-is, and NSE symbols without their suffix
+            self.exact.setdefault(symbol, ticker)
+            self.exact.setdefault(symbol.rsplit(".ns", 1)[0], ticker)
+            for key in filter(None, keys):
+                self.exact[key] = ticker
+                entry = (key, ticker)
+                if entry not in self._entries:
+                    self._entries.add(entry)
+                    self._sorted = None
+                    grams = trigrams(key)
+                    self._trigrams.append((key, ticker, len(grams)))
+                    for gram in grams:
+                        self._postings[gram].append(len(self._trigrams) - 1)
+
+    def load(self, path):
+        """Add every row of a listings CSV (ticker,name,exchange,aliases)"""
+        path = Path(path)
+        if not path.exists():
+            return 0
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            aliases = [a for a in (row.get("aliases") or "").split(";") if a.strip()]
+            self.add(row["ticker"], row["name"], aliases)
+        return len(rows)
+
+    def _prefix(self, key):
+        """Tickers of the names whose leading words are key (at most two, enough to tell it is ambiguous)"""
+        if self._sorted is None:
+            self._sorted = sorted(self._entries)
+        key += " "
+        i = bisect.bisect_left(self._sorted, (key, ""))
+        tickers = set()
+        while i < len(self._sorted) and self._sorted[i][0].startswith(key) and len(tickers) < 2:
+            tickers.add(self._sorted[i][1])
+            i += 1
+        return tickers
+
+    def _fuzzy(self, key):
+        grams = trigrams(key)
+        shared = defaultdict(int)
+        for gram in grams:
+            for i in self._postings.get(gram, ()):
+                shared[i] += 1
+        best = {}
+        for i, count in shared.items():
+            name, ticker, size = self._trigrams[i]
+            best[ticker] = max(best.get(ticker, (0.0, "")), (2 * count / (len(grams) + size), name))
+        ranked = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:2]
+        if not ranked or ranked[0][1][0] < FUZZY_THRESHOLD:
+            return None
+        if len(ranked) > 1 and ranked[0][1][0] - ranked[1][1][0] < FUZZY_MARGIN:
+            return None
+        ticker, (_, name) = ranked[0]
+        # A close spelling of the whole name, not a listed name inside a longer one
+        if not (_covered(key, name) and _covered(name, key)):
+            return None
+        return ticker
+
+    def resolve(self, name: str):
+        """Ticker for a company name or symbol, or None when the index has no confident match"""
+        key = normalize(name)
+        if not key:
+            return None
+        with self._lock:
+            if key in self.exact:
+                return self.exact[key]
+            tickers = self._prefix(key)
+            if len(tickers) > 1:
+                # "Tata", "Adani": a group name, not a company
+                return None
+            if tickers and len(key.split()) >= MIN_PREFIX_WORDS:
+                return tickers.pop()
+            return self._fuzzy(key)
+
+    def learn(self, name: str, ticker: str):
+        """Remember an externally resolved ticker (e.g. from the LLM) and persist it"""
+        ticker = ticker.strip().upper()
+        if not TICKER_PATTERN.match(ticker) or not normalize(name):
+            return False
+        self.add(ticker, name)
+        if self.learned_path:
+            path = Path(self.learned_path)
+            with self._lock:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                new = not path.exists()
+                with open(path, "a", newline="", encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    if new:
+                        writer.writerow(FIELDS)
+                    writer.writerow([ticker, name.strip(), "LLM", ""])
+        return True
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def load_index(listings=TICKER_LISTINGS_PATH, learned=TICKER_LEARNED_PATH, extra=None) -> TickerIndex:
+    index = TickerIndex(learned_path=learned)
+    index.load(listings)
+    for name, ticker in (extra or {}).items():
+        index.add(ticker, name)
+    if learned:
+        index.load(learned)
+    return index
+
+
+def get_index(extra=None) -> TickerIndex:
+    """Process-wide index, loaded on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = load_index(extra=extra)
+        return _index
+
+
+def set_index(index):
+    global _index
+    with _index_lock:
+        _index = index
+
+
+def read_exchange_listing(path):
+    """Rows from an official symbol directory file:
+    NASDAQ Trader nasdaqlisted.txt / otherlisted.txt (pipe separated) or NSE EQUITY_L.csv.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        header = f.readline()
+        f.seek(0)
+        if "|" in header:
+            for row in csv.DictReader(f, delimiter="|"):
+                symbol = row.get("Symbol") or row.get("ACT Symbol")
+                # The files end with a "File Creation Time" trailer; skip test issues
+                if not symbol or row.get("Test Issue") == "Y" or not row.get("Security Name"):
+                    continue
+                exchange = "NASDAQ" if "Market Category" in row else {"N": "NYSE", "A": "NYSE American"}.get(row.get("Exchange"), "OTHER")
+                name = row["Security Name"].split(" - ")[0]
+                yield {"ticker": symbol.replace(".", "-"), "name": name, "exchange": exchange, "aliases": ""}
+        else:
+            for row in csv.DictReader(f):
+                row = {k.strip(): v for k, v in row.items() if k}
+                if row.get("SYMBOL") and row.get("NAME OF COMPANY"):
+                    yield {"ticker": f"{row['SYMBOL'].strip()}.NS", "name": row["NAME OF COMPANY"].strip(), "exchange": "NSE", "aliases": ""}
+
+
+def import_listings(paths, listings=TICKER_LISTINGS_PATH):
+    """Merge official listings into the bundled file; existing rows (and their aliases) win"""
+    with open(listings, newline="", encoding="utf-8") as f:
+        rows = {row["ticker"]: row for row in csv.DictReader(f)}
+    before = len(rows)
+    for path in paths:
+        for row in read_exchange_listing(path):
+            rows.setdefault(row["ticker"], row)
+    with open(listings, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows.values())
+    return len(rows) - before
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain and query the ticker index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="merge nasdaqlisted.txt / otherlisted.txt / EQUITY_L.csv into the listings")
+    imp.add_argument("files", nargs="+")
+    res = sub.add_parser("resolve", help="resolve company names against the index")
+    res.add_argument("names", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        print(f"Added {import_listings(args.files)} listings to {TICKER_LISTINGS_PATH}")
+    else:
+        index = load_index()
+        for name in args.names:
+            print(f"{name}: {index.resolve(name) or '(miss)'}")
+    sys.exit(0)
@@ -1,8 +1,8 @@
 # tools/latest_price_tool.py
-import requests
 from pydantic import BaseModel
 from crewai.tools import BaseTool
-from ..config import FMP_API_KEY
+from .. import transport
+from ..config import FMP_API_KEY, FMP_URL
 
 
 class LatestPriceInput(BaseModel):
@@ -17,8 +17,7 @@ class LatestPriceTool(BaseTool):
 
     def _run(self, ticker: str):
         ticker = ticker.upper().strip()
-        url = f"https://financialmodelingprep.com/api/v3/quote/{ticker}?apikey={FMP_API_KEY}"
-        response = requests.get(url, timeout=10).json()
+        response = transport.get_json(f"{FMP_URL}/quote/{ticker}", params={"apikey": FMP_API_KEY}, source="fmp")
 
         if not response or isinstance(response, dict):
             return {"ticker": ticker, "price": None}
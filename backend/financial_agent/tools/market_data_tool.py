@@ -1,8 +1,18 @@
 # tools/market_data_tool.py
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel
 from crewai.tools import BaseTool
-from ..config import FMP_API_KEY
+from .. import transport
+from ..config import FMP_API_KEY, FMP_URL
+
+# Name -> (FMP endpoint, extra query params)
+ENDPOINTS = {
+    "profile": ("profile", {}),
+    "ratios": ("ratios", {}),
+    "income": ("income-statement", {"limit": 4}),
+    "balance": ("balance-sheet-statement", {"limit": 4}),
+    "cashflow": ("cash-flow-statement", {"limit": 4}),
+}
 
 
 class MarketDataInput(BaseModel):
@@ -18,20 +28,12 @@ class MarketDataTool(BaseTool):
     def _run(self, ticker: str):
         t = ticker.upper()
 
-        def api(path):
-            return f"https://financialmodelingprep.com/api/v3/{path}/{t}?apikey={FMP_API_KEY}"
-
-        profile   = requests.get(api("profile")).json()
-        ratios    = requests.get(api("ratios")).json()
-        income    = requests.get(api("income-statement?limit=4")).json()
-        balance   = requests.get(api("balance-sheet-statement?limit=4")).json()
-        cashflow  = requests.get(api("cash-flow-statement?limit=4")).json()
-
-        return {
-            "ticker": t,
-            "profile": profile,
-            "ratios": ratios,
-            "income": income,
-            "balance": balance,
-            "cashflow": cashflow
-        }
+        def fetch(endpoint):
+            path, params = endpoint
+            return transport.get_json(f"{FMP_URL}/{path}/{t}", params={**params, "apikey": FMP_API_KEY}, source="fmp")
+
+        # Five calls to one host over the shared keep-alive pool, in parallel
+        with ThreadPoolExecutor(max_workers=len(ENDPOINTS)) as pool:
+            results = dict(zip(ENDPOINTS, pool.map(fetch, ENDPOINTS.values())))
+
+        return {"ticker": t, **results}
@@ -0,0 +1,165 @@
+# transport.py - Shared HTTP transport for every upstream data source
+import time
+import random
+import asyncio
+import weakref
+import threading
+import importlib.util
+from urllib.parse import urlsplit
+
+import httpx
+
+from . import ratelimit, metrics, cassette
+from .config import HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_RETRIES, HTTP_BACKOFF, HTTP_MAX_PER_HOST
+
+# Negotiated over TLS via ALPN; plain-HTTP hosts (local stubs) stay on HTTP/1.1
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 5.0
+
+TIMEOUT = httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+LIMITS = httpx.Limits(max_connections=None, max_keepalive_connections=HTTP_MAX_PER_HOST * 4)
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+
+def _client_kwargs():
+    return {"timeout": TIMEOUT, "limits": LIMITS, "http2": HTTP2, "headers": HEADERS}
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform in [0, HTTP_BACKOFF * 2**attempt]"""
+    return random.uniform(0, min(MAX_BACKOFF, HTTP_BACKOFF * 2 ** attempt))
+
+
+def _retry_delay(response, attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(MAX_BACKOFF, float(retry_after))
+    return backoff(attempt)
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+def _observe(source, url, start, response):
+    """Latency of one attempt, labelled with the source (or host) and status"""
+    outcome = str(response.status_code) if response is not None else "error"
+    metrics.record_upstream(source or _host(url), time.perf_counter() - start, outcome)
+
+
+# Sync side: one pooled keep-alive client shared by all threads, and a
+# semaphore per host so no upstream sees more than HTTP_MAX_PER_HOST requests.
+_client = None
+_host_limits = {}
+_lock = threading.Lock()
+
+
+def client() -> httpx.Client:
+    global _client
+    with _lock:
+        if _client is None:
+            _client = httpx.Client(**_client_kwargs())
+        return _client
+
+
+def host_limit(host: str) -> threading.BoundedSemaphore:
+    """Per-host concurrency limit; also usable by clients with their own session (yfinance)"""
+    with _lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(HTTP_MAX_PER_HOST)
+        return _host_limits[host]
+
+
+def request(method: str, url: str, retries: int = HTTP_RETRIES, source: str = None, **kwargs) -> httpx.Response:
+    """Send a request through the shared client, retrying transport errors and
+    RETRY_STATUSES with jittered backoff. The last response or error is returned/raised.
+    Every attempt counts against the rate limit of `source`, if one is in force.
+    """
+    host = _host(url)
+    limit = host_limit(host)
+    for attempt in range(retries + 1):
+        response = None
+        try:
+            ratelimit.throttle(source)
+            with limit:
+                start = time.perf_counter()
+                try:
+                    response = cassette.send(client(), source or host, method, url, **kwargs)
+                finally:
+                    _observe(source, url, start, response)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+        time.sleep(_retry_delay(response, attempt))
+
+
+def get_json(url: str, **kwargs):
+    return request("GET", url, **kwargs).json()
+
+
+def post_json(url: str, **kwargs):
+    return request("POST", url, **kwargs).json()
+
+
+# Async side: clients and semaphores are bound to the event loop that uses them,
+# so they are kept per loop.
+_async_state = weakref.WeakKeyDictionary()
+
+
+def _loop_state():
+    loop = asyncio.get_running_loop()
+    state = _async_state.get(loop)
+    if state is None:
+        state = _async_state[loop] = {"client": httpx.AsyncClient(**_client_kwargs()), "hosts": {}}
+    return state
+
+
+def async_client() -> httpx.AsyncClient:
+    return _loop_state()["client"]
+
+
+async def arequest(method: str, url: str, retries: int = HTTP_RETRIES, source: str = None, **kwargs) -> httpx.Response:
+    """Async request(), sharing one pooled client per event loop"""
+    state = _loop_state()
+    host = _host(url)
+    if host not in state["hosts"]:
+        state["hosts"][host] = asyncio.Semaphore(HTTP_MAX_PER_HOST)
+    limit = state["hosts"][host]
+
+    for attempt in range(retries + 1):
+        response = None
+        try:
+            await ratelimit.athrottle(source)
+            async with limit:
+                start = time.perf_counter()
+                try:
+                    response = await cassette.asend(state["client"], source or host, method, url, **kwargs)
+                finally:
+                    _observe(source, url, start, response)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+        await asyncio.sleep(_retry_delay(response, attempt))
+
+
+async def aget_json(url: str, **kwargs):
+    return (await arequest("GET", url, **kwargs)).json()
+
+
+async def apost_json(url: str, **kwargs):
+    return (await arequest("POST", url, **kwargs)).json()
+
+
+def close():
+    """Close the shared sync client; per-loop async clients are dropped with their loop"""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
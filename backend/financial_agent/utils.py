@@ -1,9 +1,12 @@
 # utils.py - Simplified ticker lookup using LangChain
+import asyncio
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
-from .config import GOOGLE_API_KEY
+from .config import GOOGLE_API_KEY, BATCH_LLM_CONCURRENCY
+from .ticker_index import get_index
+from . import metrics, cassette, pure_tools
 
-# Common company to ticker mappings as fallback
+# Common company to ticker mappings, folded into the ticker index as aliases
 COMMON_TICKERS = {
     "apple": "AAPL",
     "microsoft": "MSFT",
@@ -22,35 +25,126 @@ COMMON_TICKERS = {
     "mastercard": "MA"
 }
 
-def get_ticker(company_name: str) -> str:
-    """Get stock ticker for a company using LangChain with fallback"""
-    # Try fallback first
-    company_lower = company_name.lower().strip()
-    if company_lower in COMMON_TICKERS:
-        return COMMON_TICKERS[company_lower]
-    
-    try:
-        llm = ChatGoogleGenerativeAI(
-            model="models/gemini-flash-latest",
-            google_api_key=GOOGLE_API_KEY,
-            temperature=0
-        )
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are a financial expert. When given a company name, respond with ONLY the stock ticker symbol. For Indian companies, YOU MUST append '.NS' (e.g., RELIANCE.NS, TATAMOTORS.NS). For US companies, just the ticker (e.g., AAPL). Return ONLY the ticker string, nothing else."),
-            ("human", "What is the stock ticker for {company}?")
-        ])
-        
-        chain = prompt | llm
-        result = chain.invoke({"company": company_name})
-        
-        # Extract ticker from response
-        ticker = result.content.strip().upper()
-        # Remove any extra text, keep only the ticker
-        ticker = ticker.split()[0] if ticker else ""
-        
-        return ticker
-        
-    except Exception as e:
-        print(f"Error getting ticker: {e}")
+TICKER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are a financial expert. When given a company name, respond with ONLY the stock ticker symbol. For Indian companies, YOU MUST append '.NS' (e.g., RELIANCE.NS, TATAMOTORS.NS). For US companies, just the ticker (e.g., AAPL). Return ONLY the ticker string, nothing else."),
+    ("human", "What is the stock ticker for {company}?")
+])
+
+
+def _ticker_chain():
+    llm = ChatGoogleGenerativeAI(
+        model="models/gemini-flash-latest",
+        google_api_key=GOOGLE_API_KEY,
+        temperature=0
+    )
+    return TICKER_PROMPT | llm
+
+
+def _parse_ticker(content: str) -> str:
+    # Extract ticker from response
+    ticker = content.strip().upper()
+    # Remove any extra text, keep only the ticker
+    return ticker.split()[0] if ticker else ""
+
+
+def ticker_index():
+    return get_index(extra=COMMON_TICKERS)
+
+
+def _learn(company_name: str, ticker: str) -> str:
+    """The LLM's answer if Yahoo quotes it (not "NONE" or a made-up symbol), else "".
+    A quoted answer is persisted so the next lookup of this name stays offline;
+    the quote lands in the source cache for the analysis that follows.
+    """
+    if not ticker or pure_tools.get_latest_price(ticker)["price"] is None:
         return ""
+    ticker_index().learn(company_name, ticker)
+    return ticker
+
+
+async def _alearn(company_name: str, ticker: str) -> str:
+    """Async _learn: the index file is appended to off the event loop"""
+    if not ticker or (await pure_tools.get_latest_price_async(ticker))["price"] is None:
+        return ""
+    index = await asyncio.to_thread(ticker_index)
+    await asyncio.to_thread(index.learn, company_name, ticker)
+    return ticker
+
+
+def _answer(result) -> str:
+    metrics.record_tokens("ticker", getattr(result, "usage_metadata", None))
+    return _parse_ticker(result.content)
+
+
+def get_ticker(company_name: str) -> str:
+    """Get stock ticker for a company from the local index, with an LLM fallback on misses"""
+    with metrics.span("resolve"):
+        ticker = ticker_index().resolve(company_name)
+        if ticker:
+            return ticker
+
+        try:
+            with metrics.upstream("gemini"):
+                result = cassette.recorded("gemini", {"call": "ticker", "company": company_name},
+                                           lambda: _ticker_chain().invoke({"company": company_name}),
+                                           cassette.encode_message, cassette.decode_message)
+            return _learn(company_name, _answer(result))
+
+        except Exception as e:
+            print(f"Error getting ticker: {e}")
+            return ""
+
+
+async def get_ticker_async(company_name: str) -> str:
+    """Async get_ticker, so neither loading the index nor the LLM lookup blocks the event loop"""
+    with metrics.span("resolve"):
+        index = await asyncio.to_thread(ticker_index)
+        ticker = index.resolve(company_name)
+        if ticker:
+            return ticker
+
+        try:
+            with metrics.upstream("gemini"):
+                result = await cassette.arecorded("gemini", {"call": "ticker", "company": company_name},
+                                                  lambda: _ticker_chain().ainvoke({"company": company_name}),
+                                                  cassette.encode_message, cassette.decode_message)
+            return await _alearn(company_name, _answer(result))
+
+        except Exception as e:
+            print(f"Error getting ticker: {e}")
+            return ""
+
+
+async def get_tickers_async(company_names: list) -> dict:
+    """Resolve many names at once: index hits first, then one batched LLM call for the misses"""
+    with metrics.span("resolve"):
+        index = await asyncio.to_thread(ticker_index)
+        resolved = {name: index.resolve(name) or "" for name in company_names}
+        misses = [name for name, ticker in resolved.items() if not ticker]
+        if not misses:
+            return resolved
+
+        try:
+            with metrics.upstream("gemini"):
+                results = await cassette.arecorded(
+                    "gemini", {"call": "ticker", "companies": misses},
+                    lambda: _ticker_chain().abatch(
+                        [{"company": name} for name in misses],
+                        config={"max_concurrency": BATCH_LLM_CONCURRENCY},
+                        return_exceptions=True,
+                    ),
+                    cassette.encode_messages, cassette.decode_messages,
+                )
+        except Exception as e:
+            print(f"Error getting tickers: {e}")
+            return resolved
+
+        answers = {}
+        for name, result in zip(misses, results):
+            if isinstance(result, Exception):
+                print(f"Error getting ticker for {name}: {result}")
+                continue
+            answers[name] = _answer(result)
+        learned = await asyncio.gather(*(_alearn(name, ticker) for name, ticker in answers.items()))
+        resolved.update(zip(answers, learned))
+        return resolved
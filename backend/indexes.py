@@ -0,0 +1,112 @@
+# indexes.py - Index bootstrap and query-plan verification for db.transactions
+import os
+import sys
+import asyncio
+import argparse
+from itertools import combinations
+from pathlib import Path
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+
+import queries
+
+# Every listing is sorted on (date, id), so each index ends with that suffix:
+# equality filters narrow the scan and the sort is read straight off the index.
+# date_id on its own covers any filter combination without a blocking SORT.
+# Ingestion upserts are keyed on the transaction id
+ID_INDEX = IndexModel([("id", ASCENDING)], unique=True, name="id_unique")
+
+TRANSACTION_INDEXES = [
+    ID_INDEX,
+    IndexModel([("date", DESCENDING), ("id", DESCENDING)], name="date_id"),
+    IndexModel([("type", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], name="type_date_id"),
+    IndexModel([("mode", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], name="mode_date_id"),
+    IndexModel([("category", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], name="category_date_id"),
+    IndexModel([("isHighValue", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], name="highvalue_date_id"),
+    # Free-text search; language "none" keeps merchant names free of stemming and stop words
+    IndexModel(
+        [(field, TEXT) for field in queries.SEARCH_WEIGHTS],
+        weights=queries.SEARCH_WEIGHTS,
+        default_language="none",
+        name="search_text",
+    ),
+]
+
+# Sample values for every filter get_transactions accepts (search excluded)
+FILTER_SAMPLES = {
+    "type": "expense",
+    "mode": "upi",
+    "category": "Food",
+    "taxEligible": True,
+    "highValue": False,
+}
+
+BAD_STAGES = {"COLLSCAN", "SORT"}
+
+
+async def ensure_indexes(db):
+    """Create the transaction indexes; a no-op when they already exist"""
+    return await db.transactions.create_indexes(TRANSACTION_INDEXES)
+
+
+def filter_permutations():
+    """Every combination of the listing filters, with and without a page cursor"""
+    cursor = queries.encode_cursor({"date": "2025-06-30", "id": "T500"})
+    for size in range(len(FILTER_SAMPLES) + 1):
+        for names in combinations(FILTER_SAMPLES, size):
+            query = queries.build_query(**{name: FILTER_SAMPLES[name] for name in names})
+            yield list(names), query
+            yield list(names) + ["cursor"], queries.after_cursor(query, cursor)
+
+
+def plan_stages(plan):
+    """Collect every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+
+async def verify_query_plans(db, limit=queries.MAX_PAGE_SIZE):
+    """Explain every filter permutation; returns the ones that scan or sort in memory"""
+    failures = []
+    for names, query in filter_permutations():
+        explain = await db.transactions.find(query, {"_id": 0}).sort(queries.SORT).limit(limit).explain()
+        stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+        if BAD_STAGES.intersection(stages):
+            failures.append({"filters": names, "stages": stages})
+    return failures
+
+
+async def _main(command):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        names = await ensure_indexes(db)
+        print(f"Indexes ready: {', '.join(names)}")
+        if command == "ensure":
+            return 0
+
+        failures = await verify_query_plans(db)
+        for f in failures:
+            print(f"Bad plan for filters {f['filters']}: {' -> '.join(f['stages'])}")
+        print(f"{len(failures)} filter permutations fall back to COLLSCAN or in-memory SORT")
+        return 1 if failures else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage and verify db.transactions indexes")
+    parser.add_argument("command", choices=["ensure", "verify"])
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.command)))
@@ -0,0 +1,303 @@
+# ingest.py - Streaming, batched ingestion of Account Aggregator transaction dumps
+import os
+import sys
+import ast
+import json
+import time
+import hashlib
+import uuid
+import asyncio
+import argparse
+import itertools
+from pathlib import Path
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+
+import cache
+import rollups
+from indexes import ID_INDEX
+
+INGEST_STATE_COLLECTION = "ingest_state"
+# Seconds an ingest claims a dump for; renewed while it runs, so a process
+# that dies mid-ingest only holds other workers off this long
+INGEST_LEASE = 60
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 1 << 16
+SEPARATORS = " \t\r\n,"
+
+
+def record_id(item: dict) -> str:
+    """The record's txnId, or a digest of its content when it has none, so a
+    re-ingested record replaces its earlier copy instead of duplicating it
+    """
+    if item.get("txnId"):
+        return item["txnId"]
+    canonical = json.dumps(item, sort_keys=True, separators=(",", ":"), default=str)
+    return "sha1-" + hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def transform_transaction(item: dict) -> dict:
+    """Map a raw Account Aggregator record onto the Transaction model"""
+    # Map type
+    txn_type = "income" if item.get("type") == "CREDIT" else "expense"
+
+    # Map mode
+    mode = item.get("mode", "").lower()
+
+    # Map tax flags
+    tax_flags = []
+    raw_flags = item.get("taxFlags", {})
+    if isinstance(raw_flags, dict):
+        if raw_flags.get("is80C"): tax_flags.append("80C")
+        if raw_flags.get("is80D"): tax_flags.append("80D")
+        if raw_flags.get("is80G"): tax_flags.append("80G")
+        if raw_flags.get("isHRA"): tax_flags.append("HRA")
+
+    # Map tags
+    tags = item.get("tags", [])
+
+    return {
+        "id": record_id(item),
+        "date": item.get("date"),
+        "amount": float(item.get("amount", 0)),
+        "type": txn_type,
+        "mode": mode,
+        "category": item.get("category", "Uncategorized"),
+        "subCategory": item.get("subCategory", "General"),
+        "merchant": item.get("merchant", "Unknown"),
+        "tags": tags,
+        "taxFlags": tax_flags,
+        "narration": item.get("narration", ""),
+        "isHighValue": item.get("isHighValue", False)
+    }
+
+
+def _iter_json_array(f, buf):
+    """Yield the objects of a JSON array one at a time, reading the file in chunks"""
+    decoder = json.JSONDecoder()
+    pos, eof, opened = 0, False, False
+    while True:
+        if not eof and len(buf) - pos < CHUNK_SIZE:
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+        while pos < len(buf) and buf[pos] in SEPARATORS:
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                return
+            continue
+
+        if not opened:
+            if buf[pos] != "[":
+                raise ValueError("Expected a JSON array of transactions")
+            opened = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
+
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The record is larger than the lookahead; read more of it
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        yield item
+        pos = end
+
+
+def iter_records(path):
+    """Yield raw records from a dump without loading the whole file.
+
+    Supports NDJSON (one object per line) and a JSON array, optionally
+    prefixed with "AA_api =". Files that are Python literals rather than
+    JSON fall back to a whole-file ast.literal_eval.
+    """
+    with open(path, 'r') as f:
+        head = f.read(CHUNK_SIZE).lstrip()
+        if head.startswith("AA_api ="):
+            head = head.replace("AA_api =", "", 1).lstrip()
+
+        if head.startswith("{"):
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        yielded = False
+        try:
+            for item in _iter_json_array(f, head):
+                yielded = True
+                yield item
+            return
+        except json.JSONDecodeError:
+            if yielded:
+                raise
+
+    with open(path, 'r') as f:
+        content = f.read().strip()
+    if content.startswith("AA_api ="):
+        content = content.replace("AA_api =", "", 1).strip()
+    yield from ast.literal_eval(content)
+
+
+async def write_batch(db, batch):
+    """Upsert one batch keyed on the transaction id and keep the rollups in step"""
+    ids = [t["id"] for t in batch]
+    async with rollups.writing():
+        existing = await db.transactions.find({"id": {"$in": ids}}, {"_id": 0}).to_list(len(ids))
+        await db.transactions.bulk_write(
+            [ReplaceOne({"id": t["id"]}, t, upsert=True) for t in batch],
+            ordered=False,
+        )
+        await rollups.apply_transactions(db, existing, sign=-1)
+        await rollups.apply_transactions(db, batch)
+    rollups.notify_written(batch)
+    await cache.bump_version(db)
+
+
+def file_hash(path):
+    """SHA-256 of a dump, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _take(items, n):
+    return list(itertools.islice(items, n))
+
+
+async def _claim(db, name, sha256, owner) -> bool:
+    """Mark a dump as being ingested by `owner`, unless another process is
+    ingesting it or has already ingested this version
+    """
+    now = time.time()
+    try:
+        await db[INGEST_STATE_COLLECTION].update_one(
+            {"_id": name, "$or": [
+                {"status": {"$nin": ["ingesting", "done"]}},
+                {"status": "done", "sha256": {"$ne": sha256}},
+                {"status": "ingesting", "leaseUntil": {"$lt": now}},
+            ]},
+            {"$set": {"status": "ingesting", "owner": owner, "leaseUntil": now + INGEST_LEASE}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # The state document exists and did not match: someone else holds it
+        return False
+    return True
+
+
+async def _renew(db, name, owner):
+    while True:
+        await asyncio.sleep(INGEST_LEASE / 3)
+        await db[INGEST_STATE_COLLECTION].update_one(
+            {"_id": name, "owner": owner}, {"$set": {"leaseUntil": time.time() + INGEST_LEASE}})
+
+
+async def ingest_if_changed(db, path, batch_size=BATCH_SIZE, progress=None):
+    """Ingest a dump unless its hash matches the last ingested one; returns None when skipped.
+
+    Every worker process bootstraps, so the dump's ingest_state document doubles
+    as a lock: only the process that claims it ingests, and the others skip.
+    """
+    path = Path(path)
+    # Reads the whole dump, so off the event loop like the parsing in ingest_file
+    sha256 = await asyncio.to_thread(file_hash, path)
+    state = await db[INGEST_STATE_COLLECTION].find_one({"_id": path.name})
+    if state and state.get("sha256") == sha256 and state.get("status", "done") == "done":
+        return None
+    owner = uuid.uuid4().hex
+    if not await _claim(db, path.name, sha256, owner):
+        return None
+
+    renew = asyncio.create_task(_renew(db, path.name, owner))
+    try:
+        stats = await ingest_file(db, path, batch_size, progress)
+    except BaseException:
+        # Released, so the next start retries
+        await asyncio.shield(db[INGEST_STATE_COLLECTION].update_one(
+            {"_id": path.name, "owner": owner}, {"$set": {"status": "failed"}}))
+        raise
+    finally:
+        renew.cancel()
+    await db[INGEST_STATE_COLLECTION].replace_one(
+        {"_id": path.name},
+        {"sha256": sha256, "records": stats["records"], "ingestedAt": time.time(), "status": "done"},
+        upsert=True,
+    )
+    return stats
+
+
+async def ingest_file(db, path, batch_size=BATCH_SIZE, progress=None):
+    """Stream a dump into db.transactions in bounded batches; returns throughput stats.
+
+    `progress`, if given, is called with the running record count after each batch.
+    """
+    # Upserts look transactions up by id, so the index must exist before the first batch
+    await db.transactions.create_indexes([ID_INDEX])
+
+    start = time.perf_counter()
+    records, batches = 0, 0
+    batch = {}
+    items = iter_records(path)
+    # File reads and parsing (including the whole-file literal_eval fallback)
+    # run in a worker thread, a batch of records at a time
+    while chunk := await asyncio.to_thread(_take, items, batch_size):
+        for item in chunk:
+            txn = transform_transaction(item)
+            # Later duplicates within a batch win, as they would across batches
+            batch[txn["id"]] = txn
+            if len(batch) >= batch_size:
+                await write_batch(db, list(batch.values()))
+                records += len(batch)
+                batches += 1
+                batch = {}
+                if progress:
+                    progress(records)
+    if batch:
+        await write_batch(db, list(batch.values()))
+        records += len(batch)
+        batches += 1
+        if progress:
+            progress(records)
+
+    seconds = time.perf_counter() - start
+    return {
+        "records": records,
+        "batches": batches,
+        "seconds": round(seconds, 3),
+        "recordsPerSecond": round(records / seconds, 1) if seconds > 0 else 0,
+    }
+
+
+async def _main(path, batch_size):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        stats = await ingest_file(db, path, batch_size)
+        print(f"Ingested {stats['records']} transactions in {stats['batches']} batches, "
+              f"{stats['seconds']}s ({stats['recordsPerSecond']} records/s)")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest an Account Aggregator transaction dump")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.path, args.batch_size)))
@@ -0,0 +1,216 @@
+# jobs.py - Background analysis jobs, persisted in db.analyses
+import os
+import time
+import uuid
+import asyncio
+from pymongo import IndexModel, ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from financial_agent import ratelimit
+
+JOBS_COLLECTION = "analyses"
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+# Calls per second allowed to each upstream while a job runs ("llm" bounds model calls)
+JOB_RATE_LIMITS = os.environ.get("JOB_RATE_LIMITS", "yahoo=20,serper=5,fmp=5,llm=2")
+# Longest a GET may long-poll a job, in seconds, and how often it re-reads the job
+# meanwhile; jobs finished by this process wake their waiters at once
+JOB_MAX_WAIT = 30
+JOB_POLL_INTERVAL = 0.5
+# Seconds between a process's heartbeats on the jobs it is running; a running
+# job whose owner missed three of them is requeued by whichever process notices
+JOB_HEARTBEAT = float(os.environ.get("JOB_HEARTBEAT", "10"))
+STALE_HEARTBEATS = 3
+
+ACTIVE = ["queued", "running"]
+# What GET returns of a job: not the bookkeeping of the queues sharing it
+JOB_PROJECTION = {"_id": 0, "owner": 0, "heartbeatAt": 0, "activeTicker": 0}
+
+JOB_INDEXES = [
+    IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+    # At most one unfinished job per ticker, across every process: a job carries
+    # activeTicker while queued or running, and the sparse index skips the rest.
+    # (A partial index on ticker would need $in in its filter: MongoDB 6.0+.)
+    IndexModel([("activeTicker", ASCENDING)], unique=True, sparse=True, name="active_ticker_unique"),
+    # Restart recovery looks up unfinished jobs
+    IndexModel([("status", ASCENDING), ("ticker", ASCENDING)], name="status_ticker"),
+    IndexModel([("createdAt", DESCENDING)], name="created"),
+]
+
+
+class JobQueue:
+    """Analysis jobs run by a fixed pool of worker tasks.
+
+    `analyze(ticker, company_name, llm_limit)` produces the result stored on the
+    job (run_analysis_async in the server, a stub in tests); a result with an
+    "error" key marks the job failed. Requests for a ticker that already has
+    a queued or running job get that job instead of a new one.
+
+    Every process serving the API runs its own queue on the shared collection:
+    a unique index coalesces requests from all of them, workers claim a job
+    atomically, mark it with the queue's `owner` id and heartbeat it while it
+    runs, so only the jobs of a dead process are rerun.
+    """
+
+    def __init__(self, db, analyze, workers=JOB_WORKERS, limits=None, heartbeat=JOB_HEARTBEAT):
+        self.collection = db[JOBS_COLLECTION]
+        self.analyze = analyze
+        self.workers = workers
+        self.heartbeat = heartbeat
+        self.owner = uuid.uuid4().hex
+        self.limits = ratelimit.parse(JOB_RATE_LIMITS) if limits is None else limits
+        self._queue = asyncio.Queue()
+        self._queued = set()   # ids waiting in _queue
+        self._running = set()  # ids this process is running, and heartbeats
+        self._finished = asyncio.Event()  # set, then replaced, whenever a job here finishes
+        self._indexed = asyncio.Event()
+        self._tasks = []
+
+    def start(self):
+        """Start the workers, and the heartbeat that requeues jobs dead processes left unfinished"""
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _maintain(self):
+        try:
+            await self.collection.create_indexes(JOB_INDEXES)
+        except Exception as e:
+            print(f"Could not create analysis job indexes: {e}")
+        finally:
+            self._indexed.set()
+        while True:
+            try:
+                await self._recover()
+            except Exception as e:
+                print(f"Could not recover analysis jobs: {e}")
+            await asyncio.sleep(self.heartbeat)
+
+    async def _recover(self):
+        now = time.time()
+        if self._running:
+            await self.collection.update_many(
+                {"id": {"$in": list(self._running)}, "owner": self.owner}, {"$set": {"heartbeatAt": now}})
+        # Jobs whose process died while running them (or before owners were
+        # recorded) start over
+        await self.collection.update_many(
+            {"status": "running", "owner": {"$ne": self.owner},
+             "$or": [{"heartbeatAt": {"$lt": now - STALE_HEARTBEATS * self.heartbeat}},
+                     {"heartbeatAt": {"$exists": False}}]},
+            {"$set": {"status": "queued", "owner": None}},
+        )
+        # Including jobs queued by a process that died before running them; a
+        # job queued in a live process too is claimed by only one of them
+        async for job in self.collection.find({"status": "queued"}, {"id": 1}).sort("createdAt", ASCENDING):
+            self._enqueue(job["id"])
+
+    def _enqueue(self, job_id):
+        """Hand a stored job to the workers, which claim it from the collection"""
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def submit(self, ticker: str, company_name: str) -> dict:
+        """Queue an analysis, or join the unfinished job for the same ticker"""
+        ticker = ticker.upper()
+        # Without the unique index, duplicate requests would not coalesce
+        await self._indexed.wait()
+        while True:
+            job = self._new_job(ticker, company_name)
+            try:
+                await self.collection.insert_one(dict(job, activeTicker=ticker))
+            except DuplicateKeyError:
+                joined = await self.collection.find_one_and_update(
+                    {"activeTicker": ticker}, {"$inc": {"requests": 1}},
+                    projection=JOB_PROJECTION, return_document=ReturnDocument.AFTER,
+                )
+                if joined is not None:
+                    return joined
+                # It finished in between: try again with a new job
+                continue
+            self._enqueue(job["id"])
+            return job
+
+    @staticmethod
+    def _new_job(ticker, company_name):
+        return {
+            "id": str(uuid.uuid4()),
+            "ticker": ticker,
+            "companyName": company_name,
+            "status": "queued",
+            "requests": 1,
+            "createdAt": time.time(),
+            "startedAt": None,
+            "finishedAt": None,
+            "result": None,
+            "error": None,
+        }
+
+    async def get(self, job_id: str, wait: float = 0):
+        """The job, or None if unknown. With wait, an unfinished job is long-polled
+        for up to that many seconds and returned as soon as it finishes, in this
+        process or any other.
+        """
+        deadline = time.monotonic() + min(wait, JOB_MAX_WAIT)
+        while True:
+            finished = self._finished
+            job = await self.collection.find_one({"id": job_id}, JOB_PROJECTION)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] not in ACTIVE or remaining <= 0:
+                return job
+            try:
+                await asyncio.wait_for(finished.wait(), timeout=min(remaining, JOB_POLL_INTERVAL))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"Analysis job {job_id} could not be recorded: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id):
+        job = await self.collection.find_one_and_update(
+            {"id": job_id, "status": "queued"},
+            {"$set": {"status": "running", "startedAt": time.time(), "owner": self.owner, "heartbeatAt": time.time()}},
+            projection={"_id": 0},
+        )
+        if job is None:
+            # Claimed by another process
+            return
+        self._running.add(job_id)
+        try:
+            try:
+                with ratelimit.limited(self.limits):
+                    result = await self.analyze(job["ticker"], job["companyName"], self.limits.get("llm"))
+                update = {"status": "failed" if "error" in result else "done", "result": result, "error": result.get("error")}
+            except Exception as e:
+                update = {"status": "failed", "error": str(e)}
+            try:
+                await self._settle(job_id, update)
+            except Exception as e:
+                # Not left running behind a live heartbeat: failed, or if even that
+                # cannot be written, rerun once the heartbeat goes stale
+                await self._settle(job_id, {"status": "failed", "result": None,
+                                            "error": f"Could not record the result: {e}"})
+                raise
+        finally:
+            self._running.discard(job_id)
+            self._finished.set()
+            self._finished = asyncio.Event()
+
+    async def _settle(self, job_id, update):
+        await self.collection.update_one(
+            {"id": job_id, "owner": self.owner},
+            {"$set": dict(update, finishedAt=time.time()), "$unset": {"activeTicker": ""}},
+        )
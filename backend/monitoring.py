@@ -0,0 +1,242 @@
+# monitoring.py - Request metrics middleware and slow Mongo query logging
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from prometheus_client import Counter, Histogram
+from pymongo import MongoClient, monitoring
+from starlette.routing import Match
+
+from indexes import plan_stages
+
+logger = logging.getLogger(__name__)
+
+# Commands slower than this are logged with their shape, duration and docs examined
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+# A slow query shape is explained at most once per interval; its log lines reuse the result
+EXPLAIN_INTERVAL = 60
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+DOCS_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+REQUEST_SECONDS = Histogram(
+    "finguard_http_request_seconds", "Request latency per route, until the last body byte is sent",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+RESPONSE_BYTES = Histogram(
+    "finguard_http_response_bytes", "Response body size per route",
+    ["method", "route"], buckets=SIZE_BUCKETS,
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "finguard_mongo_command_seconds", "Mongo command latency as seen by the driver",
+    ["command", "collection"], buckets=LATENCY_BUCKETS,
+)
+SLOW_QUERIES = Counter(
+    "finguard_mongo_slow_queries", "Mongo commands over SLOW_QUERY_MS",
+    ["command", "collection"],
+)
+SLOW_QUERY_DOCS_EXAMINED = Histogram(
+    "finguard_mongo_slow_query_docs_examined", "Documents examined by slow queries, from explain",
+    ["command", "collection"], buckets=DOCS_BUCKETS,
+)
+
+
+def route_template(scope) -> str:
+    """The path template of the route serving a request ("unmatched" for 404s),
+    so per-route series do not grow with ids and cursors.
+    """
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording latency and response size per route.
+
+    Pure ASGI rather than BaseHTTPMiddleware, so streamed responses (NDJSON,
+    server-sent events) are timed and measured up to their last chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_and_measure(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            route = route_template(scope)
+            REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
+            RESPONSE_BYTES.labels(scope["method"], route).observe(size)
+
+
+# -- Mongo ------------------------------------------------------------------
+
+QUERY_COMMANDS = {"find", "aggregate", "count", "distinct", "getMore", "findAndModify", "update", "delete", "insert"}
+EXPLAINABLE = {"find", "aggregate", "count", "distinct"}
+# Session and routing fields the driver adds; an explain must not carry them
+DRIVER_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern"}
+
+
+def value_shape(value):
+    """A filter with its values replaced by "?": keys and operators only"""
+    if isinstance(value, dict):
+        return {key: value_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and any(isinstance(item, dict) for item in value):
+        return [value_shape(item) for item in value]
+    return "?"
+
+
+def query_shape(command_name: str, command: dict) -> dict:
+    if command_name == "find":
+        return {"filter": value_shape(command.get("filter", {})), "sort": command.get("sort")}
+    if command_name == "aggregate":
+        return {"pipeline": [
+            {"$match": value_shape(stage["$match"])} if "$match" in stage else next(iter(stage), "?")
+            for stage in command.get("pipeline", [])
+        ]}
+    if command_name in ("count", "distinct"):
+        return {"key": command.get("key"), "query": value_shape(command.get("query", {}))}
+    if command_name == "findAndModify":
+        return {"query": value_shape(command.get("query", {}))}
+    if command_name in ("update", "delete"):
+        statements = command.get("updates") or command.get("deletes") or [{}]
+        return {"q": value_shape(statements[0].get("q", {})), "statements": len(statements)}
+    if command_name == "insert":
+        return {"documents": len(command.get("documents", []))}
+    return {}
+
+
+def explain_stats(explain: dict) -> dict:
+    """docsExamined, keysExamined and plan stages from an executionStats explain
+    (find, count and distinct explains, and both aggregate explain layouts)
+    """
+    totals = {"totalDocsExamined": 0, "totalKeysExamined": 0}
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, item in node.items():
+                if key in totals and isinstance(item, int):
+                    totals[key] += item
+                else:
+                    walk(item)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    plans = explain.get("queryPlanner", {}).get("winningPlan") or explain.get("stages") or {}
+    return {
+        "docsExamined": totals["totalDocsExamined"],
+        "keysExamined": totals["totalKeysExamined"],
+        "plan": " -> ".join(dict.fromkeys(plan_stages(plans))),
+    }
+
+
+def explainer(mongo_url: str):
+    """explain(database, command) on a separate client, so explains are not monitored themselves"""
+    client = None
+
+    def explain(database, command):
+        nonlocal client
+        if client is None:
+            client = MongoClient(mongo_url, serverSelectionTimeoutMS=2000)
+        return explain_stats(client[database].command("explain", command, verbosity="executionStats"))
+
+    return explain
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Times every query command and logs those over threshold_ms.
+
+    A slow query's log line carries its filter shape and duration and, when an
+    `explain(database, command)` callable is given, the documents it examined;
+    explains run on a background thread, at most once per shape per EXPLAIN_INTERVAL.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, explain=None):
+        self.threshold = threshold_ms / 1000
+        self.explain = explain
+        self._started = {}
+        self._plans = {}
+        self._lock = threading.Lock()
+        self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+
+    def started(self, event):
+        if event.command_name in QUERY_COMMANDS:
+            with self._lock:
+                self._started[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event)
+
+    def _finished(self, event):
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        database, command = started
+        name = event.command_name
+        collection = command.get(name) if isinstance(command.get(name), str) else command.get("collection", "")
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMAND_SECONDS.labels(name, collection).observe(seconds)
+        if seconds < self.threshold:
+            return
+
+        SLOW_QUERIES.labels(name, collection).inc()
+        shape = query_shape(name, command)
+        entry = {"command": name, "collection": collection, "ms": round(seconds * 1000, 1), "shape": shape}
+        if self.explain is None or name not in EXPLAINABLE:
+            return self._log(entry)
+
+        key = (database, collection, name, json.dumps(shape, sort_keys=True, default=str))
+        with self._lock:
+            cached = self._plans.get(key)
+            stale = cached is None or time.monotonic() - cached[0] > EXPLAIN_INTERVAL
+            if stale:
+                self._plans[key] = (time.monotonic(), None)
+        if stale:
+            explainable = {k: v for k, v in command.items() if not k.startswith("$") and k not in DRIVER_FIELDS}
+            self._explainer.submit(self._explain_and_log, key, database, explainable, entry)
+        else:
+            self._log(dict(entry, **(cached[1] or {})))
+
+    def _explain_and_log(self, key, database, command, entry):
+        try:
+            stats = self.explain(database, command)
+        except Exception as e:
+            stats = None
+            entry["explainError"] = str(e)
+        with self._lock:
+            self._plans[key] = (time.monotonic(), stats)
+        if stats:
+            SLOW_QUERY_DOCS_EXAMINED.labels(entry["command"], entry["collection"]).observe(stats["docsExamined"])
+        self._log(dict(entry, **(stats or {})))
+
+    def _log(self, entry):
+        logger.warning(f"Slow query: {json.dumps(entry, default=str)}")
+
+    def close(self):
+        self._explainer.shutdown(wait=False)
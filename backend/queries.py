@@ -0,0 +1,93 @@
+# queries.py - Query building and keyset pagination for db.transactions
+import re
+import json
+import base64
+from fastapi import HTTPException
+
+# Keyset pagination over (date, id), newest first
+SORT = [("date", -1), ("id", -1)]
+MAX_PAGE_SIZE = 5000
+
+# Relative weight of each field in the search_text index
+SEARCH_WEIGHTS = {"merchant": 10, "category": 5, "narration": 1}
+
+
+def encode_cursor(txn: dict) -> str:
+    raw = json.dumps([txn["date"], txn["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        date, txn_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"date": {"$lt": date}},
+        {"date": date, "id": {"$lt": txn_id}}
+    ]}
+
+
+def after_cursor(query: dict, cursor: str) -> dict:
+    """Restrict a query to the rows that sort after the cursor"""
+    keyset = decode_cursor(cursor)
+    return {"$and": [query, keyset]} if query else keyset
+
+
+def build_query(type=None, mode=None, category=None, taxEligible=None, highValue=None, search=None, prefix=False):
+    """Filter for get_transactions; `prefix` matches search terms as word
+    prefixes instead of through the text index
+    """
+    query = {}
+
+    if type:
+        query["type"] = type
+    if mode:
+        query["mode"] = mode
+    if category:
+        query["category"] = category
+    if taxEligible is not None:
+        query["taxFlags"] = {"$ne": []} if taxEligible else []
+    if highValue is not None:
+        query["isHighValue"] = highValue
+    if search:
+        query.update(prefix_search(search) if prefix else text_search(search))
+    return query
+
+
+def search_terms(search: str) -> list:
+    """Quotes and leading '-' would turn terms into phrases or negations, so
+    they are stripped and every word is matched literally
+    """
+    terms = [term.lstrip("-") for term in search.replace('"', " ").split()]
+    return [term for term in terms if term]
+
+
+def text_search(search: str) -> dict:
+    """Build a $text clause over the search_text index"""
+    terms = search_terms(search)
+    if not terms:
+        return {}
+    return {"$text": {"$search": " ".join(terms)}}
+
+
+def prefix_search(search: str) -> dict:
+    """Every term as the start of a word in one of the searched fields.
+
+    The text index only matches whole words, so a partial word ("swig" for
+    Swiggy) falls back to this scan when $text finds nothing.
+    """
+    terms = search_terms(search)
+    if not terms:
+        return {}
+    return {"$and": [
+        {"$or": [{field: {"$regex": rf"\b{re.escape(term)}", "$options": "i"}} for field in SEARCH_WEIGHTS]}
+        for term in terms
+    ]}
+
+
+def sort_order(search=None, prefix=False) -> list:
+    """Text search results are ranked by relevance, everything else by (date, id)"""
+    if search and not prefix and text_search(search):
+        return [("score", {"$meta": "textScore"})] + SORT
+    return SORT
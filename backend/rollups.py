@@ -0,0 +1,230 @@
+# rollups.py - Incrementally maintained analytics rollups over db.transactions
+import os
+import sys
+import math
+import asyncio
+import weakref
+import argparse
+from pathlib import Path
+from contextlib import asynccontextmanager
+from pymongo import UpdateOne
+
+import cache
+
+ROLLUP_COLLECTION = "analytics_rollups"
+
+# Rollups are kept per day so the daily spend trend can be served from them;
+# months are derived from the day prefix.
+DAY = {"$substr": ["$date", 0, 10]}
+
+KEY_FIELDS = ["date", "type", "category", "merchant", "taxFlags"]
+
+# Called with every batch of transactions after it is written, before the
+# collection version is bumped, e.g. to refresh in-process snapshots
+WRITE_LISTENERS = []
+
+
+class _WriteGate:
+    """Transaction writes share it; a rebuild waits for the writes in flight and
+    holds new ones off until it is done
+    """
+
+    def __init__(self):
+        self.writers = 0
+        self.rebuilding = False
+        self.changed = asyncio.Condition()
+
+    @asynccontextmanager
+    async def write(self):
+        async with self.changed:
+            await self.changed.wait_for(lambda: not self.rebuilding)
+            self.writers += 1
+        try:
+            yield
+        finally:
+            async with self.changed:
+                self.writers -= 1
+                self.changed.notify_all()
+
+    @asynccontextmanager
+    async def rebuild(self):
+        async with self.changed:
+            await self.changed.wait_for(lambda: not self.rebuilding)
+            self.rebuilding = True
+            await self.changed.wait_for(lambda: self.writers == 0)
+        try:
+            yield
+        finally:
+            async with self.changed:
+                self.rebuilding = False
+                self.changed.notify_all()
+
+
+# One gate per event loop: asyncio primitives cannot be shared between loops
+_gates = weakref.WeakKeyDictionary()
+
+
+def _gate() -> _WriteGate:
+    loop = asyncio.get_running_loop()
+    if loop not in _gates:
+        _gates[loop] = _WriteGate()
+    return _gates[loop]
+
+
+def writing():
+    """Held by every write path from its transaction writes to its rollup updates,
+    so that rebuild_rollups never runs in between
+    """
+    return _gate().write()
+
+
+def rollup_key(txn):
+    """Group key of a transaction; field order matches the $group _id below"""
+    return {
+        "date": txn["date"][:10],
+        "type": txn["type"],
+        "category": txn["category"],
+        "merchant": txn["merchant"],
+        "taxFlags": txn["taxFlags"],
+    }
+
+
+def _hashable(key):
+    return tuple(tuple(key[f]) if f == "taxFlags" else key[f] for f in KEY_FIELDS)
+
+
+# Full recompute of the rollup documents from the transactions collection
+RECOMPUTE_PIPELINE = [
+    {"$group": {
+        "_id": {
+            "date": DAY,
+            "type": "$type",
+            "category": "$category",
+            "merchant": "$merchant",
+            "taxFlags": "$taxFlags",
+        },
+        "amount": {"$sum": "$amount"},
+        "count": {"$sum": 1},
+        "highValueCount": {"$sum": {"$cond": ["$isHighValue", 1, 0]}},
+    }},
+    {"$addFields": {f: f"$_id.{f}" for f in KEY_FIELDS}},
+]
+
+
+async def apply_transactions(db, transactions, sign=1):
+    """Fold transactions into the rollups (sign=-1 removes them again)"""
+    groups = {}
+    for t in transactions:
+        key = rollup_key(t)
+        group = groups.setdefault(_hashable(key), {"key": key, "amount": 0, "count": 0, "highValueCount": 0})
+        group["amount"] += t["amount"]
+        group["count"] += 1
+        group["highValueCount"] += 1 if t.get("isHighValue") else 0
+
+    if not groups:
+        return
+
+    ops = [
+        UpdateOne(
+            {"_id": g["key"]},
+            {
+                "$inc": {
+                    "amount": sign * g["amount"],
+                    "count": sign * g["count"],
+                    "highValueCount": sign * g["highValueCount"],
+                },
+                "$setOnInsert": dict(g["key"]),
+            },
+            upsert=True,
+        )
+        for g in groups.values()
+    ]
+    await db[ROLLUP_COLLECTION].bulk_write(ops, ordered=False)
+
+    if sign < 0:
+        await db[ROLLUP_COLLECTION].delete_many({"count": {"$lte": 0}})
+
+
+def notify_written(transactions):
+    for listener in WRITE_LISTENERS:
+        listener(transactions)
+
+
+async def insert_transactions(db, transactions):
+    """Write path for new transactions: insert them and update the rollups"""
+    if not transactions:
+        return
+    async with writing():
+        await db.transactions.insert_many(transactions)
+        await apply_transactions(db, transactions)
+    notify_written(transactions)
+    await cache.bump_version(db)
+
+
+async def rebuild_rollups(db):
+    """Recompute every rollup document from scratch.
+
+    $out builds the new rollups aside and swaps them in, so an increment made
+    after the recompute read its transactions would be dropped by the swap, or
+    counted twice if the read saw its transaction. Writes in this process wait
+    for the rebuild; writers in other processes are not held off, so stop them
+    before `python rollups.py rebuild`.
+    """
+    async with _gate().rebuild():
+        await db.transactions.aggregate(RECOMPUTE_PIPELINE + [{"$out": ROLLUP_COLLECTION}]).to_list(None)
+    await cache.bump_version(db)
+
+
+async def check_consistency(db, tolerance=0.005):
+    """Compare the stored rollups with a full recompute; returns the mismatching groups"""
+    expected = {
+        _hashable(row["_id"]): row
+        async for row in db.transactions.aggregate(RECOMPUTE_PIPELINE)
+    }
+    stored = {
+        _hashable(row["_id"]): row
+        async for row in db[ROLLUP_COLLECTION].find({})
+    }
+
+    mismatches = []
+    for key in set(expected) | set(stored):
+        want, have = expected.get(key), stored.get(key)
+        if want is None or have is None:
+            mismatches.append({"key": key, "expected": want, "stored": have})
+            continue
+        if (
+            want["count"] != have["count"]
+            or want["highValueCount"] != have["highValueCount"]
+            or not math.isclose(want["amount"], have["amount"], abs_tol=tolerance)
+        ):
+            mismatches.append({"key": key, "expected": want, "stored": have})
+    return mismatches
+
+
+async def _main(command):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if command == "rebuild":
+            await rebuild_rollups(db)
+            print(f"Rebuilt {await db[ROLLUP_COLLECTION].count_documents({})} rollup groups")
+            return 0
+
+        mismatches = await check_consistency(db)
+        for m in mismatches:
+            print(f"Mismatch {m['key']}: expected={m['expected']} stored={m['stored']}")
+        print(f"{len(mismatches)} inconsistent rollup groups")
+        return 1 if mismatches else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the analytics rollup collection")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.command)))
@@ -1,4 +1,6 @@
-from fastapi import FastAPI, APIRouter, Query
+from fastapi import FastAPI, APIRouter, Query, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse, JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -8,19 +10,28 @@ from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional
 import uuid
-from datetime import datetime, timezone, timedelta
 import random
 import json
-import ast
-from financial_agent.main import run_analysis
-from financial_agent.utils import get_ticker
+import time
+import asyncio
+import importlib
+from financial_agent.config import BATCH_MAX_COMPANIES
+import analytics
+import rollups
+import queries
+import indexes
+import ingest
+import cache
+import jobs
+import monitoring
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection; every query is timed and slow ones are logged with their plan
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+slow_queries = monitoring.SlowQueryListener(explain=monitoring.explainer(mongo_url))
+client = AsyncIOMotorClient(mongo_url, event_listeners=[slow_queries])
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
@@ -46,6 +57,14 @@ class Transaction(BaseModel):
     narration: str
     isHighValue: bool = False
 
+# Optional in-process analytics engine over a columnar snapshot (ANALYTICS_ENGINE=columnar)
+ANALYTICS_ENGINE = os.environ.get('ANALYTICS_ENGINE', 'mongo')
+snapshot = None
+
+# Progress of the background bootstrap (indexes, seeding, rollups), served by /api/ready
+bootstrap_status = {"state": "pending", "stage": None, "records": 0, "error": None, "indexes": False}
+bootstrap_task = None
+
 # Seed dummy data
 async def seed_transactions():
     dummy_file_path = ROOT_DIR / 'dummy.txt'
@@ -54,258 +73,207 @@ async def seed_transactions():
         return
 
     try:
-        with open(dummy_file_path, 'r') as f:
-            content = f.read().strip()
-            
-        # Remove variable assignment if present
-        if content.startswith("AA_api ="):
-            content = content.replace("AA_api =", "", 1).strip()
-        
-        # Parse the content
-        try:
-            raw_data = json.loads(content)
-        except json.JSONDecodeError:
-            try:
-                raw_data = ast.literal_eval(content)
-            except Exception as e:
-                print(f"Failed to parse dummy data: {e}")
-                return
-
-        transactions = []
-        
-        for item in raw_data:
-            # Transform data to match Transaction model
-            
-            # Map type
-            txn_type = "income" if item.get("type") == "CREDIT" else "expense"
-            
-            # Map mode
-            mode = item.get("mode", "").lower()
-            
-            # Map tax flags
-            tax_flags = []
-            raw_flags = item.get("taxFlags", {})
-            if isinstance(raw_flags, dict):
-                if raw_flags.get("is80C"): tax_flags.append("80C")
-                if raw_flags.get("is80D"): tax_flags.append("80D")
-                if raw_flags.get("is80G"): tax_flags.append("80G")
-                if raw_flags.get("isHRA"): tax_flags.append("HRA")
-            
-            # Map tags
-            tags = item.get("tags", [])
-            
-            # Create transaction object
-            txn = {
-                "id": item.get("txnId", str(uuid.uuid4())),
-                "date": item.get("date"),
-                "amount": float(item.get("amount", 0)),
-                "type": txn_type,
-                "mode": mode,
-                "category": item.get("category", "Uncategorized"),
-                "subCategory": item.get("subCategory", "General"),
-                "merchant": item.get("merchant", "Unknown"),
-                "tags": tags,
-                "taxFlags": tax_flags,
-                "narration": item.get("narration", ""),
-                "isHighValue": item.get("isHighValue", False)
-            }
-            transactions.append(txn)
-
-        if transactions:
-            # Clear existing data to ensure we have the exact dummy set
-            await db.transactions.delete_many({})
-            await db.transactions.insert_many(transactions)
-            print(f"Seeded {len(transactions)} transactions from dummy.txt")
-            
+        # Upserts keyed on txnId, so re-seeding never duplicates or wipes data
+        stats = await ingest.ingest_if_changed(
+            db, dummy_file_path, progress=lambda n: bootstrap_status.update(records=n)
+        )
+        if stats is None:
+            print("dummy.txt unchanged since last ingest, skipping seed")
+            return
+        print(f"Seeded {stats['records']} transactions from dummy.txt "
+              f"in {stats['seconds']}s ({stats['recordsPerSecond']} records/s)")
     except Exception as e:
         print(f"Error seeding transactions: {e}")
+        bootstrap_status["error"] = str(e)
+
+async def bootstrap():
+    """Seed data and build indexes without holding up request serving"""
+    bootstrap_status.update(state="running", startedAt=time.time())
+    try:
+        # Before seeding: cheap on an empty collection, and search needs the text index
+        bootstrap_status["stage"] = "indexes"
+        await indexes.ensure_indexes(db)
+        bootstrap_status["indexes"] = True
+
+        bootstrap_status["stage"] = "seeding"
+        await seed_transactions()
+
+        bootstrap_status["stage"] = "rollups"
+        # Transactions written before rollups existed are folded in once
+        if await db.transactions.find_one() and not await db[rollups.ROLLUP_COLLECTION].find_one():
+            await rollups.rebuild_rollups(db)
+
+        if ANALYTICS_ENGINE == "columnar":
+            bootstrap_status["stage"] = "snapshot"
+            await load_snapshot()
+
+        bootstrap_status.update(state="ready", stage=None, finishedAt=time.time())
+    except Exception as e:
+        logger.error(f"Startup bootstrap failed: {e}")
+        bootstrap_status.update(state="failed", error=str(e), finishedAt=time.time())
+
+async def load_snapshot():
+    global snapshot
+    # pandas is only imported when the columnar engine is enabled
+    import columnar
+    snapshot = await columnar.TransactionSnapshot.load(db)
+    rollups.WRITE_LISTENERS.append(snapshot.append)
+    print(f"Loaded columnar analytics snapshot with {len(snapshot)} transactions")
+
+async def analytics_view(name):
+    # Served from the snapshot once it is loaded, from Mongo until then
+    if snapshot is not None:
+        # Off the event loop: the view first merges any writes buffered since the last one
+        return await asyncio.to_thread(snapshot.compute_view, name)
+    return await analytics.compute_view(db, name)
+
+# Analytics responses only change when transactions are written
+response_cache = cache.ResponseCache()
+
+async def cached(request: Request, compute):
+    """Serve a payload from the response cache, answering If-None-Match with 304"""
+    version = await cache.get_version(db)
+    etag = response_cache.etag(request.url.path, request.query_params.multi_items(), version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    async def render():
+        return JSONResponse(await compute()).body
+
+    body = await response_cache.get_or_compute(etag, render)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# The analysis stack (LangChain, Gemini, yfinance, pandas) is imported on the first
+# analysis request, so workers serving transactions and dashboards boot without it;
+# ANALYSIS_WARMUP=1 imports it in the background once the bootstrap is done
+ANALYSIS_WARMUP = os.environ.get('ANALYSIS_WARMUP', '0') == '1'
+analysis_agent = None
+warmup_task = None
+
+async def analysis_stack():
+    """financial_agent.main, imported off the event loop on first use"""
+    global analysis_agent
+    if analysis_agent is None:
+        analysis_agent = await asyncio.to_thread(importlib.import_module, "financial_agent.main")
+    return analysis_agent
+
+async def warm_up():
+    await asyncio.wait([bootstrap_task])
+    start = time.perf_counter()
+    try:
+        await analysis_stack()
+        print(f"Analysis stack loaded in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        logger.error(f"Analysis stack warm-up failed: {e}")
+
+async def run_analysis_async(ticker, company_name, llm_limit=None):
+    return await (await analysis_stack()).run_analysis_async(ticker, company_name, llm_limit)
+
+async def get_ticker_async(company_name):
+    return await (await analysis_stack()).get_ticker_async(company_name)
+
+# Analyses run in the background: POST returns a job, GET polls or long-polls it
+job_queue = jobs.JobQueue(db, run_analysis_async)
 
 @app.on_event("startup")
 async def startup_event():
-    await seed_transactions()
+    global bootstrap_task, warmup_task
+    bootstrap_task = asyncio.create_task(bootstrap())
+    job_queue.start()
+    if ANALYSIS_WARMUP:
+        warmup_task = asyncio.create_task(warm_up())
+
+@api_router.get("/ready")
+async def readiness(response: Response):
+    if bootstrap_status["state"] != "ready":
+        response.status_code = 503
+    return bootstrap_status
+
+async def stream_ndjson(cursor):
+    async for doc in cursor:
+        yield json.dumps(doc) + "\n"
 
 # API Routes
 @api_router.get("/transactions", response_model=List[Transaction])
 async def get_transactions(
+    response: Response,
     type: Optional[str] = None,
     mode: Optional[str] = None,
     category: Optional[str] = None,
     taxEligible: Optional[bool] = None,
     highValue: Optional[bool] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=queries.MAX_PAGE_SIZE),
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$")
 ):
-    query = {}
-    
-    if type:
-        query["type"] = type
-    if mode:
-        query["mode"] = mode
-    if category:
-        query["category"] = category
-    if taxEligible is not None:
-        query["taxFlags"] = {"$ne": []} if taxEligible else []
-    if highValue is not None:
-        query["isHighValue"] = highValue
-    if search:
-        query["$or"] = [
-            {"merchant": {"$regex": search, "$options": "i"}},
-            {"narration": {"$regex": search, "$options": "i"}},
-            {"category": {"$regex": search, "$options": "i"}}
-        ]
-    
-    transactions = await db.transactions.find(query, {"_id": 0}).sort("date", -1).to_list(1000)
+    """List transactions newest first.
+
+    JSON responses are pages of `limit` rows (default 1000); when more rows
+    exist the next page's cursor is returned in the X-Next-Cursor header.
+    `format=ndjson` streams every matching row straight from the cursor.
+    With `search`, rows are ranked by text relevance and are not paged;
+    when no whole word matches, search terms match as word prefixes instead.
+    """
+    if search and cursor:
+        raise HTTPException(status_code=400, detail="Search results are ranked by relevance and cannot be paged with a cursor")
+    if search and not bootstrap_status["indexes"]:
+        # $text fails without the search_text index, which the bootstrap builds
+        raise HTTPException(status_code=503, detail="Search is unavailable until the text index is built",
+                            headers={"Retry-After": "5"})
+
+    query = queries.build_query(type, mode, category, taxEligible, highValue, search)
+    prefix = bool(search) and "$text" in query and not await db.transactions.find_one(query, {"_id": 1})
+    if prefix:
+        query = queries.build_query(type, mode, category, taxEligible, highValue, search, prefix=True)
+    if cursor:
+        query = queries.after_cursor(query, cursor)
+    sort = queries.sort_order(search, prefix)
+
+    if format == "ndjson":
+        docs = db.transactions.find(query, {"_id": 0}).sort(sort)
+        if limit:
+            docs = docs.limit(limit)
+        return StreamingResponse(stream_ndjson(docs), media_type="application/x-ndjson")
+
+    page_size = limit or analytics.TRANSACTIONS_LIMIT
+    transactions = await db.transactions.find(query, {"_id": 0}).sort(sort).limit(page_size + 1).to_list(page_size + 1)
+    if len(transactions) > page_size:
+        transactions = transactions[:page_size]
+        if not search:
+            response.headers["X-Next-Cursor"] = queries.encode_cursor(transactions[-1])
     return transactions
 
 @api_router.get("/analytics/summary")
-async def get_summary():
-    transactions = await db.transactions.find({}, {"_id": 0}).to_list(10000)
-    
-    total_income = sum(t["amount"] for t in transactions if t["type"] == "income")
-    total_expenses = sum(t["amount"] for t in transactions if t["type"] == "expense")
-    net_cash_flow = total_income - total_expenses
-    high_value_count = len([t for t in transactions if t["isHighValue"]])
-    
-    return {
-        "totalIncome": round(total_income, 2),
-        "totalExpenses": round(total_expenses, 2),
-        "netCashFlow": round(net_cash_flow, 2),
-        "highValueCount": high_value_count,
-        "totalTransactions": len(transactions)
-    }
+async def get_summary(request: Request):
+    return await cached(request, lambda: analytics_view("summary"))
 
 @api_router.get("/analytics/category-summary")
-async def get_category_summary():
-    transactions = await db.transactions.find({"type": "expense"}, {"_id": 0}).to_list(10000)
-    
-    category_totals = {}
-    for t in transactions:
-        category = t["category"]
-        if category not in category_totals:
-            category_totals[category] = 0
-        category_totals[category] += t["amount"]
-    
-    result = [{"category": k, "amount": round(v, 2)} for k, v in category_totals.items()]
-    result.sort(key=lambda x: x["amount"], reverse=True)
-    
-    return result
+async def get_category_summary(request: Request):
+    return await cached(request, lambda: analytics_view("category_summary"))
 
 @api_router.get("/analytics/monthly-summary")
-async def get_monthly_summary():
-    transactions = await db.transactions.find({}, {"_id": 0}).to_list(10000)
-    
-    monthly_data = {}
-    for t in transactions:
-        date = datetime.fromisoformat(t["date"])
-        month_key = date.strftime("%Y-%m")
-        
-        if month_key not in monthly_data:
-            monthly_data[month_key] = {"month": date.strftime("%b %Y"), "income": 0, "expenses": 0}
-        
-        if t["type"] == "income":
-            monthly_data[month_key]["income"] += t["amount"]
-        else:
-            monthly_data[month_key]["expenses"] += t["amount"]
-    
-    result = list(monthly_data.values())
-    result.sort(key=lambda x: x["month"])
-    
-    for item in result:
-        item["income"] = round(item["income"], 2)
-        item["expenses"] = round(item["expenses"], 2)
-    
-    return result
+async def get_monthly_summary(request: Request):
+    return await cached(request, lambda: analytics_view("monthly_summary"))
 
 @api_router.get("/analytics/tax-summary")
-async def get_tax_summary():
-    transactions = await db.transactions.find({"taxFlags": {"$ne": []}}, {"_id": 0}).to_list(10000)
-    
-    tax_totals = {
-        "80C": 0,
-        "80D": 0,
-        "80G": 0,
-        "HRA": 0
-    }
-    
-    tax_transactions = []
-    
-    for t in transactions:
-        for flag in t["taxFlags"]:
-            if flag in tax_totals:
-                tax_totals[flag] += t["amount"]
-        
-        tax_transactions.append({
-            "date": t["date"],
-            "merchant": t["merchant"],
-            "category": t["category"],
-            "amount": t["amount"],
-            "taxFlags": t["taxFlags"]
-        })
-    
-    total_deductions = sum(tax_totals.values())
-    
-    return {
-        "taxTotals": {k: round(v, 2) for k, v in tax_totals.items()},
-        "totalDeductions": round(total_deductions, 2),
-        "taxTransactions": tax_transactions
-    }
+async def get_tax_summary(request: Request):
+    return await cached(request, lambda: analytics_view("tax_summary"))
 
 @api_router.get("/analytics/spend-insights")
-async def get_spend_insights():
-    transactions = await db.transactions.find({"type": "expense"}, {"_id": 0}).to_list(10000)
-    
-    # Daily spend trend
-    daily_spend = {}
-    for t in transactions:
-        date = datetime.fromisoformat(t["date"]).strftime("%Y-%m-%d")
-        if date not in daily_spend:
-            daily_spend[date] = 0
-        daily_spend[date] += t["amount"]
-    
-    daily_trend = [{"date": k, "amount": round(v, 2)} for k, v in sorted(daily_spend.items())]
-    
-    # Weekly average
-    total_spend = sum(t["amount"] for t in transactions)
-    num_weeks = len(daily_spend) / 7 if daily_spend else 1
-    weekly_average = total_spend / num_weeks if num_weeks > 0 else 0
-    
-    # Top categories
-    category_totals = {}
-    for t in transactions:
-        category = t["category"]
-        if category not in category_totals:
-            category_totals[category] = 0
-        category_totals[category] += t["amount"]
-    
-    top_categories = sorted(
-        [{"category": k, "amount": round(v, 2)} for k, v in category_totals.items()],
-        key=lambda x: x["amount"],
-        reverse=True
-    )[:5]
-    
-    # Top merchants
-    merchant_totals = {}
-    for t in transactions:
-        merchant = t["merchant"]
-        if merchant not in merchant_totals:
-            merchant_totals[merchant] = 0
-        merchant_totals[merchant] += t["amount"]
-    
-    top_merchants = sorted(
-        [{"merchant": k, "amount": round(v, 2)} for k, v in merchant_totals.items()],
-        key=lambda x: x["amount"],
-        reverse=True
-    )[:5]
-    
-    # High spend alerts (days with spending > 5000)
-    high_spend_days = [item for item in daily_trend if item["amount"] > 5000]
-    
-    return {
-        "dailyTrend": daily_trend,
-        "weeklyAverage": round(weekly_average, 2),
-        "topCategories": top_categories,
-        "topMerchants": top_merchants,
-        "highSpendAlerts": high_spend_days
-    }
+async def get_spend_insights(request: Request):
+    return await cached(request, lambda: analytics_view("spend_insights"))
+
+@api_router.get("/dashboard")
+async def get_dashboard(request: Request):
+    return await cached(request, compute_dashboard)
+
+async def compute_dashboard():
+    if snapshot is None:
+        return await analytics.compute_dashboard(db)
+    latest = await db.transactions.find({}, {"_id": 0}).sort(queries.SORT).limit(analytics.TRANSACTIONS_LIMIT).to_list(analytics.TRANSACTIONS_LIMIT)
+    return {"transactions": latest, **await asyncio.to_thread(snapshot.compute_views)}
 
 class AnalysisRequest(BaseModel):
     company_name: str
@@ -314,33 +282,110 @@ class AnalysisRequest(BaseModel):
 async def financial_analysis(request: AnalysisRequest):
     try:
         # Get ticker
-        ticker = get_ticker(request.company_name)
+        ticker = await get_ticker_async(request.company_name)
         if not ticker:
              return {"error": "Could not find ticker symbol"}
         
-        # Run analysis
-        import asyncio
-        from functools import partial
-        
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, partial(run_analysis, ticker, request.company_name))
-        
-        return result
+        # Run analysis natively on the event loop; only yfinance uses the fetch pool
+        return await run_analysis_async(ticker, request.company_name)
     except Exception as e:
         logger.error(f"Error in financial analysis: {e}")
         return {"error": str(e)}
 
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_financial_analysis(company_name):
+    ticker = await get_ticker_async(company_name)
+    if not ticker:
+        yield sse("error", {"error": "Could not find ticker symbol"})
+        return
+    yield sse("ticker", {"company": company_name, "ticker": ticker})
+    async for event, data in (await analysis_stack()).stream_analysis(ticker, company_name):
+        yield sse(event, data)
+
+@api_router.post("/financial-analysis/stream")
+async def financial_analysis_stream(request: AnalysisRequest):
+    """Server-sent events version of /financial-analysis.
+
+    Events: ticker, then price / fundamentals / news / esg as each source
+    arrives, token chunks of the LLM reply, and finally result (or error).
+    """
+    return StreamingResponse(
+        stream_financial_analysis(request.company_name),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api_router.post("/financial-analysis/jobs", status_code=202)
+async def create_analysis_job(request: AnalysisRequest):
+    """Queue an analysis and return its job; a request for a ticker that is
+    already queued or running joins that job.
+    """
+    ticker = await get_ticker_async(request.company_name)
+    if not ticker:
+        raise HTTPException(status_code=400, detail="Could not find ticker symbol")
+    return await job_queue.submit(ticker, request.company_name)
+
+@api_router.get("/financial-analysis/jobs/{job_id}")
+async def get_analysis_job(job_id: str, wait: float = Query(0, ge=0, le=jobs.JOB_MAX_WAIT)):
+    """A job's status and, once done, its result. `wait` long-polls an
+    unfinished job for up to that many seconds.
+    """
+    job = await job_queue.get(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+class PortfolioHolding(BaseModel):
+    company_name: Optional[str] = None
+    ticker: Optional[str] = None
+    quantity: Optional[float] = None
+
+class BatchAnalysisRequest(BaseModel):
+    company_names: List[str] = []
+    portfolio: List[PortfolioHolding] = []
+
+@api_router.post("/financial-analysis/batch")
+async def financial_analysis_batch(request: BatchAnalysisRequest):
+    """Analyze a list of companies and/or portfolio holdings.
+
+    Streams one NDJSON line per holding as its analysis completes; each line
+    carries the holding's `index` in the request.
+    """
+    holdings = [{"company_name": name} for name in request.company_names]
+    holdings += [h.model_dump() for h in request.portfolio]
+    holdings = [h for h in holdings if (h.get("company_name") or "").strip() or (h.get("ticker") or "").strip()]
+    if not holdings:
+        raise HTTPException(status_code=400, detail="No companies to analyze")
+    if len(holdings) > BATCH_MAX_COMPANIES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_COMPANIES} companies per batch")
+    agent = await analysis_stack()
+    return StreamingResponse(stream_ndjson(agent.analyze_batch(holdings)), media_type="application/x-ndjson")
+
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: per-route request latency and response sizes, Mongo
+    command latency and slow queries, analysis stage and upstream latency, LLM tokens,
+    analysis memo hits and reply validation outcomes
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Outermost, so the latency includes every other middleware
+app.add_middleware(monitoring.RequestMetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -350,4 +395,9 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    for task in (bootstrap_task, warmup_task):
+        if task and not task.done():
+            task.cancel()
+    await job_queue.stop()
+    client.close()
+    slow_queries.close()
\ No newline at end of file
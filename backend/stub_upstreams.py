@@ -0,0 +1,253 @@
+# stub_upstreams.py - Local stand-ins for the Yahoo chart, Serper and LLM APIs
+import re
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def chart_response(ticker, price=123.45, currency="USD"):
+    return {"chart": {"result": [{"meta": {"symbol": ticker, "regularMarketPrice": price, "currency": currency}}]}}
+
+
+def serper_response(query, kind):
+    items = [
+        {"title": f"{query} result {i}", "snippet": f"{kind} snippet {i} for {query}", "link": f"https://example.com/{i}"}
+        for i in range(5)
+    ]
+    return {"news": items} if kind == "news" else {"organic": items}
+
+
+def _usage(prompt, content):
+    # Rough 4-characters-per-token counts
+    return len(prompt) // 4, len(content) // 4
+
+
+def openai_response(model, prompt, content):
+    prompt_tokens, completion_tokens = _usage(prompt, content)
+    return {
+        "id": "chatcmpl-stub", "object": "chat.completion", "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def gemini_response(model, prompt, content):
+    prompt_tokens, output_tokens = _usage(prompt, content)
+    return {
+        "candidates": [{"index": 0, "content": {"role": "model", "parts": [{"text": content}]}, "finishReason": "STOP"}],
+        "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": output_tokens,
+                          "totalTokenCount": prompt_tokens + output_tokens},
+        "modelVersion": model,
+    }
+
+
+GEMINI_PATH = re.compile(r"^/v1beta/(?P<model>models/[^:]+):generateContent")
+
+
+class StubUpstreams:
+    """Threaded HTTP server answering like Yahoo chart, Serper and an LLM API:
+    OpenAI-compatible /v1/chat/completions and Gemini REST generateContent,
+    both replying with `llm_response`.
+
+    `delays` maps a path prefix ("/chart", "/news", "/search", "/llm") to seconds
+    of latency to inject and `failures` to a number of 503s to answer before
+    succeeding; `hits` counts requests per prefix, `peak` is the most requests
+    in flight at once and `connections` the distinct client sockets seen.
+    """
+
+    def __init__(self, delays=None, failures=None, llm_response=None):
+        self.llm_response = llm_response or ANALYSIS_JSON
+        self.delays = dict(delays or {})
+        self.failures = dict(failures or {})
+        self.hits = {}
+        self.peak = 0
+        self.connections = set()
+        self._active = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so connection reuse by clients is observable
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; without this each reply
+            # waits out the client's delayed ACK (~40ms)
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, prefix, body):
+                with stub._lock:
+                    stub.hits[prefix] = stub.hits.get(prefix, 0) + 1
+                    stub.connections.add(self.client_address)
+                    stub._active += 1
+                    stub.peak = max(stub.peak, stub._active)
+                    failing = stub.failures.get(prefix, 0) > 0
+                    if failing:
+                        stub.failures[prefix] -= 1
+                try:
+                    time.sleep(stub.delays.get(prefix, 0))
+                finally:
+                    with stub._lock:
+                        stub._active -= 1
+                payload = json.dumps(body if not failing else {"error": "unavailable"}).encode()
+                self.send_response(503 if failing else 200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                ticker = self.path.split("?")[0].rsplit("/", 1)[-1]
+                self._reply("/chart", chart_response(ticker))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.startswith("/v1/chat/completions"):
+                    prompt = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+                    return self._reply("/llm", openai_response(body.get("model", "stub"), prompt, stub.llm_response))
+                gemini = GEMINI_PATH.match(self.path)
+                if gemini:
+                    prompt = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+                    return self._reply("/llm", gemini_response(gemini["model"], prompt, stub.llm_response))
+                kind = "news" if self.path.startswith("/news") else "search"
+                self._reply(f"/{kind}", serper_response(body.get("q", ""), kind))
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+ANALYSIS_JSON = json.dumps({
+    "decision": "buy",
+    "risk_level": "low",
+    "time_horizon": "LONG_TERM",
+    "current_financial_condition": "Strong balance sheet",
+    "reasons": ["Growing revenue", "High margins", "Low debt"],
+    "key_metrics_considered": ["pe_ratio", "roe"],
+    "green_score": 7,
+    "green_summary": "Renewable energy commitments",
+})
+
+
+def fake_llm(delay=0.0, response=ANALYSIS_JSON):
+    """Chat model that answers with a canned analysis after `delay` seconds.
+
+    `response` may be a list of replies given in turn (the last one repeats).
+    The sync path blocks its thread and the async path awaits, like a real
+    client would.
+    """
+    import asyncio
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, AIMessageChunk
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+    class FakeAnalystLLM(BaseChatModel):
+        delay: float = 0.0
+        responses: list = []
+        # Calls made, and the most in flight at once on the async path
+        calls: int = 0
+        active: int = 0
+        peak: int = 0
+
+        @property
+        def _llm_type(self):
+            return "fake-analyst"
+
+        @property
+        def response(self):
+            return self.responses[min(self.calls, len(self.responses)) - 1]
+
+        def _result(self, messages):
+            # Rough 4-characters-per-token usage, so token accounting can be tested
+            prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+            output_tokens = len(self.response) // 4
+            usage = {"input_tokens": prompt_tokens, "output_tokens": output_tokens,
+                     "total_tokens": prompt_tokens + output_tokens}
+            message = AIMessage(content=self.response, usage_metadata=usage)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            self.calls += 1
+            time.sleep(self.delay)
+            return self._result(messages)
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            try:
+                await asyncio.sleep(self.delay)
+            finally:
+                self.active -= 1
+            return self._result(messages)
+
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            # `delay` spread over eight chunks; usage arrives on the last one
+            self.calls += 1
+            result = self._result(messages).generations[0].message
+            size = max(1, -(-len(self.response) // 8))
+            pieces = [self.response[i:i + size] for i in range(0, len(self.response), size)] or [""]
+            for i, piece in enumerate(pieces):
+                await asyncio.sleep(self.delay / len(pieces))
+                usage = result.usage_metadata if i == len(pieces) - 1 else None
+                yield ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+
+    responses = list(response) if isinstance(response, (list, tuple)) else [response]
+    return FakeAnalystLLM(delay=delay, responses=responses)
+
+
+ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+def http_llm(url, model="stub-analyst"):
+    """Chat model calling an OpenAI-compatible /v1/chat/completions endpoint (the
+    stub's) over the shared transport, so every LLM call is a real HTTP round trip
+    on both the sync and the async path. Binds such as response_schema are ignored.
+    """
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from financial_agent import transport
+
+    class HttpChatLLM(BaseChatModel):
+        url: str
+        model: str
+
+        @property
+        def _llm_type(self):
+            return "http-chat"
+
+        def _payload(self, messages):
+            return {"model": self.model,
+                    "messages": [{"role": ROLES.get(m.type, "user"), "content": m.content} for m in messages]}
+
+        def _result(self, body):
+            usage = body.get("usage", {})
+            message = AIMessage(
+                content=body["choices"][0]["message"]["content"],
+                usage_metadata={"input_tokens": usage.get("prompt_tokens", 0),
+                                "output_tokens": usage.get("completion_tokens", 0),
+                                "total_tokens": usage.get("total_tokens", 0)},
+            )
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            return self._result(transport.post_json(f"{self.url}/v1/chat/completions", json=self._payload(messages)))
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            return self._result(await transport.apost_json(f"{self.url}/v1/chat/completions", json=self._payload(messages)))
+
+    return HttpChatLLM(url=url, model=model)
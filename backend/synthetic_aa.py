@@ -0,0 +1,67 @@
+# synthetic_aa.py - Synthetic Account Aggregator dumps in the dummy.txt schema, at any size
+import sys
+import json
+import random
+import argparse
+from pathlib import Path
+from datetime import date, timedelta
+
+import ingest
+
+TEMPLATES_PATH = Path(__file__).parent / 'dummy.txt'
+START_DATE = date(2024, 4, 1)
+DAYS = 730
+OPENING_BALANCE = 250_000
+
+
+def load_templates(path=TEMPLATES_PATH):
+    """The raw dummy.txt records; every synthetic record is a jittered copy of one"""
+    return list(ingest.iter_records(path))
+
+
+def generate(n, seed=7, templates=None):
+    """Yield n raw AA records: txnId, date, type, amount, mode, category and the
+    rest of the dummy.txt fields, with amounts jittered by up to 30% around their
+    template, dates spread over DAYS and a running balanceAfterTxn.
+    """
+    rng = random.Random(seed)
+    templates = templates or load_templates()
+    balance = OPENING_BALANCE
+    for i in range(n):
+        template = rng.choice(templates)
+        amount = round(template["amount"] * rng.uniform(0.7, 1.3), 2)
+        balance += amount if template["type"] == "CREDIT" else -amount
+        yield {
+            **template,
+            "txnId": f"S{i:07d}",
+            "date": (START_DATE + timedelta(days=rng.randrange(DAYS))).isoformat(),
+            "amount": amount,
+            "tags": list(template.get("tags", [])),
+            "taxFlags": dict(template.get("taxFlags", {})),
+            "balanceAfterTxn": round(balance, 2),
+        }
+
+
+def transactions(n, seed=7, templates=None):
+    """Yield n synthetic records as ingest stores them, on the Transaction model"""
+    for item in generate(n, seed, templates):
+        yield ingest.transform_transaction(item)
+
+
+def write_ndjson(path, n, seed=7):
+    """Write n records to path as NDJSON, which ingest.py streams line by line"""
+    templates = load_templates()
+    with open(path, 'w') as f:
+        for record in generate(n, seed, templates):
+            f.write(json.dumps(record) + "\n")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Account Aggregator dump as NDJSON")
+    parser.add_argument("records", type=int, help="e.g. 10000, 100000 or 1000000")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    write_ndjson(args.path, args.records, args.seed)
+    print(f"Wrote {args.records} records to {args.path}", file=sys.stderr)
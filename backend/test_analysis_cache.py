@@ -0,0 +1,79 @@
+import sys
+import os
+import time
+import asyncio
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("langchain_google_genai")
+
+from financial_agent import pure_tools, langchain_agent
+
+
+@pytest.fixture
+def analysis(upstreams, use_llm, monkeypatch):
+    """Stubbed sources with a settable price and a fake 0.2s LLM"""
+    upstreams()
+    use_llm(0.2)
+    quote = {"price": 123.45}
+
+    async def latest_price(ticker):
+        return {"ticker": ticker, "price": quote["price"], "currency": "USD"}
+
+    monkeypatch.setattr(pure_tools, "get_latest_price_async", latest_price)
+    return quote
+
+
+def run(n=1):
+    async def main():
+        return await asyncio.gather(*(langchain_agent.run_analysis_async("AAPL", "Apple") for _ in range(n)))
+    return asyncio.run(main())
+
+
+def test_repeated_analysis_is_served_from_the_memo(analysis, counts):
+    first, = run()
+    start = time.perf_counter()
+    second, = run()
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.1
+    assert second == first and second["decision"] == "buy"
+    assert counts("finguard_analysis_cache_lookups_total", result="miss") == 1 and counts("finguard_analysis_cache_lookups_total", result="hit") == 1
+    assert counts("finguard_analysis_cache_tokens_total", kind="saved") == counts("finguard_analysis_cache_tokens_total", kind="spent") > 0
+
+
+def test_small_price_moves_share_a_fingerprint(analysis, counts):
+    run()
+    analysis["price"] = 123.50
+    result, = run()
+    assert counts("finguard_analysis_cache_lookups_total", result="hit") == 1
+    # The memoized reply is served with the live price
+    assert result["current_stock_price"] == "123.5"
+
+    analysis["price"] = 130.0
+    run()
+    assert counts("finguard_analysis_cache_lookups_total", result="miss") == 2
+
+
+def test_concurrent_identical_analyses_make_one_llm_call(analysis, counts):
+    results = run(10)
+    assert counts("finguard_analysis_cache_lookups_total", result="miss") == 1 and counts("finguard_analysis_cache_lookups_total", result="hit") == 9
+    assert all(r["decision"] == "buy" for r in results)
+
+
+def test_unparseable_replies_are_not_memoized(analysis, use_llm, counts):
+    use_llm(0, "I cannot answer that")
+    first, = run()
+    run()
+    assert first["decision"] == "hold"
+    assert counts("finguard_analysis_cache_lookups_total", result="miss") == 2
+
+
+def test_sync_and_async_paths_share_the_memo(analysis, monkeypatch, counts):
+    monkeypatch.setattr(pure_tools, "get_latest_price", lambda t: {"ticker": t, "price": 123.45, "currency": "USD"})
+    run()
+    result = langchain_agent.run_analysis("AAPL", "Apple")
+    assert result["decision"] == "buy"
+    assert counts("finguard_analysis_cache_lookups_total", result="hit") == 1
@@ -0,0 +1,296 @@
+import sys
+import os
+import asyncio
+import random
+import pytest
+from datetime import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import analytics
+import rollups
+
+CATEGORIES = ["Food", "Shopping", "Rent", "Insurance", "Travel", "Salary", "Donation"]
+MERCHANTS = ["Swiggy", "Myntra", "LIC", "Landlord", "IRCTC", "Acme Corp", "Cafe Coffee Day", "Star Health"]
+MODES = ["upi", "card", "cash", "bank_transfer"]
+
+
+def make_transactions(n=400, seed=7):
+    rng = random.Random(seed)
+    transactions = []
+    for i in range(n):
+        flags = rng.sample(analytics.TAX_SECTIONS + ["OTHER"], rng.choice([0, 0, 0, 1, 2]))
+        merchant = rng.choice(MERCHANTS)
+        category = rng.choice(CATEGORIES)
+        transactions.append({
+            "id": f"T{i:05d}",
+            "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "amount": float(rng.randint(50, 90000)) + rng.choice([0, 0.25, 0.5, 0.99]),
+            "type": "income" if rng.random() < 0.2 else "expense",
+            "mode": rng.choice(MODES),
+            "category": category,
+            "subCategory": "General",
+            "merchant": merchant,
+            "tags": [],
+            "taxFlags": flags,
+            "narration": f"{merchant} - {category} payment",
+            "isHighValue": rng.random() < 0.1,
+        })
+    return transactions
+
+
+# Reference implementations: the Python loops the analytics routes used before
+# they were pushed down into aggregation pipelines.
+
+def legacy_summary(transactions):
+    total_income = sum(t["amount"] for t in transactions if t["type"] == "income")
+    total_expenses = sum(t["amount"] for t in transactions if t["type"] == "expense")
+    return {
+        "totalIncome": round(total_income, 2),
+        "totalExpenses": round(total_expenses, 2),
+        "netCashFlow": round(total_income - total_expenses, 2),
+        "highValueCount": len([t for t in transactions if t["isHighValue"]]),
+        "totalTransactions": len(transactions)
+    }
+
+
+def legacy_category_summary(transactions):
+    category_totals = {}
+    for t in transactions:
+        if t["type"] == "expense":
+            category_totals[t["category"]] = category_totals.get(t["category"], 0) + t["amount"]
+    result = [{"category": k, "amount": round(v, 2)} for k, v in category_totals.items()]
+    result.sort(key=lambda x: x["amount"], reverse=True)
+    return result
+
+
+def legacy_monthly_summary(transactions):
+    monthly_data = {}
+    for t in transactions:
+        date = datetime.fromisoformat(t["date"])
+        month_key = date.strftime("%Y-%m")
+        if month_key not in monthly_data:
+            monthly_data[month_key] = {"month": date.strftime("%b %Y"), "income": 0, "expenses": 0}
+        if t["type"] == "income":
+            monthly_data[month_key]["income"] += t["amount"]
+        else:
+            monthly_data[month_key]["expenses"] += t["amount"]
+    result = list(monthly_data.values())
+    result.sort(key=lambda x: x["month"])
+    for item in result:
+        item["income"] = round(item["income"], 2)
+        item["expenses"] = round(item["expenses"], 2)
+    return result
+
+
+def legacy_tax_summary(transactions):
+    tax_totals = {"80C": 0, "80D": 0, "80G": 0, "HRA": 0}
+    tax_transactions = []
+    for t in transactions:
+        if not t["taxFlags"]:
+            continue
+        for flag in t["taxFlags"]:
+            if flag in tax_totals:
+                tax_totals[flag] += t["amount"]
+        tax_transactions.append({
+            "date": t["date"],
+            "merchant": t["merchant"],
+            "category": t["category"],
+            "amount": t["amount"],
+            "taxFlags": t["taxFlags"]
+        })
+    return {
+        "taxTotals": {k: round(v, 2) for k, v in tax_totals.items()},
+        "totalDeductions": round(sum(tax_totals.values()), 2),
+        "taxTransactions": tax_transactions
+    }
+
+
+def legacy_spend_insights(transactions):
+    expenses = [t for t in transactions if t["type"] == "expense"]
+    daily_spend = {}
+    category_totals = {}
+    merchant_totals = {}
+    for t in expenses:
+        date = datetime.fromisoformat(t["date"]).strftime("%Y-%m-%d")
+        daily_spend[date] = daily_spend.get(date, 0) + t["amount"]
+        category_totals[t["category"]] = category_totals.get(t["category"], 0) + t["amount"]
+        merchant_totals[t["merchant"]] = merchant_totals.get(t["merchant"], 0) + t["amount"]
+    daily_trend = [{"date": k, "amount": round(v, 2)} for k, v in sorted(daily_spend.items())]
+    total_spend = sum(t["amount"] for t in expenses)
+    num_weeks = len(daily_spend) / 7 if daily_spend else 1
+    weekly_average = total_spend / num_weeks if num_weeks > 0 else 0
+    return {
+        "dailyTrend": daily_trend,
+        "weeklyAverage": round(weekly_average, 2),
+        "topCategories": sorted(
+            [{"category": k, "amount": round(v, 2)} for k, v in category_totals.items()],
+            key=lambda x: x["amount"], reverse=True)[:5],
+        "topMerchants": sorted(
+            [{"merchant": k, "amount": round(v, 2)} for k, v in merchant_totals.items()],
+            key=lambda x: x["amount"], reverse=True)[:5],
+        "highSpendAlerts": [item for item in daily_trend if item["amount"] > 5000]
+    }
+
+
+LEGACY = {
+    "summary": legacy_summary,
+    "category_summary": legacy_category_summary,
+    "monthly_summary": legacy_monthly_summary,
+    "tax_summary": legacy_tax_summary,
+    "spend_insights": legacy_spend_insights,
+}
+
+
+async def seed(transactions):
+    db = AsyncMongoMockClient()["finguard"]
+    # Insert in two batches so the rollups are exercised incrementally
+    half = len(transactions) // 2
+    await rollups.insert_transactions(db, [dict(t) for t in transactions[:half]])
+    await rollups.insert_transactions(db, [dict(t) for t in transactions[half:]])
+    return db
+
+
+async def compute_all(transactions, source):
+    db = await seed(transactions)
+    return {name: await analytics.compute_view(db, name, source=source) for name in analytics.VIEWS}
+
+
+def test_pipelines_match_legacy_loops():
+    transactions = make_transactions()
+    for source in ["transactions", rollups.ROLLUP_COLLECTION]:
+        results = asyncio.run(compute_all(transactions, source))
+        for name, legacy in LEGACY.items():
+            assert results[name] == legacy(transactions), (source, name)
+
+
+def test_pipelines_on_empty_collection():
+    for source in ["transactions", rollups.ROLLUP_COLLECTION]:
+        results = asyncio.run(compute_all([], source))
+        for name, legacy in LEGACY.items():
+            assert results[name] == legacy([]), (source, name)
+
+
+def test_dashboard_matches_individual_views():
+    transactions = make_transactions()
+
+    async def run():
+        db = await seed(transactions)
+        views = {name: await analytics.compute_view(db, name) for name in analytics.VIEWS}
+        return views, await analytics.compute_dashboard(db)
+
+    views, dashboard = asyncio.run(run())
+    for name, key in analytics.DASHBOARD_KEYS.items():
+        assert dashboard[key] == views[name], name
+    expected = sorted(transactions, key=lambda t: t["date"], reverse=True)
+    assert [t["date"] for t in dashboard["transactions"]] == [t["date"] for t in expected]
+
+
+def test_rollups_consistency_check():
+    transactions = make_transactions()
+
+    async def run():
+        db = await seed(transactions)
+        assert await rollups.check_consistency(db) == []
+
+        # Removing transactions through the rollups keeps them consistent
+        removed = transactions[:50]
+        await db.transactions.delete_many({"id": {"$in": [t["id"] for t in removed]}})
+        await rollups.apply_transactions(db, removed, sign=-1)
+        assert await rollups.check_consistency(db) == []
+
+        # A write that bypasses the rollups is detected, and a rebuild repairs it
+        await db.transactions.insert_one(dict(transactions[0]))
+        assert len(await rollups.check_consistency(db)) == 1
+        await rollups.rebuild_rollups(db)
+        assert await rollups.check_consistency(db) == []
+
+    asyncio.run(run())
+
+
+def test_writes_during_a_rebuild_are_not_lost(monkeypatch):
+    import ingest
+    transactions = make_transactions()
+    collection = type(AsyncMongoMockClient()["finguard"].transactions)
+    aggregate = collection.aggregate
+
+    def aggregate_out(self, pipeline, *args, **kwargs):
+        # $out as a server runs it: read the groups, then a while later swap them in
+        *stages, out = pipeline
+        if "$out" not in out:
+            return aggregate(self, pipeline, *args, **kwargs)
+
+        class Cursor:
+            async def to_list(_, length):
+                rows = await aggregate(self, stages).to_list(None)
+                await asyncio.sleep(0.1)
+                await self.database[out["$out"]].delete_many({})
+                await self.database[out["$out"]].insert_many(rows)
+                return []
+        return Cursor()
+
+    monkeypatch.setattr(collection, "aggregate", aggregate_out)
+
+    async def later(write):
+        await asyncio.sleep(0.02)
+        await write
+
+    async def run():
+        db = await seed(transactions[:200])
+        await asyncio.gather(
+            rollups.rebuild_rollups(db),
+            later(rollups.insert_transactions(db, transactions[200:300])),
+            later(ingest.write_batch(db, [dict(t) for t in transactions[300:]])),
+        )
+        assert await db.transactions.count_documents({}) == len(transactions)
+        return await rollups.check_consistency(db)
+
+    assert asyncio.run(run()) == []
+
+
+def test_write_listeners_see_every_write_path(tmp_path, monkeypatch):
+    import ingest
+    transactions = make_transactions(20)
+    written = []
+    monkeypatch.setattr(rollups, "WRITE_LISTENERS", [lambda batch: written.extend(t["id"] for t in batch)])
+    dump = tmp_path / "dump.json"
+    dump.write_text("[" + ",".join(f'{{"txnId": "D{i}", "amount": 10, "date": "2025-01-01"}}' for i in range(3)) + "]")
+
+    async def run():
+        db = AsyncMongoMockClient()["finguard"]
+        await rollups.insert_transactions(db, [dict(t) for t in transactions])
+        await ingest.ingest_file(db, dump)
+
+    asyncio.run(run())
+    assert written == [t["id"] for t in transactions] + ["D0", "D1", "D2"]
+
+
+def test_columnar_snapshot_matches_legacy_loops():
+    columnar = pytest.importorskip("columnar")
+    transactions = make_transactions()
+
+    snapshot = columnar.TransactionSnapshot(transactions[:100])
+    snapshot.append(transactions[100:])
+    # Re-delivered transactions replace their earlier copies
+    snapshot.append(transactions[:10])
+    # Writes are buffered until a view needs them
+    assert len(snapshot._frame) == 100
+
+    assert len(snapshot) == len(transactions)
+    for name, legacy in LEGACY.items():
+        assert snapshot.compute_view(name) == legacy(transactions), name
+
+    # A changed copy takes its predecessor's place, as an upsert does in Mongo
+    changed = dict(transactions[3], amount=transactions[3]["amount"] + 1)
+    snapshot.append([changed, dict(transactions[0], id="T-new", taxFlags=["80C"])])
+    expected = transactions[:3] + [changed] + transactions[4:] + [dict(transactions[0], id="T-new", taxFlags=["80C"])]
+    assert list(snapshot.frame["id"]) == [t["id"] for t in expected]
+    assert snapshot.compute_view("tax_summary") == legacy_tax_summary(expected)
+
+    fresh = columnar.TransactionSnapshot(transactions)
+    for name, legacy in LEGACY.items():
+        assert fresh.compute_view(name) == legacy(transactions), name
+    assert columnar.TransactionSnapshot([]).compute_views()["summary"] == legacy_summary([])
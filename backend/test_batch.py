@@ -0,0 +1,86 @@
+import sys
+import os
+import time
+import asyncio
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("langchain_google_genai")
+
+from financial_agent import pure_tools, ticker_index, batch, utils
+from stub_upstreams import fake_llm
+
+PORTFOLIO = [
+    "Apple", "Microsoft", "Nvidia", "Amazon", "Alphabet", "Meta", "Tesla", "Netflix", "Visa", "Walmart",
+    "Coca-Cola", "PepsiCo", "Pfizer", "Intel", "Oracle", "Adobe", "Infosys", "Reliance Industries", "ITC", "Wipro",
+]
+
+
+@pytest.fixture
+def stubs(upstreams, use_llm, monkeypatch, tmp_path):
+    """Stubbed sources: 0.2s fundamentals, 0.2s LLM, counted bulk downloads"""
+    stub = upstreams(market_delay=0.2)
+    llm = use_llm(0.2)
+    ticker_index.set_index(ticker_index.load_index(learned=str(tmp_path / "learned.csv"), extra=utils.COMMON_TICKERS))
+    downloads = []
+
+    def download_prices(tickers):
+        downloads.append(sorted(tickers))
+        return {t: {"ticker": t, "price": 100.0, "currency": "USD"} for t in tickers}
+
+    monkeypatch.setattr(pure_tools, "download_prices", download_prices)
+    yield {"llm": llm, "downloads": downloads, "stub": stub}
+    ticker_index.set_index(None)
+
+
+def collect(holdings, **kwargs):
+    async def run():
+        results = []
+        async for result in batch.analyze_batch(holdings, **kwargs):
+            results.append((time.perf_counter(), result))
+        return results
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    return [(t - start, r) for t, r in results], time.perf_counter() - start
+
+
+def test_portfolio_runs_with_bounded_llm_concurrency(stubs):
+    results, elapsed = collect([{"company_name": name} for name in PORTFOLIO], llm_concurrency=5)
+
+    assert sorted(r["index"] for _, r in results) == list(range(len(PORTFOLIO)))
+    assert all(r["decision"] == "buy" for _, r in results)
+    assert stubs["llm"].calls == len(PORTFOLIO)
+    assert stubs["llm"].peak == 5
+    # 20 x (0.2s fetch + 0.2s LLM) serially would be 8s
+    assert elapsed < 2.5
+    # Prices came from one bulk download, not the chart API
+    assert len(stubs["downloads"]) == 1 and len(stubs["downloads"][0]) == len(PORTFOLIO)
+    assert "/chart" not in stubs["stub"].hits
+
+
+def test_results_stream_as_they_complete(stubs):
+    results, elapsed = collect([{"company_name": name} for name in PORTFOLIO[:10]], llm_concurrency=2)
+    first_at = results[0][0]
+    assert first_at < elapsed / 2
+
+
+def test_portfolio_holdings_and_llm_resolved_names(stubs, monkeypatch):
+    monkeypatch.setattr(utils, "_ticker_chain", lambda: utils.TICKER_PROMPT | fake_llm(0, "ETERNAL.NS"))
+    holdings = [{"ticker": "AAPL", "quantity": 10}, {"company_name": "Zomato"}]
+    results = {r["index"]: r for _, r in collect(holdings)[0]}
+
+    assert results[0]["ticker"] == "AAPL" and results[0]["position_value"] == 1000.0
+    assert results[1]["ticker"] == "ETERNAL.NS"
+    # The LLM answer was learned by the index
+    assert ticker_index.get_index().resolve("Zomato") == "ETERNAL.NS"
+
+
+def test_unresolvable_names_report_an_error(stubs, monkeypatch):
+    monkeypatch.setattr(utils, "_ticker_chain", lambda: utils.TICKER_PROMPT | fake_llm(0, ""))
+    results = {r["index"]: r for _, r in collect([{"company_name": "Tata"}, {"company_name": "Apple"}])[0]}
+
+    assert results[0] == {"index": 0, "company_name": "Tata", "error": "Could not find ticker symbol"}
+    assert results[1]["decision"] == "buy"
@@ -0,0 +1,150 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import statistics
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("langchain_google_genai")
+
+from financial_agent import pure_tools, source_cache, cassette, langchain_agent
+from stub_upstreams import StubUpstreams, fake_llm
+
+
+class FakeYFinance:
+    """yfinance with a 0.15s .info"""
+
+    class Ticker:
+        def __init__(self, ticker):
+            self.ticker = ticker
+
+        @property
+        def info(self):
+            time.sleep(0.15)
+            return {"trailingPE": 30.1, "returnOnEquity": 1.5, "sector": "Technology", "currency": "USD"}
+
+
+class Offline:
+    """Fails any call that reaches it"""
+
+    def Ticker(self, ticker):
+        raise AssertionError("yfinance called during replay")
+
+
+def use_mode(monkeypatch, mode, latency="recorded"):
+    monkeypatch.setattr(cassette, "MODE", mode)
+    monkeypatch.setattr(cassette, "LATENCY", latency)
+    cassette.reset()
+    source_cache.set_cache(source_cache.SourceCache(path=""))
+
+
+def analyze():
+    start = time.perf_counter()
+    result = asyncio.run(langchain_agent.run_analysis_async("AAPL", "Apple"))
+    return result, time.perf_counter() - start
+
+
+@pytest.fixture
+def recorded(monkeypatch, tmp_path):
+    """An AAPL analysis recorded against 0.1s Serper, 0.15s yfinance and a 0.3s LLM;
+    the stub servers are gone afterwards
+    """
+    monkeypatch.setattr(cassette, "DIRECTORY", str(tmp_path))
+    use_mode(monkeypatch, "record")
+    monkeypatch.setattr(pure_tools, "yf", FakeYFinance())
+    monkeypatch.setattr(langchain_agent, "llm", fake_llm(0.3))
+    with StubUpstreams({"/news": 0.1, "/search": 0.1}) as stub:
+        monkeypatch.setattr(pure_tools, "YAHOO_CHART_URL", f"{stub.url}/chart")
+        monkeypatch.setattr(pure_tools, "SERPER_URL", stub.url)
+        result, _ = analyze()
+
+    offline_llm = fake_llm(0)
+    monkeypatch.setattr(pure_tools, "yf", Offline())
+    monkeypatch.setattr(langchain_agent, "llm", offline_llm)
+    yield result, tmp_path, offline_llm
+    cassette.reset()
+
+
+def test_analysis_is_recorded_per_ticker(recorded):
+    result, directory, _ = recorded
+    assert result["decision"] == "buy"
+    interactions = json.loads((directory / "AAPL.json").read_text())["interactions"]
+    upstreams = {i["upstream"] for i in interactions}
+    assert upstreams == {"yahoo", "serper", "yfinance", "gemini"}
+    llm = next(i for i in interactions if i["upstream"] == "gemini")
+    assert llm["seconds"] >= 0.3 and llm["response"]["usage"]["output_tokens"] > 0
+
+
+def test_replay_is_offline_with_recorded_or_zero_latency(recorded, monkeypatch):
+    result, _, offline_llm = recorded
+
+    use_mode(monkeypatch, "replay")
+    replayed, seconds = analyze()
+    assert replayed == result and offline_llm.calls == 0
+    # The LLM after the slowest source, as recorded
+    assert seconds >= 0.45
+
+    use_mode(monkeypatch, "replay", latency="zero")
+    replayed, seconds = analyze()
+    assert replayed == result and seconds < 0.2
+
+
+def test_replay_with_a_latency_profile(recorded, monkeypatch):
+    use_mode(monkeypatch, "replay", latency="gemini=1.0:1.0")
+    _, seconds = analyze()
+    assert 1.0 <= seconds < 1.5
+
+    # p99 of each upstream's recordings: every call as slow as the slowest
+    use_mode(monkeypatch, "replay", latency="p99")
+    _, seconds = analyze()
+    assert seconds >= 0.45
+
+
+def test_unrecorded_calls_miss(tmp_path, monkeypatch):
+    monkeypatch.setattr(cassette, "DIRECTORY", str(tmp_path))
+    use_mode(monkeypatch, "replay")
+    with pytest.raises(cassette.CassetteMiss):
+        with cassette.use("MSFT"):
+            cassette.recorded("yfinance", {"info": "MSFT"}, lambda: {})
+    cassette.reset()
+
+
+def test_profiles_and_request_keys():
+    assert cassette.parse_profile("yahoo=0.08:0.4, gemini=1.5") == {"yahoo": (0.08, 0.4), "gemini": (1.5, 1.5)}
+
+    samples = sorted(cassette._sample(0.1, 0.5) for _ in range(20000))
+    assert statistics.median(samples) == pytest.approx(0.1, rel=0.05)
+    assert samples[int(0.99 * len(samples))] == pytest.approx(0.5, rel=0.15)
+
+    # API keys stay out of the cassettes
+    request = cassette.http_request("GET", "https://fmp.test/quote/AAPL?apikey=secret", {"params": {"limit": 5}})
+    assert request["url"] == "https://fmp.test/quote/AAPL?limit=5"
+
+
+def test_streamed_reply_replays_its_chunks(tmp_path, monkeypatch):
+    async def collect():
+        return [(event, data) async for event, data in langchain_agent.stream_analysis("AAPL", "Apple")]
+
+    monkeypatch.setattr(cassette, "DIRECTORY", str(tmp_path))
+    use_mode(monkeypatch, "record")
+    monkeypatch.setattr(pure_tools, "yf", FakeYFinance())
+    monkeypatch.setattr(langchain_agent, "llm", fake_llm(0.4))
+    with StubUpstreams() as stub:
+        monkeypatch.setattr(pure_tools, "YAHOO_CHART_URL", f"{stub.url}/chart")
+        monkeypatch.setattr(pure_tools, "SERPER_URL", stub.url)
+        events = asyncio.run(collect())
+
+    monkeypatch.setattr(pure_tools, "yf", Offline())
+    use_mode(monkeypatch, "replay")
+    start = time.perf_counter()
+    replayed = asyncio.run(collect())
+    tokens = [data for event, data in replayed if event == "token"]
+    assert len(tokens) == 8 and tokens == [data for event, data in events if event == "token"]
+    assert replayed[-1] == events[-1]
+    # Chunks keep their recorded spacing
+    assert time.perf_counter() - start >= 0.35
+    cassette.reset()
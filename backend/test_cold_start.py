@@ -0,0 +1,31 @@
+import sys
+import os
+import json
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Imported with the first analysis, never at boot
+ANALYSIS_MODULES = ["financial_agent.langchain_agent", "langchain_google_genai", "langchain_core", "yfinance", "pandas"]
+
+
+def loaded_after(statement, **env):
+    env = dict(os.environ, MONGO_URL="mongodb://localhost:27017", DB_NAME="finguard_test", **env)
+    code = f"{statement}\nimport sys, json\nprint(json.dumps([m for m in {ANALYSIS_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_server_boots_without_the_analysis_stack():
+    assert loaded_after("import server") == []
+
+
+def test_llm_client_is_built_on_first_use():
+    # Without an API key, building the client at import used to fail the import
+    env = {k: v for k, v in os.environ.items() if k != "GOOGLE_API_KEY"}
+    result = subprocess.run(
+        [sys.executable, "-c", "from financial_agent import langchain_agent; print(langchain_agent.llm)"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == "None"
@@ -0,0 +1,180 @@
+import sys
+import os
+import json
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import cache
+import ingest
+import rollups
+
+DUMMY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dummy.txt")
+
+
+def test_iter_records_handles_every_dump_format(tmp_path, monkeypatch):
+    records = list(ingest.iter_records(DUMMY_FILE))
+    assert len(records) == 55
+
+    ndjson = tmp_path / "dump.ndjson"
+    ndjson.write_text("\n".join(json.dumps(r) for r in records) + "\n")
+    literal = tmp_path / "dump.txt"
+    literal.write_text("AA_api = " + repr(records))
+
+    # A tiny lookahead forces records to straddle chunk boundaries
+    monkeypatch.setattr(ingest, "CHUNK_SIZE", 64)
+    assert list(ingest.iter_records(DUMMY_FILE)) == records
+    assert list(ingest.iter_records(ndjson)) == records
+    assert list(ingest.iter_records(literal)) == records
+
+
+def test_reingesting_upserts_instead_of_duplicating(tmp_path):
+    records = list(ingest.iter_records(DUMMY_FILE))
+    changed = dict(records[0], amount=records[0]["amount"] + 1000)
+    update = tmp_path / "update.ndjson"
+    update.write_text(json.dumps(changed) + "\n" + json.dumps(dict(changed, txnId="T999")) + "\n")
+
+    async def run():
+        db = AsyncMongoMockClient()["finguard"]
+        stats = await ingest.ingest_file(db, DUMMY_FILE, batch_size=10)
+        assert stats["records"] == 55 and stats["batches"] == 6
+        await ingest.ingest_file(db, DUMMY_FILE, batch_size=10)
+        assert await db.transactions.count_documents({}) == 55
+
+        await ingest.ingest_file(db, update)
+        assert await db.transactions.count_documents({}) == 56
+        stored = await db.transactions.find_one({"id": changed["txnId"]})
+        assert stored["amount"] == changed["amount"]
+        assert await rollups.check_consistency(db) == []
+
+    asyncio.run(run())
+
+
+def test_records_without_a_txn_id_are_not_duplicated(tmp_path):
+    records = [{k: v for k, v in r.items() if k != "txnId"} for r in ingest.iter_records(DUMMY_FILE)][:5]
+    dump = tmp_path / "anonymous.ndjson"
+    dump.write_text("".join(json.dumps(r) + "\n" for r in records))
+    # Same content with the keys in another order
+    reordered = tmp_path / "reordered.ndjson"
+    reordered.write_text("".join(json.dumps(dict(reversed(r.items()))) + "\n" for r in records))
+
+    async def run():
+        db = AsyncMongoMockClient()["finguard"]
+        await ingest.ingest_file(db, dump)
+        await ingest.ingest_file(db, dump)
+        await ingest.ingest_file(db, reordered)
+        assert await db.transactions.count_documents({}) == 5
+
+        # Any change to the content makes it a different record
+        dump.write_text(json.dumps(dict(records[0], amount=records[0]["amount"] + 1)) + "\n")
+        await ingest.ingest_file(db, dump)
+        assert await db.transactions.count_documents({}) == 6
+
+    asyncio.run(run())
+
+
+def test_unchanged_dump_is_skipped(tmp_path):
+    dump = tmp_path / "dump.ndjson"
+    records = list(ingest.iter_records(DUMMY_FILE))
+    dump.write_text("\n".join(json.dumps(r) for r in records[:10]) + "\n")
+
+    async def run():
+        db = AsyncMongoMockClient()["finguard"]
+        seen = []
+        stats = await ingest.ingest_if_changed(db, dump, batch_size=4, progress=seen.append)
+        assert stats["records"] == 10 and seen == [4, 8, 10]
+        assert await ingest.ingest_if_changed(db, dump) is None
+
+        dump.write_text("\n".join(json.dumps(r) for r in records[:12]) + "\n")
+        assert (await ingest.ingest_if_changed(db, dump))["records"] == 12
+
+    asyncio.run(run())
+
+
+def test_writes_invalidate_cached_responses(tmp_path):
+    dump = tmp_path / "dump.ndjson"
+    records = list(ingest.iter_records(DUMMY_FILE))
+    dump.write_text("\n".join(json.dumps(r) for r in records[:5]) + "\n")
+
+    async def run():
+        db = AsyncMongoMockClient()["finguard"]
+        responses = cache.ResponseCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return b"{}"
+
+        async def fetch():
+            version = await cache.get_version(db)
+            return await responses.get_or_compute(responses.etag("/api/dashboard", [], version), compute)
+
+        await fetch()
+        await fetch()
+        assert len(calls) == 1
+
+        await ingest.ingest_file(db, dump)
+        await fetch()
+        assert len(calls) == 2 and (responses.hits, responses.misses) == (1, 2)
+
+    asyncio.run(run())
+
+
+def test_hashing_and_parsing_run_off_the_event_loop(tmp_path, monkeypatch):
+    import threading
+    records = list(ingest.iter_records(DUMMY_FILE))
+    literal = tmp_path / "dump.txt"
+    literal.write_text("AA_api = " + repr(records))
+    threads = []
+
+    def spy(function):
+        def call(*args):
+            threads.append(threading.current_thread())
+            return function(*args)
+        return call
+
+    monkeypatch.setattr(ingest, "file_hash", spy(ingest.file_hash))
+    monkeypatch.setattr(ingest.ast, "literal_eval", spy(ingest.ast.literal_eval))
+
+    async def run():
+        db = AsyncMongoMockClient()["finguard"]
+        assert (await ingest.ingest_if_changed(db, literal))["records"] == 55
+
+    asyncio.run(run())
+    assert len(threads) == 2 and threading.main_thread() not in threads
+
+
+def test_concurrent_workers_ingest_a_dump_once(tmp_path):
+    async def run():
+        db = AsyncMongoMockClient()["finguard"]
+        # Every worker process bootstraps at startup
+        results = await asyncio.gather(*(ingest.ingest_if_changed(db, DUMMY_FILE, batch_size=10) for _ in range(3)))
+        assert sum(stats is not None for stats in results) == 1
+        assert await db.transactions.count_documents({}) == 55
+        assert await rollups.check_consistency(db) == []
+        state = await db[ingest.INGEST_STATE_COLLECTION].find_one({"_id": "dummy.txt"})
+        assert state["status"] == "done" and state["records"] == 55
+
+    asyncio.run(run())
+
+
+def test_failed_ingest_releases_its_claim(tmp_path):
+    dump = tmp_path / "dump.json"
+    dump.write_text('[{"txnId": "T1", "amount": 1}, {"txnId":')
+
+    async def run():
+        db = AsyncMongoMockClient()["finguard"]
+        try:
+            await ingest.ingest_if_changed(db, dump)
+        except ValueError:
+            pass
+        state = await db[ingest.INGEST_STATE_COLLECTION].find_one({"_id": "dump.json"})
+        assert state["status"] == "failed"
+
+        dump.write_text('[{"txnId": "T1", "amount": 1, "date": "2025-01-01"}]')
+        assert (await ingest.ingest_if_changed(db, dump))["records"] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,258 @@
+import sys
+import os
+import time
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import jobs
+from financial_agent import ratelimit
+
+
+class StubAnalyst:
+    """Stands in for run_analysis_async: sleeps, counts calls and peak concurrency"""
+
+    def __init__(self, delay=0.2, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, ticker, company_name, llm_limit=None):
+        self.calls.append(ticker)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if ticker in self.fail:
+                return {"error": f"No data for {ticker}"}
+            return {"ticker": ticker, "company": company_name, "decision": "BUY"}
+        finally:
+            self.active -= 1
+
+
+def run(scenario, analyst, workers=2, db=None, heartbeat=jobs.JOB_HEARTBEAT):
+    async def main():
+        queue = jobs.JobQueue(db or AsyncMongoMockClient()["finguard"], analyst, workers=workers, limits={},
+                              heartbeat=heartbeat)
+        queue.start()
+        try:
+            return await scenario(queue)
+        finally:
+            await queue.stop()
+    return asyncio.run(main())
+
+
+def test_duplicate_requests_coalesce_and_results_persist():
+    analyst = StubAnalyst()
+
+    async def scenario(queue):
+        first, second = await asyncio.gather(queue.submit("aapl", "Apple"), queue.submit("AAPL", "Apple Inc"))
+        assert second["id"] == first["id"]
+        start = time.perf_counter()
+        job = await queue.get(first["id"], wait=5)
+        waited = time.perf_counter() - start
+        stored = await queue.collection.find_one({"id": first["id"]})
+        again = await queue.submit("AAPL", "Apple")
+        await queue.get(again["id"], wait=5)
+        return job, waited, stored, again
+
+    job, waited, stored, again = run(scenario, analyst)
+    # The long-poll returned as soon as the one shared analysis finished
+    assert waited < 1
+    assert job["status"] == "done" and job["requests"] == 2
+    assert job["result"]["decision"] == "BUY"
+    assert stored["result"] == job["result"]
+    # A finished job is not joined: the next request queues a new one
+    assert again["id"] != job["id"]
+    assert analyst.calls == ["AAPL", "AAPL"]
+
+
+def test_jobs_are_queued_only_once_stored():
+    analyst = StubAnalyst(delay=0.05)
+
+    async def scenario(queue):
+        insert_one = queue.collection.insert_one
+
+        async def slow_insert(document):
+            await asyncio.sleep(0.05)
+            return await insert_one(document)
+
+        queue.collection.insert_one = slow_insert
+        first, second = await asyncio.gather(queue.submit("AAPL", "Apple"), queue.submit("AAPL", "Apple"))
+        return first, second, await queue.get(first["id"], wait=2)
+
+    first, second, job = run(scenario, analyst)
+    # The duplicate joined the stored job, and a worker ran it
+    assert second is not None and second["id"] == first["id"]
+    assert job["status"] == "done" and job["requests"] == 2
+    assert analyst.calls == ["AAPL"]
+
+
+def test_requests_to_different_processes_coalesce():
+    db = AsyncMongoMockClient()["finguard"]
+    analyst = StubAnalyst(delay=0.2)
+
+    async def main():
+        queues = [jobs.JobQueue(db, analyst, workers=1, limits={}) for _ in range(2)]
+        for queue in queues:
+            queue.start()
+        try:
+            first, second = await asyncio.gather(*(queue.submit("AAPL", "Apple") for queue in queues))
+            # Each process long-polls, whichever of them runs the job
+            return first, second, await asyncio.gather(*(queue.get(first["id"], wait=5) for queue in queues))
+        finally:
+            for queue in queues:
+                await queue.stop()
+
+    first, second, polled = asyncio.run(main())
+    assert second["id"] == first["id"]
+    assert [job["status"] for job in polled] == ["done", "done"] and polled[0]["requests"] == 2
+    assert analyst.calls == ["AAPL"]
+
+
+def test_a_result_that_cannot_be_stored_fails_the_job():
+    async def scenario(queue):
+        update_one = queue.collection.update_one
+
+        async def reject_results(query, update):
+            if "result" in update.get("$set", {}) and update["$set"]["result"] is not None:
+                raise ValueError("document too large")
+            return await update_one(query, update)
+
+        queue.collection.update_one = reject_results
+        job = await queue.submit("AAPL", "Apple")
+        return await queue.get(job["id"], wait=2), queue._running, await queue.submit("AAPL", "Apple")
+
+    job, running, again = run(scenario, StubAnalyst(delay=0.05))
+    assert job["status"] == "failed" and job["error"] == "Could not record the result: document too large"
+    # No longer heartbeated, and no longer the ticker's unfinished job
+    assert not running
+    assert again["id"] != job["id"]
+
+
+def test_workers_bound_concurrency_and_record_failures():
+    analyst = StubAnalyst(delay=0.1, fail={"TSLA"})
+    tickers = ["AAPL", "MSFT", "NVDA", "AMZN", "TSLA", "META"]
+
+    async def scenario(queue):
+        submitted = [await queue.submit(t, t) for t in tickers]
+        return [await queue.get(job["id"], wait=5) for job in submitted]
+
+    done = run(scenario, analyst, workers=2)
+    assert analyst.peak == 2
+    assert sorted(analyst.calls) == sorted(tickers)
+    statuses = {job["ticker"]: job["status"] for job in done}
+    assert statuses.pop("TSLA") == "failed"
+    assert set(statuses.values()) == {"done"}
+    assert next(job for job in done if job["ticker"] == "TSLA")["error"] == "No data for TSLA"
+
+
+def test_long_poll_times_out_with_the_unfinished_job():
+    async def scenario(queue):
+        job = await queue.submit("AAPL", "Apple")
+        start = time.perf_counter()
+        polled = await queue.get(job["id"], wait=0.2)
+        return polled, time.perf_counter() - start, await queue.get("missing")
+
+    polled, waited, missing = run(scenario, StubAnalyst(delay=1))
+    assert polled["status"] in jobs.ACTIVE
+    assert 0.2 <= waited < 0.6
+    assert missing is None
+
+
+def test_unfinished_jobs_are_recovered_on_start():
+    db = AsyncMongoMockClient()["finguard"]
+    analyst = StubAnalyst(delay=0.05)
+
+    async def seed():
+        await db[jobs.JOBS_COLLECTION].insert_many([
+            {"id": "a", "ticker": "AAPL", "companyName": "Apple", "status": "running", "createdAt": 1},
+            {"id": "b", "ticker": "MSFT", "companyName": "Microsoft", "status": "queued", "createdAt": 2},
+            {"id": "c", "ticker": "NVDA", "companyName": "Nvidia", "status": "done", "createdAt": 0},
+        ])
+    asyncio.run(seed())
+
+    async def scenario(queue):
+        await asyncio.sleep(0.05)
+        return [await queue.get(job_id, wait=5) for job_id in "abc"]
+
+    done = run(scenario, analyst, db=db)
+    assert [job["status"] for job in done] == ["done", "done", "done"]
+    assert analyst.calls == ["AAPL", "MSFT"]
+
+
+def test_only_jobs_of_dead_processes_are_rerun():
+    db = AsyncMongoMockClient()["finguard"]
+    analyst = StubAnalyst(delay=0.05)
+    now = time.time()
+
+    async def seed():
+        await db[jobs.JOBS_COLLECTION].insert_many([
+            # Running in another live worker process
+            {"id": "live", "ticker": "AAPL", "companyName": "Apple", "status": "running",
+             "owner": "other", "heartbeatAt": now, "createdAt": 1},
+            {"id": "dead", "ticker": "MSFT", "companyName": "Microsoft", "status": "running",
+             "owner": "gone", "heartbeatAt": now - 10, "createdAt": 2},
+        ])
+    asyncio.run(seed())
+
+    async def scenario(queue):
+        # Two heartbeats, within the live job's staleness window: it is not reclaimed
+        await asyncio.sleep(0.2)
+        return await queue.get("live"), await queue.get("dead", wait=2)
+
+    live, dead = run(scenario, analyst, db=db, heartbeat=0.1)
+    assert live["status"] == "running"
+    assert dead["status"] == "done" and "owner" not in dead
+    assert analyst.calls == ["MSFT"]
+
+
+def test_running_jobs_are_heartbeated():
+    db = AsyncMongoMockClient()["finguard"]
+
+    async def scenario(queue):
+        job = await queue.submit("AAPL", "Apple")
+        await asyncio.sleep(0.1)
+        first = await queue.collection.find_one({"id": job["id"]})
+        await asyncio.sleep(0.25)
+        second = await queue.collection.find_one({"id": job["id"]})
+        return first, second, queue.owner
+
+    first, second, owner = run(scenario, StubAnalyst(delay=1), db=db, heartbeat=0.1)
+    assert first["status"] == "running" and first["owner"] == owner
+    assert second["heartbeatAt"] > first["heartbeatAt"]
+
+
+def test_rate_limits_apply_inside_the_job():
+    calls = []
+
+    async def analyst(ticker, company_name, llm_limit=None):
+        # What the fetchers do on every upstream request
+        for _ in range(3):
+            await ratelimit.athrottle("serper")
+            calls.append(time.perf_counter())
+        async with llm_limit:
+            pass
+        return {"ticker": ticker}
+
+    async def main():
+        limits = {"serper": ratelimit.RateLimit(20, burst=1), "llm": ratelimit.RateLimit(100)}
+        queue = jobs.JobQueue(AsyncMongoMockClient()["finguard"], analyst, workers=2, limits=limits)
+        queue.start()
+        try:
+            submitted = [await queue.submit(t, t) for t in ["AAPL", "MSFT"]]
+            for job in submitted:
+                assert (await queue.get(job["id"], wait=5))["status"] == "done"
+        finally:
+            await queue.stop()
+        # Outside a job nothing is throttled
+        assert ratelimit.current("serper") is None
+
+    asyncio.run(main())
+    # 6 calls at 20/s with no burst allowance: at least 5 gaps of 50ms
+    assert calls[-1] - calls[0] >= 0.24
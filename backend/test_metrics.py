@@ -0,0 +1,84 @@
+import sys
+import os
+import json
+import asyncio
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("langchain_google_genai")
+pytest.importorskip("prometheus_client")
+
+from prometheus_client import REGISTRY, generate_latest
+from financial_agent import pure_tools, metrics, langchain_agent
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture
+def stubs(upstreams, use_llm):
+    """0.2s fundamentals, 0.1s Serper, 0.3s LLM"""
+    use_llm(0.3)
+    return upstreams({"/news": 0.1, "/search": 0.1}, market_delay=0.2)
+
+
+def timings(caplog):
+    record = next(r for r in caplog.records if r.getMessage().startswith("Analysis timings for AAPL"))
+    return json.loads(record.args[1])
+
+
+def test_each_stage_gets_a_span(stubs, caplog):
+    caplog.set_level("INFO", logger=langchain_agent.logger.name)
+    llm_before = sample("finguard_analysis_stage_seconds_count", stage="llm")
+    asyncio.run(langchain_agent.run_analysis_async("AAPL", "Apple"))
+    spans = timings(caplog)
+
+    assert {"price", "fundamentals", "news", "esg", "prompt", "llm", "parse"} <= set(spans)
+    assert spans["fundamentals"] >= 0.2 and spans["news"] >= 0.1
+    assert spans["llm"] >= 0.3 and spans["prompt"] < 0.1
+    assert sample("finguard_analysis_stage_seconds_count", stage="llm") == llm_before + 1
+
+
+def test_sync_path_traces_fetch_pool_spans(stubs, caplog, monkeypatch):
+    caplog.set_level("INFO", logger=langchain_agent.logger.name)
+    monkeypatch.setattr(pure_tools, "get_latest_price", lambda t: {"ticker": t, "price": 1.0, "currency": "USD"})
+    langchain_agent.run_analysis("AAPL", "Apple")
+    spans = timings(caplog)
+    assert spans["fundamentals"] >= 0.2 and spans["llm"] >= 0.3
+
+
+def test_upstreams_and_tokens_are_counted(stubs):
+    serper = sample("finguard_upstream_request_seconds_count", upstream="serper", outcome="200")
+    gemini = sample("finguard_upstream_request_seconds_count", upstream="gemini", outcome="ok")
+    tokens = sample("finguard_llm_tokens_total", call="analysis", kind="input")
+    fast = sample("finguard_upstream_request_seconds_bucket", upstream="serper", outcome="200", le="0.05")
+
+    asyncio.run(langchain_agent.run_analysis_async("AAPL", "Apple"))
+
+    # News and ESG searches
+    assert sample("finguard_upstream_request_seconds_count", upstream="serper", outcome="200") == serper + 2
+    assert sample("finguard_upstream_request_seconds_count", upstream="gemini", outcome="ok") == gemini + 1
+    assert sample("finguard_llm_tokens_total", call="analysis", kind="input") > tokens
+    # Histograms, not just totals: the 0.1s searches land above the 50ms bucket
+    assert sample("finguard_upstream_request_seconds_bucket", upstream="serper", outcome="200", le="0.05") == fast
+
+    text = generate_latest().decode()
+    assert 'finguard_analysis_stage_seconds_bucket{le="0.5",stage="fundamentals"}' in text
+    # Memo and reply validation counts are scraped with the rest
+    assert "finguard_analysis_cache_lookups_total{result=" in text
+    assert "finguard_analysis_cache_tokens_total{kind=" in text
+    assert "finguard_analysis_replies_total{outcome=" in text
+
+
+def test_spans_outside_an_analysis_only_feed_the_histograms():
+    before = sample("finguard_analysis_stage_seconds_count", stage="resolve")
+    with metrics.span("resolve"):
+        pass
+    with metrics.trace() as spans:
+        with metrics.span("resolve"):
+            pass
+    assert sample("finguard_analysis_stage_seconds_count", stage="resolve") == before + 2
+    assert list(spans) == ["resolve"]
@@ -0,0 +1,132 @@
+import sys
+import os
+import json
+import asyncio
+import logging
+import datetime
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("prometheus_client")
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from pymongo import monitoring as mongo_monitoring
+
+import monitoring
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_requests_are_measured_per_route_template():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id, "padding": "x" * 1000}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                await asyncio.sleep(0.05)
+                yield f"{i}\n" * 100
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    app.add_middleware(monitoring.RequestMetricsMiddleware)
+    with TestClient(app) as client:
+        for item_id in ("a", "b", "c"):
+            client.get(f"/items/{item_id}")
+        client.get("/stream")
+        client.get("/missing")
+
+    assert sample("finguard_http_request_seconds_count", method="GET", route="/items/{item_id}", status="200") == 3
+    assert sample("finguard_http_response_bytes_sum", method="GET", route="/items/{item_id}") > 3000
+    # Streamed bodies count in full, and the latency runs to the last chunk
+    assert sample("finguard_http_response_bytes_sum", method="GET", route="/stream") == 600
+    assert sample("finguard_http_request_seconds_sum", method="GET", route="/stream", status="200") >= 0.15
+    assert sample("finguard_http_request_seconds_count", method="GET", route="unmatched", status="404") >= 1
+
+
+class Mongo:
+    """Feeds the listener the events the driver would send"""
+
+    def __init__(self, listener):
+        self.listener = listener
+        self.request_id = 0
+
+    def run(self, command, ms, reply=None):
+        self.request_id += 1
+        name = next(iter(command))
+        started = mongo_monitoring.CommandStartedEvent(
+            dict(command, lsid={"id": 1}, **{"$db": "finguard"}), "finguard", self.request_id, ("localhost", 27017), None)
+        self.listener.started(started)
+        self.listener.succeeded(mongo_monitoring.CommandSucceededEvent(
+            datetime.timedelta(milliseconds=ms), reply or {"ok": 1}, name, self.request_id, ("localhost", 27017), None))
+
+    def settle(self):
+        self.listener._explainer.submit(lambda: None).result()
+
+
+def slow_lines(caplog):
+    return [json.loads(r.getMessage().split(": ", 1)[1]) for r in caplog.records if r.getMessage().startswith("Slow query")]
+
+
+def test_slow_queries_are_logged_with_shape_and_docs_examined(caplog):
+    explained = []
+
+    def explain(database, command):
+        explained.append((database, command))
+        return {"docsExamined": 50000, "keysExamined": 0, "plan": "COLLSCAN"}
+
+    listener = monitoring.SlowQueryListener(threshold_ms=100, explain=explain)
+    mongo = Mongo(listener)
+    slow_before = sample("finguard_mongo_slow_queries_total", command="find", collection="transactions")
+
+    with caplog.at_level(logging.WARNING, logger="monitoring"):
+        mongo.run({"find": "transactions", "filter": {"category": "Food", "amount": {"$gte": 500}}}, ms=5)
+        mongo.run({"find": "transactions", "filter": {"category": "Travel", "amount": {"$gte": 9}}}, ms=250)
+        mongo.settle()
+        mongo.run({"find": "transactions", "filter": {"category": "Rent", "amount": {"$gte": 1}}}, ms=180)
+        mongo.settle()
+
+    lines = slow_lines(caplog)
+    assert len(lines) == 2
+    assert lines[0]["shape"]["filter"] == {"category": "?", "amount": {"$gte": "?"}}
+    assert lines[0]["ms"] == 250 and lines[0]["docsExamined"] == 50000 and lines[0]["plan"] == "COLLSCAN"
+    # One explain per shape: the second line reuses its stats
+    assert len(explained) == 1 and lines[1]["docsExamined"] == 50000
+    # Explained without the driver's session fields
+    assert explained[0][1] == {"find": "transactions", "filter": {"category": "Travel", "amount": {"$gte": 9}}}
+
+    assert sample("finguard_mongo_slow_queries_total", command="find", collection="transactions") == slow_before + 2
+    assert sample("finguard_mongo_command_seconds_count", command="find", collection="transactions") >= 3
+    listener.close()
+
+
+def test_aggregate_shapes_and_explain_layouts():
+    shape = monitoring.query_shape("aggregate", {"aggregate": "transactions", "pipeline": [
+        {"$match": {"type": "expense", "$or": [{"mode": "upi"}, {"mode": "card"}]}},
+        {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
+    ]})
+    assert shape == {"pipeline": [{"$match": {"type": "?", "$or": [{"mode": "?"}, {"mode": "?"}]}}, "$group"]}
+
+    find_explain = {
+        "queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}},
+        "executionStats": {"totalDocsExamined": 120, "totalKeysExamined": 120},
+    }
+    assert monitoring.explain_stats(find_explain) == {"docsExamined": 120, "keysExamined": 120, "plan": "FETCH -> IXSCAN"}
+
+    aggregate_explain = {"stages": [
+        {"$cursor": {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}},
+                     "executionStats": {"totalDocsExamined": 5000, "totalKeysExamined": 0}}},
+        {"$group": {}},
+    ]}
+    stats = monitoring.explain_stats(aggregate_explain)
+    assert stats["docsExamined"] == 5000 and stats["plan"] == "COLLSCAN"
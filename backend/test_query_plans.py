@@ -0,0 +1,41 @@
+import sys
+import os
+import asyncio
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import indexes
+from test_analytics_pipelines import make_transactions
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+
+
+def mongod_available():
+    from pymongo import MongoClient
+    try:
+        MongoClient(MONGO_URL, serverSelectionTimeoutMS=500).admin.command("ping")
+        return True
+    except Exception:
+        return False
+
+
+# explain() needs a real query planner, so this only runs against a local mongod
+@pytest.mark.skipif(not mongod_available(), reason="needs a running mongod at MONGO_URL")
+def test_every_filter_permutation_uses_an_index():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run():
+        client = AsyncIOMotorClient(MONGO_URL)
+        db = client["finguard_query_plans"]
+        try:
+            await db.transactions.drop()
+            await db.transactions.insert_many(make_transactions(2000))
+            await indexes.ensure_indexes(db)
+            return await indexes.verify_query_plans(db)
+        finally:
+            await client.drop_database("finguard_query_plans")
+            client.close()
+
+    assert asyncio.run(run()) == []
@@ -0,0 +1,148 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("yfinance")
+
+from financial_agent import pure_tools, source_cache
+from financial_agent.source_cache import SourceCache
+from stub_upstreams import StubUpstreams
+
+
+@pytest.fixture(autouse=True)
+def short_ttls(monkeypatch):
+    monkeypatch.setitem(source_cache.SOURCE_TTLS, "price", 0.2)
+
+
+class Upstream:
+    """Counting fetcher returning a new price on every call"""
+
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(self.delay)
+        return {"ticker": "AAPL", "price": 100 + calls}
+
+    async def fetch_async(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"ticker": "AAPL", "price": 100 + self.calls}
+
+
+def test_fresh_entries_are_served_from_memory():
+    cache, upstream = SourceCache(path=""), Upstream()
+    assert cache.get("price", "AAPL", upstream)["price"] == 101
+    assert cache.get("price", "AAPL", upstream)["price"] == 101
+    assert upstream.calls == 1
+    assert cache.stats["price", "hit"] == 1 and cache.stats["price", "miss"] == 1
+
+
+def test_persistent_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "sources.sqlite3")
+    upstream = Upstream()
+    SourceCache(path=path).get("price", "AAPL", upstream)
+
+    restarted = SourceCache(path=path)
+    assert restarted.get("price", "AAPL", upstream)["price"] == 101
+    assert upstream.calls == 1
+
+
+def test_stale_entries_are_served_while_revalidating():
+    cache, upstream = SourceCache(path=""), Upstream(delay=0.1)
+    cache.get("price", "AAPL", upstream)
+    time.sleep(0.25)
+
+    start = time.perf_counter()
+    assert cache.get("price", "AAPL", upstream)["price"] == 101
+    assert time.perf_counter() - start < 0.05
+    time.sleep(0.2)
+    assert cache.get("price", "AAPL", upstream)["price"] == 102
+    assert cache.stats["price", "stale"] == 1
+
+
+def test_expired_entries_are_refetched():
+    cache, upstream = SourceCache(path=""), Upstream()
+    cache.get("price", "AAPL", upstream)
+    time.sleep(0.45)
+    assert cache.get("price", "AAPL", upstream)["price"] == 102
+    assert cache.stats["price", "miss"] == 2
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache, upstream = SourceCache(path=""), Upstream(delay=0.2)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: cache.get("price", "AAPL", upstream), range(8)))
+    assert upstream.calls == 1
+    assert all(r["price"] == 101 for r in results)
+
+
+def test_concurrent_async_misses_share_one_fetch():
+    cache, upstream = SourceCache(path=""), Upstream(delay=0.1)
+
+    async def run():
+        return await asyncio.gather(*(cache.aget("price", "AAPL", upstream.fetch_async) for _ in range(8)))
+
+    results = asyncio.run(run())
+    assert upstream.calls == 1
+    assert all(r["price"] == 101 for r in results)
+
+
+def test_failed_lookups_are_not_cached():
+    cache = SourceCache(path="")
+    cache.get("price", "AAPL", lambda: {"ticker": "AAPL", "price": None})
+    cache.get("news", "apple", lambda: {"error": "timeout", "company": "apple"})
+    assert cache.get("price", "AAPL", Upstream())["price"] == 101
+    assert cache.stats["price", "miss"] == 2 and cache.stats["news", "miss"] == 1
+
+    # yfinance answers unknown symbols with an empty info dict
+    empty = {"ticker": "ZZZZ", "pe_ratio": None, "roe": None, "sector": None, "market_cap": None}
+    cache.get("market_data", "ZZZZ", lambda: empty)
+    cache.get("market_data", "ZZZZ", lambda: empty)
+    assert cache.stats["market_data", "miss"] == 2
+
+
+def test_async_lookups_touch_sqlite_off_the_event_loop(tmp_path, monkeypatch):
+    cache, upstream = SourceCache(path=str(tmp_path / "sources.sqlite3")), Upstream()
+    threads = []
+    for name in ("_load", "_persist"):
+        def spy(*args, method=getattr(cache, name)):
+            threads.append(threading.get_ident())
+            return method(*args)
+        monkeypatch.setattr(cache, name, spy)
+
+    async def run():
+        await cache.aget("price", "AAPL", upstream.fetch_async)
+        cache._memory.clear()
+        return threading.get_ident(), await cache.aget("price", "AAPL", upstream.fetch_async)
+
+    loop_thread, value = asyncio.run(run())
+    # Miss, store, then the reload from SQLite
+    assert value["price"] == 101 and upstream.calls == 1
+    assert len(threads) == 3 and loop_thread not in threads
+
+
+def test_pure_tools_go_through_the_cache(monkeypatch):
+    source_cache.set_cache(SourceCache(path=""))
+    with StubUpstreams() as stub:
+        monkeypatch.setattr(pure_tools, "YAHOO_CHART_URL", f"{stub.url}/chart")
+        monkeypatch.setattr(pure_tools, "SERPER_URL", stub.url)
+        pure_tools.get_latest_price("aapl")
+        pure_tools.get_latest_price("AAPL ")
+        pure_tools.get_company_news("Apple")
+        asyncio.run(pure_tools.get_company_news_async("apple"))
+        asyncio.run(pure_tools.get_sustainability_data_async("Apple"))
+        pure_tools.get_sustainability_data("Apple")
+    assert stub.hits == {"/chart": 1, "/news": 1, "/search": 1}
@@ -0,0 +1,62 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("langchain_google_genai")
+
+from financial_agent import langchain_agent
+from stub_upstreams import ANALYSIS_JSON
+
+
+@pytest.fixture
+def stubs(upstreams, use_llm):
+    use_llm(0.4)
+    return upstreams({"/news": 0.1, "/search": 0.2}, market_delay=0.3)
+
+
+def collect():
+    async def run():
+        start = time.perf_counter()
+        return [(time.perf_counter() - start, event, data)
+                async for event, data in langchain_agent.stream_analysis("AAPL", "Apple")]
+    return asyncio.run(run())
+
+
+def test_stages_stream_as_they_finish(stubs):
+    events = collect()
+    names = [event for _, event, _ in events]
+
+    # Fastest source first; the 0.3s fundamentals come last
+    assert names[:4] == ["price", "news", "esg", "fundamentals"]
+    assert events[0][0] < 0.1
+    assert names[-1] == "result"
+    tokens = [data for _, event, data in events if event == "token"]
+    assert len(tokens) > 1 and "".join(tokens) == ANALYSIS_JSON
+    result = events[-1][2]
+    assert result["decision"] == "buy" and result["ticker"] == "AAPL"
+    assert json.dumps(result)
+
+
+def test_streamed_replies_are_memoized(stubs, counts):
+    collect()
+    events = collect()
+    tokens = [data for _, event, data in events if event == "token"]
+    assert tokens == [ANALYSIS_JSON]
+    assert counts("finguard_analysis_cache_lookups_total", result="hit") == 1
+    assert counts("finguard_analysis_cache_tokens_total", kind="saved") > 0
+
+
+def test_failures_end_the_stream_with_an_error(stubs, monkeypatch):
+    def explode(*args):
+        raise RuntimeError("prompt failed")
+
+    monkeypatch.setattr(langchain_agent, "build_prompt_inputs", explode)
+    events = collect()
+    assert events[-1][1] == "error"
+    assert events[-1][2]["error"] == "prompt failed"
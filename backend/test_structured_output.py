@@ -0,0 +1,89 @@
+import sys
+import os
+import json
+import asyncio
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("langchain_google_genai")
+
+from financial_agent import pure_tools, langchain_agent
+from financial_agent.schemas import GreenStockDecision
+from stub_upstreams import ANALYSIS_JSON
+
+# Scraping the braces would have accepted this; the schema does not
+MISSING_GREEN = json.dumps({k: v for k, v in json.loads(ANALYSIS_JSON).items() if not k.startswith("green")})
+
+
+@pytest.fixture
+def sources(upstreams, monkeypatch):
+    upstreams()
+
+    async def latest_price(ticker):
+        return {"ticker": ticker, "price": 123.45, "currency": "USD"}
+
+    monkeypatch.setattr(pure_tools, "get_latest_price_async", latest_price)
+
+
+def analyze():
+    return asyncio.run(langchain_agent.run_analysis_async("AAPL", "Apple"))
+
+
+def test_response_schema_leaves_metadata_to_the_server():
+    schema = langchain_agent.RESPONSE_SCHEMA
+    assert not set(langchain_agent.METADATA_FIELDS) & set(schema["properties"])
+    assert {"decision", "green_score", "green_summary"} <= set(schema["required"])
+    assert GreenStockDecision.model_validate_json('{"decision": "Strong Buy", "risk_level": "HIGH", '
+                                                  '"time_horizon": "LONG_TERM", "current_financial_condition": "ok", '
+                                                  '"reasons": [], "key_metrics_considered": [], '
+                                                  '"green_score": "3", "green_summary": "coal"}').decision == "strong_buy"
+
+
+def test_valid_reply_takes_one_call(sources, use_llm, counts):
+    llm = use_llm(0, [ANALYSIS_JSON])
+    result = analyze()
+    assert llm.calls == 1
+    assert result["decision"] == "buy" and result["green_score"] == 7
+    assert result["current_stock_price"] == "123.45" and result["ticker"] == "AAPL"
+    assert counts("finguard_analysis_replies_total", outcome="validated") == 1
+
+
+def test_invalid_reply_is_repaired_by_one_cheap_call(sources, use_llm, counts):
+    llm = use_llm(0, [MISSING_GREEN, ANALYSIS_JSON])
+    result = analyze()
+
+    assert llm.calls == 2
+    assert result["decision"] == "buy" and result["green_summary"]
+    assert counts("finguard_analysis_replies_total", outcome="repaired") == 1 and counts("finguard_analysis_replies_total", outcome="failed") == 0
+    # The repair prompt carries the bad reply and its errors, not the market data
+    spent = counts("finguard_analysis_cache_tokens_total", kind="spent")
+    repair = sum(counts("finguard_llm_tokens_total", call="repair", kind=kind) for kind in ("input", "output"))
+    assert 0 < repair < spent - repair
+
+    # Repaired replies are memoized like any valid one
+    analyze()
+    assert llm.calls == 2 and counts("finguard_analysis_cache_lookups_total", result="hit") == 1
+
+
+def test_failed_repair_falls_back_to_hold(sources, use_llm, counts):
+    llm = use_llm(0, ["Sorry, no JSON today"])
+    result = analyze()
+    assert llm.calls == 2
+    assert result["decision"] == "hold"
+    assert result["current_financial_condition"] == "LLM response did not contain valid JSON"
+    assert counts("finguard_analysis_replies_total", outcome="failed") == 1
+
+
+def test_streamed_reply_is_repaired_before_the_result(sources, use_llm, counts):
+    llm = use_llm(0, [MISSING_GREEN, ANALYSIS_JSON])
+
+    async def collect():
+        return [(event, data) async for event, data in langchain_agent.stream_analysis("AAPL", "Apple")]
+
+    events = asyncio.run(collect())
+    assert "".join(data for event, data in events if event == "token") == MISSING_GREEN
+    event, result = events[-1]
+    assert event == "result" and result["green_score"] == 7
+    assert llm.calls == 2 and counts("finguard_analysis_replies_total", outcome="repaired") == 1
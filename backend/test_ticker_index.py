@@ -0,0 +1,168 @@
+import sys
+import os
+import time
+import asyncio
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from financial_agent import ticker_index
+from financial_agent.ticker_index import load_index, normalize
+
+
+@pytest.fixture
+def index(tmp_path):
+    return load_index(learned=str(tmp_path / "learned.csv"))
+
+
+def test_normalize_folds_punctuation_and_legal_suffixes():
+    assert normalize("The Procter & Gamble Company") == "procter and gamble"
+    assert normalize("Eli Lilly and Company") == "eli lilly"
+    assert normalize("McDonald's Corporation") == "mcdonalds"
+    assert normalize("Amazon.com, Inc.") == "amazon"
+
+
+@pytest.mark.parametrize("name, ticker", [
+    ("Apple", "AAPL"),
+    ("apple inc.", "AAPL"),
+    ("AAPL", "AAPL"),
+    ("facebook", "META"),
+    ("Procter and Gamble", "PG"),
+    ("Reliance Industries Ltd", "RELIANCE.NS"),
+    ("infosys", "INFY.NS"),
+    ("TCS", "TCS.NS"),
+    ("Mahindra & Mahindra", "M&M.NS"),
+])
+def test_exact_names_aliases_and_symbols(index, name, ticker):
+    assert index.resolve(name) == ticker
+
+
+def test_unambiguous_prefixes_resolve(index):
+    assert index.resolve("berkshire") == "BRK-B"
+    assert index.resolve("T-Mobile") == "TMUS"
+    assert index.resolve("Tata Consultancy") == "TCS.NS"
+
+
+def test_typos_resolve_by_trigram_similarity(index):
+    assert index.resolve("Microsft") == "MSFT"
+    assert index.resolve("Netflx") == "NFLX"
+
+
+def test_group_names_and_unknown_companies_miss(index):
+    assert index.resolve("Tata") is None
+    assert index.resolve("Adani") is None
+    assert index.resolve("Apple Hospitality REIT") is None
+    assert index.resolve("") is None
+
+
+@pytest.mark.parametrize("name", [
+    # A single leading word, or a listed name inside a longer one, goes to the LLM
+    "home",
+    "Coca Cola Europacific",
+    "Infosys BPM",
+    "Microsoft Teams",
+])
+def test_partial_names_miss(index, name):
+    assert index.resolve(name) is None
+
+
+def test_learned_tickers_are_persisted(tmp_path):
+    learned = str(tmp_path / "learned.csv")
+    index = load_index(learned=learned)
+    assert index.resolve("Zomato") is None
+    assert index.learn("Zomato", "eternal.ns")
+    assert not index.learn("Acme", "I don't know")
+    assert index.resolve("zomato") == "ETERNAL.NS"
+
+    reloaded = load_index(learned=learned)
+    assert reloaded.resolve("Zomato") == "ETERNAL.NS"
+    assert reloaded.resolve("Acme") is None
+
+
+def test_resolution_is_sub_millisecond(index):
+    names = ["Apple", "microsoft corp", "Berkshire", "Netflx", "Tata", "State Bank of India"] * 200
+    start = time.perf_counter()
+    for name in names:
+        index.resolve(name)
+    assert (time.perf_counter() - start) / len(names) < 0.001
+
+
+def test_import_official_listings(tmp_path):
+    listings = tmp_path / "listings.csv"
+    listings.write_text("ticker,name,exchange,aliases\nAAPL,Apple Inc.,NASDAQ,apple\n")
+    nasdaq = tmp_path / "nasdaqlisted.txt"
+    nasdaq.write_text(
+        "Symbol|Security Name|Market Category|Test Issue|Financial Status|Round Lot Size|ETF|NextShares\n"
+        "AAPL|Apple Inc. - Common Stock|Q|N|N|100|N|N\n"
+        "ZVZZT|NASDAQ TEST STOCK|G|Y|N|100|N|N\n"
+        "SIRI|Sirius XM Holdings Inc. - Common Stock|Q|N|N|100|N|N\n"
+        "File Creation Time: 1018202608:00|||||||\n"
+    )
+    other = tmp_path / "otherlisted.txt"
+    other.write_text(
+        "ACT Symbol|Security Name|Exchange|CQS Symbol|ETF|Round Lot Size|Test Issue|NASDAQ Symbol\n"
+        "BRK.B|Berkshire Hathaway Inc. Class B|N|BRK.B|N|100|N|BRK.B\n"
+    )
+    nse = tmp_path / "EQUITY_L.csv"
+    nse.write_text("SYMBOL,NAME OF COMPANY, SERIES\nIRFC,Indian Railway Finance Corporation Limited,EQ\n")
+
+    assert ticker_index.import_listings([nasdaq, other, nse], listings=listings) == 3
+    index = load_index(listings=listings, learned=None)
+    assert index.resolve("Sirius XM") == "SIRI"
+    assert index.resolve("Berkshire Hathaway Class B") == "BRK-B"
+    assert index.resolve("Indian Railway Finance") == "IRFC.NS"
+    assert index.resolve("apple") == "AAPL"
+
+
+@pytest.fixture
+def llm_tickers(tmp_path, monkeypatch):
+    """use(answer): the ticker LLM answers `answer`; Yahoo quotes only ETERNAL.NS.
+    Yields the module and the learned-tickers file.
+    """
+    pytest.importorskip("langchain_google_genai")
+    from financial_agent import utils, pure_tools
+    from stub_upstreams import fake_llm
+
+    learned = tmp_path / "learned.csv"
+    ticker_index.set_index(load_index(learned=str(learned), extra=utils.COMMON_TICKERS))
+    calls = []
+
+    def use(answer):
+        def chain():
+            calls.append(answer)
+            return utils.TICKER_PROMPT | fake_llm(0, answer)
+        monkeypatch.setattr(utils, "_ticker_chain", chain)
+
+    def quote(ticker):
+        return {"ticker": ticker, "price": 100.0 if ticker == "ETERNAL.NS" else None, "currency": "INR"}
+
+    async def aquote(ticker):
+        return quote(ticker)
+
+    monkeypatch.setattr(pure_tools, "get_latest_price", quote)
+    monkeypatch.setattr(pure_tools, "get_latest_price_async", aquote)
+    yield utils, use, calls, learned
+    ticker_index.set_index(None)
+
+
+def test_get_ticker_only_asks_the_llm_on_misses(llm_tickers):
+    utils, use, calls, learned = llm_tickers
+    use("ETERNAL.NS")
+    assert utils.get_ticker("Apple") == "AAPL"
+    assert asyncio.run(utils.get_ticker_async("Zomato")) == "ETERNAL.NS"
+    assert utils.get_ticker("zomato") == "ETERNAL.NS"
+    assert len(calls) == 1
+    assert "ETERNAL.NS,Zomato" in learned.read_text()
+
+
+@pytest.mark.parametrize("answer", ["NONE", "UNKNOWN", "ZZZQ"])
+def test_llm_answers_yahoo_cannot_quote_are_not_learned(llm_tickers, answer):
+    utils, use, calls, learned = llm_tickers
+    use(answer)
+    assert utils.get_ticker("Acme Widgets") == ""
+    assert asyncio.run(utils.get_ticker_async("Acme Widgets")) == ""
+    assert asyncio.run(utils.get_tickers_async(["Acme Widgets"])) == {"Acme Widgets": ""}
+    # Asked again each time, never persisted
+    assert len(calls) == 3
+    assert not learned.exists()
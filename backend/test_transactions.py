@@ -0,0 +1,139 @@
+import sys
+import os
+import json
+import asyncio
+import pytest
+
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "finguard_test")
+
+import indexes
+import queries
+from test_analytics_pipelines import make_transactions
+from test_query_plans import MONGO_URL, mongod_available
+
+
+def find(db, query, sort=queries.SORT):
+    return asyncio.run(db.transactions.find(query, {"_id": 0}).sort(sort).to_list(None))
+
+
+@pytest.fixture
+def mock_db():
+    db = AsyncMongoMockClient()["finguard"]
+    asyncio.run(db.transactions.insert_many(make_transactions()))
+    return db
+
+
+@pytest.fixture
+def api(mock_db, monkeypatch):
+    """The app over mongomock, without the startup bootstrap"""
+    import server
+    monkeypatch.setattr(server, "db", mock_db)
+    return TestClient(server.app)
+
+
+def newest_first(transactions):
+    return sorted(transactions, key=lambda t: (t["date"], t["id"]), reverse=True)
+
+
+def test_cursor_pages_cover_every_row_once(api):
+    expected = [t["id"] for t in newest_first(make_transactions())]
+    # Dates repeat, so pages must break ties on id
+    assert len({t["date"] for t in make_transactions()}) < len(expected)
+
+    seen, params = [], {"limit": 37}
+    while True:
+        response = api.get("/api/transactions", params=params)
+        assert response.status_code == 200
+        seen += [t["id"] for t in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params = {"limit": 37, "cursor": cursor}
+    assert seen == expected
+
+
+def test_cursor_round_trips_and_filters_apply_per_page(api):
+    expense = [t["id"] for t in newest_first(make_transactions()) if t["type"] == "expense"]
+    first = api.get("/api/transactions", params={"type": "expense", "limit": 10})
+    cursor = first.headers["X-Next-Cursor"]
+    assert queries.decode_cursor(cursor) == queries.decode_cursor(queries.encode_cursor(first.json()[-1]))
+
+    second = api.get("/api/transactions", params={"type": "expense", "limit": 10, "cursor": cursor})
+    assert [t["id"] for t in first.json() + second.json()] == expense[:20]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "bm9wZQ==", queries.encode_cursor({"date": "2025", "id": "T1"})[:-4]])
+def test_invalid_cursor_is_rejected(api, cursor):
+    response = api.get("/api/transactions", params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_ndjson_streams_every_matching_row(api):
+    response = api.get("/api/transactions", params={"format": "ndjson", "highValue": True})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    # Streamed whole, never paged
+    assert "X-Next-Cursor" not in response.headers
+    assert [t["id"] for t in rows] == [t["id"] for t in newest_first(make_transactions()) if t["isHighValue"]]
+
+    limited = api.get("/api/transactions", params={"format": "ndjson", "limit": 5})
+    assert len(limited.text.splitlines()) == 5
+
+
+def test_search_input_is_sanitized():
+    # Quotes and leading '-' would make phrases and negations
+    assert queries.text_search('"swiggy" -food --') == {"$text": {"$search": "swiggy food"}}
+    assert queries.text_search(' " - ') == {}
+    assert queries.build_query(search='"') == {}
+    assert queries.sort_order('"') == queries.SORT
+    assert queries.sort_order("swiggy")[0] == ("score", {"$meta": "textScore"})
+    # Prefix matches are listed newest first
+    assert queries.sort_order("swig", prefix=True) == queries.SORT
+
+
+def test_prefix_search_matches_word_starts(mock_db):
+    swiggy = find(mock_db, queries.build_query(search="swig", prefix=True))
+    assert swiggy and {t["merchant"] for t in swiggy} == {"Swiggy"}
+
+    # Every term must match, each at the start of a word of any searched field
+    coffee = find(mock_db, queries.build_query(type="expense", search="caf coff", prefix=True))
+    assert coffee and all(t["merchant"] == "Cafe Coffee Day" and t["type"] == "expense" for t in coffee)
+    assert find(mock_db, queries.build_query(search="wiggy", prefix=True)) == []
+
+    # Terms are matched literally, not as patterns
+    assert find(mock_db, queries.build_query(search="c++ .*", prefix=True)) == []
+
+
+# $text needs a real mongod; mongomock does not implement it
+@pytest.mark.skipif(not mongod_available(), reason="needs a running mongod at MONGO_URL")
+def test_text_search_ranks_by_field_weight():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    rows = [
+        {"id": "N", "date": "2025-03-01", "merchant": "Zomato", "category": "Food", "narration": "swiggy refund"},
+        {"id": "M", "date": "2025-01-01", "merchant": "Swiggy", "category": "Food", "narration": "order"},
+        {"id": "X", "date": "2025-02-01", "merchant": "Myntra", "category": "Shopping", "narration": "order"},
+    ]
+
+    async def run():
+        client = AsyncIOMotorClient(MONGO_URL)
+        db = client["finguard_search"]
+        try:
+            await db.transactions.drop()
+            await db.transactions.insert_many(rows)
+            await indexes.ensure_indexes(db)
+            query = queries.build_query(search="swiggy")
+            return await db.transactions.find(query, {"_id": 0}).sort(queries.sort_order("swiggy")).to_list(None)
+        finally:
+            await client.drop_database("finguard_search")
+            client.close()
+
+    # A merchant hit outranks a newer narration hit
+    assert [t["id"] for t in asyncio.run(run())] == ["M", "N"]
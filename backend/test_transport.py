@@ -0,0 +1,90 @@
+import sys
+import os
+import asyncio
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("httpx")
+
+from financial_agent import transport, ratelimit
+from financial_agent.gather import run_sync
+from stub_upstreams import StubUpstreams
+
+
+@pytest.fixture(autouse=True)
+def fresh_transport(monkeypatch):
+    monkeypatch.setattr(transport, "_host_limits", {})
+    monkeypatch.setattr(transport, "HTTP_BACKOFF", 0.01)
+    transport.close()
+    yield
+    transport.close()
+
+
+def test_connections_are_kept_alive():
+    with StubUpstreams() as stub:
+        for _ in range(10):
+            assert transport.get_json(f"{stub.url}/chart/AAPL")["chart"]["result"]
+    assert stub.hits["/chart"] == 10
+    assert len(stub.connections) == 1
+
+
+def test_retries_5xx_with_backoff():
+    with StubUpstreams(failures={"/news": 2}) as stub:
+        body = transport.post_json(f"{stub.url}/news", json={"q": "Apple"})
+    assert body["news"]
+    assert stub.hits["/news"] == 3
+
+
+def test_gives_up_after_the_retry_budget():
+    with StubUpstreams(failures={"/news": 5}) as stub:
+        response = transport.request("POST", f"{stub.url}/news", retries=1, json={"q": "Apple"})
+    assert response.status_code == 503
+    assert stub.hits["/news"] == 2
+
+
+def test_per_host_concurrency_is_limited(monkeypatch):
+    monkeypatch.setattr(transport, "HTTP_MAX_PER_HOST", 3)
+    with StubUpstreams({"/chart": 0.1}) as stub:
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            list(pool.map(lambda _: transport.get_json(f"{stub.url}/chart/AAPL"), range(12)))
+    assert stub.hits["/chart"] == 12
+    assert stub.peak == 3
+
+
+def test_async_requests_share_the_limits_and_retry(monkeypatch):
+    monkeypatch.setattr(transport, "HTTP_MAX_PER_HOST", 3)
+    with StubUpstreams({"/chart": 0.1}, failures={"/search": 1}) as stub:
+        async def run():
+            charts = asyncio.gather(*(transport.aget_json(f"{stub.url}/chart/AAPL") for _ in range(12)))
+            search = transport.apost_json(f"{stub.url}/search", json={"q": "Apple ESG"})
+            return await asyncio.gather(charts, search)
+
+        charts, search = asyncio.run(run())
+
+    assert len(charts) == 12 and search["organic"]
+    assert stub.peak == 3
+    assert stub.hits["/search"] == 2
+
+
+def test_source_rate_limits_apply_within_their_scope():
+    with StubUpstreams() as stub:
+        def search():
+            return transport.post_json(f"{stub.url}/search", json={"q": "Apple ESG"}, source="serper")
+
+        async def run():
+            with ratelimit.limited({"serper": ratelimit.RateLimit(20, burst=1)}):
+                start = asyncio.get_running_loop().time()
+                # Coroutines and fetch-pool calls started in the scope share the limit
+                await asyncio.gather(*(transport.apost_json(f"{stub.url}/search", json={"q": "Apple"}, source="serper")
+                                       for _ in range(3)), run_sync(search), run_sync(search))
+                limited = asyncio.get_running_loop().time() - start
+            start = asyncio.get_running_loop().time()
+            await asyncio.gather(*(run_sync(search) for _ in range(5)))
+            return limited, asyncio.get_running_loop().time() - start
+
+        limited, unlimited = asyncio.run(run())
+    assert limited >= 0.19
+    assert unlimited < 0.15
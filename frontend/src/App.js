@@ -44,22 +44,15 @@ function App() {
 
   const fetchAllData = async () => {
     try {
-      const [transRes, summaryRes, categoryRes, monthlyRes, taxRes, insightsRes] = await Promise.all([
-        axios.get(`${API}/transactions`),
-        axios.get(`${API}/analytics/summary`),
-        axios.get(`${API}/analytics/category-summary`),
-        axios.get(`${API}/analytics/monthly-summary`),
-        axios.get(`${API}/analytics/tax-summary`),
-        axios.get(`${API}/analytics/spend-insights`)
-      ]);
-
-      setTransactions(transRes.data);
-      setFilteredTransactions(transRes.data);
-      setSummary(summaryRes.data);
-      setCategorySummary(categoryRes.data);
-      setMonthlySummary(monthlyRes.data);
-      setTaxSummary(taxRes.data);
-      setSpendInsights(insightsRes.data);
+      const { data } = await axios.get(`${API}/dashboard`);
+
+      setTransactions(data.transactions);
+      setFilteredTransactions(data.transactions);
+      setSummary(data.summary);
+      setCategorySummary(data.categorySummary);
+      setMonthlySummary(data.monthlySummary);
+      setTaxSummary(data.taxSummary);
+      setSpendInsights(data.spendInsights);
     } catch (error) {
       console.error("Error fetching data:", error);
     }
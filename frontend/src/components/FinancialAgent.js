@@ -1,5 +1,4 @@
 import React, { useState } from 'react';
-import axios from 'axios';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Input } from "@/components/ui/input";
 import { Button } from "@/components/ui/button";
@@ -10,11 +9,46 @@ import { Loader2, ArrowLeft, TrendingUp, AlertTriangle, CheckCircle, DollarSign,
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8000';
 const API = `${BACKEND_URL}/api`;
 
+// Progress events sent by /financial-analysis/stream before the LLM reply
+const STAGES = [
+    { key: 'ticker', label: 'Ticker' },
+    { key: 'price', label: 'Price' },
+    { key: 'fundamentals', label: 'Fundamentals' },
+    { key: 'news', label: 'News' },
+    { key: 'esg', label: 'ESG' },
+];
+
+// Reads a text/event-stream response body, calling onEvent(event, data) per message
+const readEventStream = async (response, onEvent) => {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const message = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            const data = [];
+            message.split('\n').forEach((line) => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data.push(line.slice(5).trim());
+            });
+            if (data.length) onEvent(event, JSON.parse(data.join('\n')));
+        }
+    }
+};
+
 const FinancialAgent = ({ onBack }) => {
     const [companyName, setCompanyName] = useState('');
     const [loading, setLoading] = useState(false);
     const [result, setResult] = useState(null);
     const [error, setError] = useState(null);
+    const [stages, setStages] = useState({});
+    const [draft, setDraft] = useState('');
 
     const handleAnalyze = async () => {
         if (!companyName.trim()) return;
@@ -22,19 +56,32 @@ const FinancialAgent = ({ onBack }) => {
         setLoading(true);
         setError(null);
         setResult(null);
+        setStages({});
+        setDraft('');
 
         try {
-            const response = await axios.post(`${API}/financial-analysis`, {
-                company_name: companyName
+            const response = await fetch(`${API}/financial-analysis/stream`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ company_name: companyName })
             });
-
-            if (response.data.error) {
-                setError(response.data.error);
-            } else {
-                setResult(response.data);
+            if (!response.ok) {
+                throw new Error(`Request failed with status ${response.status}`);
             }
+
+            await readEventStream(response, (event, data) => {
+                if (event === 'token') {
+                    setDraft((text) => text + data);
+                } else if (event === 'result') {
+                    setResult(data);
+                } else if (event === 'error') {
+                    setError(data.error || "An error occurred");
+                } else {
+                    setStages((done) => ({ ...done, [event]: data }));
+                }
+            });
         } catch (err) {
-            setError(err.response?.data?.detail || err.message || "An error occurred");
+            setError(err.message || "An error occurred");
         } finally {
             setLoading(false);
         }
@@ -124,6 +171,37 @@ const FinancialAgent = ({ onBack }) => {
                     </CardContent>
                 </Card>
 
+                {/* Progress while the analysis streams in */}
+                {loading && (
+                    <Card className="shadow-lg border-slate-200">
+                        <CardHeader>
+                            <CardTitle className="flex items-center gap-2">
+                                <Loader2 className="w-5 h-5 animate-spin text-blue-600" />
+                                Analysis in progress
+                            </CardTitle>
+                        </CardHeader>
+                        <CardContent className="space-y-4">
+                            <div className="flex flex-wrap gap-2">
+                                {STAGES.map(({ key, label }) => (
+                                    <Badge
+                                        key={key}
+                                        variant="outline"
+                                        className={`px-3 py-1 text-sm ${stages[key] ? 'text-green-700 bg-green-50 border-green-200' : 'text-slate-500'}`}
+                                    >
+                                        {stages[key] ? <CheckCircle className="w-4 h-4 mr-1" /> : <Loader2 className="w-4 h-4 mr-1 animate-spin" />}
+                                        {label}{key === 'ticker' && stages.ticker ? `: ${stages.ticker.ticker}` : ''}
+                                    </Badge>
+                                ))}
+                            </div>
+                            {draft && (
+                                <pre className="text-sm text-slate-600 bg-slate-50 rounded-xl p-4 whitespace-pre-wrap max-h-64 overflow-auto">
+                                    {draft}
+                                </pre>
+                            )}
+                        </CardContent>
+                    </Card>
+                )}
+
                 {/* Error Display */}
                 {error && (
                     <Alert variant="destructive">